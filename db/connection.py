@@ -4,6 +4,8 @@ from dotenv import load_dotenv
 import psycopg2
 from psycopg2.extras import RealDictCursor
 from sqlalchemy import create_engine
+from utils.metrics import DB_CONNECT_SECONDS, add_rows_read
+from utils.timing import span
 
 # Charger les variables d'environnement depuis .env
 load_dotenv()
@@ -15,20 +17,46 @@ HOST = os.getenv("HOST")
 PORT = int(os.getenv("PORT"))
 
 
+class CountingDictCursor(RealDictCursor):
+    """RealDictCursor qui compte les lignes lues pour la métrique eyesight_db_rows_read."""
+
+    def fetchone(self):
+        row = super().fetchone()
+        if row is not None:
+            add_rows_read(1)
+        return row
+
+    def fetchmany(self, size=None):
+        rows = super().fetchmany(size) if size is not None else super().fetchmany()
+        add_rows_read(len(rows))
+        return rows
+
+    def fetchall(self):
+        rows = super().fetchall()
+        add_rows_read(len(rows))
+        return rows
+
+    def __iter__(self):
+        for row in super().__iter__():
+            add_rows_read(1)
+            yield row
+
+
 @contextmanager
 def get_conn():
     """
     Context manager pour une connexion psycopg2.
     Utilise RealDictCursor pour retourner des résultats sous forme de dict.
     """
-    conn = psycopg2.connect(
-        dbname=DATABASE,
-        user=USER,
-        password=PASSWORD,
-        host=HOST,
-        port=PORT,
-        cursor_factory=RealDictCursor
-    )
+    with span("db_connect"), DB_CONNECT_SECONDS.time():
+        conn = psycopg2.connect(
+            dbname=DATABASE,
+            user=USER,
+            password=PASSWORD,
+            host=HOST,
+            port=PORT,
+            cursor_factory=CountingDictCursor
+        )
     try:
         yield conn
     finally:
@@ -41,3 +69,20 @@ def get_engine():
     """
     uri = f"postgresql+psycopg2://{USER}:{PASSWORD}@{HOST}:{PORT}/{DATABASE}"
     return create_engine(uri)
+
+
+def iter_query(query, params=None, itersize=100, name="eyesight_iter"):
+    """
+    Exécute une requête via un curseur côté serveur (curseur nommé) et génère les lignes
+    au fil de l'eau, par paquets de `itersize` : le résultat n'est jamais chargé en entier
+    en mémoire. La connexion reste ouverte jusqu'à la fin (ou l'abandon) de l'itération.
+
+    Yields:
+        dict: une ligne (RealDictCursor)
+    """
+    with get_conn() as conn:
+        with conn.cursor(name=name) as cur:
+            cur.itersize = itersize
+            cur.execute(query, params)
+            for row in cur:
+                yield row
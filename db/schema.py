@@ -0,0 +1,120 @@
+"""
+Gestionnaire de schéma versionné.
+
+Les migrations sont des fichiers SQL numérotés dans le dossier `migrations/`
+(ex: 0003_stream_columns.sql). Elles sont appliquées une seule fois, dans l'ordre,
+au démarrage de l'API ou au déploiement (`python -m db.schema`), et chaque version
+appliquée est enregistrée dans la table `schema_version`.
+
+Les chemins d'écriture (ingestion, CRUD) supposent ensuite le schéma à jour :
+plus aucun CREATE TABLE ni requête sur information_schema à chaque appel.
+"""
+import os
+import re
+import sys
+from db.connection import get_conn
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "migrations")
+
+# Clé du verrou consultatif : les 4 workers uvicorn démarrent en même temps,
+# un seul applique les migrations, les autres attendent puis ne trouvent plus rien à faire.
+SCHEMA_LOCK_ID = 720_451_001
+
+MIGRATION_FILE_PATTERN = re.compile(r"^(\d{4})_([\w-]+)\.sql$")
+
+
+def list_migrations():
+    """
+    Liste les migrations disponibles, triées par version.
+
+    Returns:
+        list: tuples (version, nom, chemin)
+    """
+    migrations = []
+    for filename in os.listdir(MIGRATIONS_DIR):
+        match = MIGRATION_FILE_PATTERN.match(filename)
+        if match:
+            migrations.append((int(match.group(1)), match.group(2), os.path.join(MIGRATIONS_DIR, filename)))
+    return sorted(migrations)
+
+
+def _ensure_version_table(cur):
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            applied_at TIMESTAMP NOT NULL DEFAULT NOW()
+        )
+    """)
+
+
+def get_schema_version():
+    """Retourne la dernière version de schéma appliquée (0 si aucune)."""
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT to_regclass('schema_version') IS NOT NULL AS exists")
+            if not cur.fetchone()["exists"]:
+                return 0
+            cur.execute("SELECT COALESCE(MAX(version), 0) AS version FROM schema_version")
+            return cur.fetchone()["version"]
+
+
+def apply_migrations():
+    """
+    Applique toutes les migrations en attente, chacune dans sa propre transaction.
+
+    Returns:
+        list: versions appliquées lors de cet appel
+    """
+    applied_now = []
+
+    with get_conn() as conn:
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            cur.execute("SELECT pg_advisory_lock(%s)", (SCHEMA_LOCK_ID,))
+            try:
+                _ensure_version_table(cur)
+                cur.execute("SELECT version FROM schema_version")
+                applied = {row["version"] for row in cur.fetchall()}
+
+                pending = [m for m in list_migrations() if m[0] not in applied]
+                if not pending:
+                    return applied_now
+
+                conn.autocommit = False
+                for version, name, path in pending:
+                    print(f"🔄 Migration {version:04d} ({name})...")
+                    with open(path, encoding="utf-8") as f:
+                        migration_sql = f.read()
+                    try:
+                        cur.execute(migration_sql)
+                        cur.execute(
+                            "INSERT INTO schema_version (version, name) VALUES (%s, %s)",
+                            (version, name)
+                        )
+                        conn.commit()
+                    except Exception as e:
+                        conn.rollback()
+                        print(f"❌ Erreur lors de la migration {version:04d}: {e}")
+                        raise
+                    applied_now.append(version)
+                    print(f"✅ Migration {version:04d} appliquée")
+            finally:
+                conn.autocommit = True
+                cur.execute("SELECT pg_advisory_unlock(%s)", (SCHEMA_LOCK_ID,))
+
+    return applied_now
+
+
+if __name__ == "__main__":
+    if "--status" in sys.argv:
+        current = get_schema_version()
+        latest = max((m[0] for m in list_migrations()), default=0)
+        print(f"📋 Schéma en version {current} (dernière disponible : {latest})")
+        sys.exit(0)
+
+    versions = apply_migrations()
+    if versions:
+        print(f"✅ {len(versions)} migration(s) appliquée(s), schéma en version {versions[-1]}")
+    else:
+        print("✅ Schéma déjà à jour")
@@ -1,14 +1,42 @@
-from routers import plot, strava, activities, kpi, analysis
+from routers import plot, strava, activities, kpi, analysis, export, heatmap, segments
 from fastapi import FastAPI, Depends, HTTPException, status
 from services.auth import authenticate_user, create_access_token, get_current_user, validate_environment
 from fastapi.security import OAuth2PasswordRequestForm
 from fastapi.middleware.cors import CORSMiddleware
+from contextlib import asynccontextmanager
+from db.schema import apply_migrations
+from utils.json_response import FastJSONResponse
+from utils.compression import CompressionMiddleware
+from utils.etag import ETagMiddleware
+from utils.timing import ServerTimingMiddleware, SERVER_TIMING_ENABLED
+from utils.metrics import MetricsMiddleware, metrics_body
+from fastapi.responses import Response
+import os
 
 
 # Validation au démarrage - AVANT la création de l'app
 validate_environment()
 
-app = FastAPI(title="EyeSight Backend")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Schéma appliqué une seule fois au démarrage (désactivable si migré au déploiement)
+    if os.getenv("AUTO_MIGRATE", "true").lower() != "false":
+        apply_migrations()
+    yield
+
+
+app = FastAPI(title="EyeSight Backend", lifespan=lifespan, default_response_class=FastJSONResponse)
+
+# ETag des GET conditionnels (calculé par la dépendance etag_for des routers)
+app.add_middleware(ETagMiddleware)
+# Compression brotli/gzip négociée des réponses de plus de 1 Ko (streams, posters, exports)
+app.add_middleware(CompressionMiddleware, minimum_size=1024)
+# En-tête Server-Timing et log JSON par requête (désactivable avec SERVER_TIMING=false)
+if SERVER_TIMING_ENABLED:
+    app.add_middleware(ServerTimingMiddleware)
+# Latence et lignes lues par route (exposées sur /metrics)
+app.add_middleware(MetricsMiddleware)
 
 app.add_middleware(
     CORSMiddleware,
@@ -22,6 +50,9 @@ app.include_router(activities.router, prefix="/activities", tags=["Activités"])
 app.include_router(kpi.router, prefix="/kpi", tags=["KPIs"]) #dependencies=[Depends(get_current_user)]
 app.include_router(plot.router, prefix="/plot", tags=["Graphiques"]) #dependencies=[Depends(get_current_user)]
 app.include_router(analysis.router, prefix="/analysis", tags=["Analyses"]) #dependencies=[Depends(get_current_user)]
+app.include_router(export.router, prefix="/export", tags=["Export"]) #dependencies=[Depends(get_current_user)]
+app.include_router(heatmap.router, prefix="/heatmap", tags=["Heatmap"]) #dependencies=[Depends(get_current_user)]
+app.include_router(segments.router, prefix="/segments", tags=["Segments"]) #dependencies=[Depends(get_current_user)]
 
 
 @app.get("/")
@@ -29,6 +60,12 @@ def root():
     return {"status": "ok", "msg": "EyeSight API running"}
 
 
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    body, content_type = metrics_body()
+    return Response(body, media_type=content_type)
+
+
 @app.post("/login")
 def login(form_data: OAuth2PasswordRequestForm = Depends()):
     if not authenticate_user(form_data.username, form_data.password):
@@ -1,6 +1,54 @@
+-- Schéma initial : activités, streams et records personnels.
+-- Toutes les créations sont idempotentes pour pouvoir s'appliquer sur une base existante.
+
+CREATE TABLE IF NOT EXISTS activites (
+    id BIGSERIAL PRIMARY KEY,
+    name VARCHAR(255),
+    distance FLOAT,
+    moving_time FLOAT,
+    elapsed_time FLOAT,
+    moving_time_hms TEXT,
+    elapsed_time_hms TEXT,
+    average_speed FLOAT,
+    speed_minutes_per_km FLOAT,
+    speed_minutes_per_km_hms TEXT,
+    total_elevation_gain FLOAT,
+    sport_type VARCHAR(255),
+    start_date TIMESTAMP,
+    start_date_local TIMESTAMP,
+    timezone VARCHAR(50),
+    achievement_count INTEGER,
+    kudos_count INTEGER,
+    gear_id VARCHAR(255),
+    start_latlng VARCHAR(50),
+    end_latlng VARCHAR(50),
+    max_speed FLOAT,
+    average_cadence FLOAT,
+    average_temp FLOAT,
+    has_heartrate BOOLEAN,
+    average_heartrate FLOAT,
+    max_heartrate FLOAT,
+    elev_high FLOAT,
+    elev_low FLOAT,
+    pr_count INTEGER,
+    has_kudoed BOOLEAN,
+    average_watts FLOAT,
+    kilojoules FLOAT,
+    map JSONB
+);
+
+CREATE TABLE IF NOT EXISTS streams (
+    activity_id VARCHAR(50) NOT NULL,
+    lat DOUBLE PRECISION,
+    lon DOUBLE PRECISION,
+    altitude DOUBLE PRECISION,
+    distance_m DOUBLE PRECISION,
+    time_s DOUBLE PRECISION NOT NULL,
+    PRIMARY KEY (activity_id, time_s)
+);
+
 -- Table pour stocker les records personnels de l'utilisateur
 -- Permet de ne pas recalculer tous les records à chaque fois
-
 CREATE TABLE IF NOT EXISTS records (
     id SERIAL PRIMARY KEY,
     distance_key VARCHAR(20) NOT NULL UNIQUE,  -- '5k', '10k', 'semi', '30k', 'marathon'
@@ -17,11 +65,9 @@ CREATE TABLE IF NOT EXISTS records (
     CONSTRAINT valid_distance CHECK (distance_key IN ('5k', '10k', 'semi', '30k', 'marathon'))
 );
 
--- Index pour accélérer les requêtes
 CREATE INDEX IF NOT EXISTS idx_records_distance_key ON records(distance_key);
 CREATE INDEX IF NOT EXISTS idx_records_updated_at ON records(updated_at);
 
--- Commentaires pour documentation
 COMMENT ON TABLE records IS 'Stocke les records personnels de l''utilisateur pour éviter les recalculs';
 COMMENT ON COLUMN records.distance_key IS 'Clé unique pour la distance (5k, 10k, semi, 30k, marathon)';
 COMMENT ON COLUMN records.time_seconds IS 'Temps du record en secondes';
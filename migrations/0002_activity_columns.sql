@@ -0,0 +1,33 @@
+-- Colonnes d'activité ajoutées après la création initiale (ex-migrations/add_activity_columns.py)
+
+ALTER TABLE activites ADD COLUMN IF NOT EXISTS kilojoules DOUBLE PRECISION;
+ALTER TABLE activites ADD COLUMN IF NOT EXISTS average_watts DOUBLE PRECISION;
+ALTER TABLE activites ADD COLUMN IF NOT EXISTS device_watts BOOLEAN;
+ALTER TABLE activites ADD COLUMN IF NOT EXISTS max_watts INTEGER;
+ALTER TABLE activites ADD COLUMN IF NOT EXISTS weighted_average_watts INTEGER;
+ALTER TABLE activites ADD COLUMN IF NOT EXISTS average_heartrate DOUBLE PRECISION;
+ALTER TABLE activites ADD COLUMN IF NOT EXISTS max_heartrate INTEGER;
+ALTER TABLE activites ADD COLUMN IF NOT EXISTS average_cadence DOUBLE PRECISION;
+ALTER TABLE activites ADD COLUMN IF NOT EXISTS average_temp INTEGER;
+ALTER TABLE activites ADD COLUMN IF NOT EXISTS has_heartrate BOOLEAN;
+ALTER TABLE activites ADD COLUMN IF NOT EXISTS elev_high DOUBLE PRECISION;
+ALTER TABLE activites ADD COLUMN IF NOT EXISTS elev_low DOUBLE PRECISION;
+ALTER TABLE activites ADD COLUMN IF NOT EXISTS pr_count INTEGER;
+ALTER TABLE activites ADD COLUMN IF NOT EXISTS total_photo_count INTEGER;
+ALTER TABLE activites ADD COLUMN IF NOT EXISTS suffer_score INTEGER;
+
+COMMENT ON COLUMN activites.kilojoules IS 'Total energy output in kilojoules';
+COMMENT ON COLUMN activites.average_watts IS 'Average power output in watts';
+COMMENT ON COLUMN activites.device_watts IS 'Whether power data is from a device';
+COMMENT ON COLUMN activites.max_watts IS 'Maximum power output in watts';
+COMMENT ON COLUMN activites.weighted_average_watts IS 'Weighted average power';
+COMMENT ON COLUMN activites.average_heartrate IS 'Average heart rate in bpm';
+COMMENT ON COLUMN activites.max_heartrate IS 'Maximum heart rate in bpm';
+COMMENT ON COLUMN activites.average_cadence IS 'Average cadence';
+COMMENT ON COLUMN activites.average_temp IS 'Average temperature in Celsius';
+COMMENT ON COLUMN activites.has_heartrate IS 'Whether activity has heart rate data';
+COMMENT ON COLUMN activites.elev_high IS 'Highest elevation point in meters';
+COMMENT ON COLUMN activites.elev_low IS 'Lowest elevation point in meters';
+COMMENT ON COLUMN activites.pr_count IS 'Number of personal records achieved';
+COMMENT ON COLUMN activites.total_photo_count IS 'Number of photos';
+COMMENT ON COLUMN activites.suffer_score IS 'Strava suffer score';
@@ -0,0 +1,15 @@
+-- Colonnes de streams ajoutées après la création initiale (ex-migrations/add_stream_columns.py)
+
+ALTER TABLE streams ADD COLUMN IF NOT EXISTS heartrate INTEGER;
+ALTER TABLE streams ADD COLUMN IF NOT EXISTS cadence INTEGER;
+ALTER TABLE streams ADD COLUMN IF NOT EXISTS velocity_smooth DOUBLE PRECISION;
+ALTER TABLE streams ADD COLUMN IF NOT EXISTS temp INTEGER;
+ALTER TABLE streams ADD COLUMN IF NOT EXISTS power INTEGER;
+ALTER TABLE streams ADD COLUMN IF NOT EXISTS grade_smooth DOUBLE PRECISION;
+
+COMMENT ON COLUMN streams.heartrate IS 'Heart rate in bpm';
+COMMENT ON COLUMN streams.cadence IS 'Running/cycling cadence';
+COMMENT ON COLUMN streams.velocity_smooth IS 'Smoothed velocity in m/s';
+COMMENT ON COLUMN streams.temp IS 'Temperature in Celsius';
+COMMENT ON COLUMN streams.power IS 'Power in watts';
+COMMENT ON COLUMN streams.grade_smooth IS 'Smoothed grade percentage';
@@ -0,0 +1,22 @@
+-- Les anciennes bases créaient parfois la table streams sans clé primaire.
+-- On supprime les doublons (activity_id, time_s) puis on ajoute la clé composite,
+-- indispensable pour ON CONFLICT et pour les lectures par activité.
+
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_constraint
+        WHERE conrelid = 'streams'::regclass AND contype = 'p'
+    ) THEN
+        DELETE FROM streams a
+        USING streams b
+        WHERE a.ctid < b.ctid
+          AND a.activity_id = b.activity_id
+          AND a.time_s = b.time_s;
+
+        DELETE FROM streams WHERE activity_id IS NULL OR time_s IS NULL;
+
+        ALTER TABLE streams ADD CONSTRAINT streams_pk PRIMARY KEY (activity_id, time_s);
+    END IF;
+END
+$$;
@@ -0,0 +1,4 @@
+-- Table de staging pour le chargement COPY des streams (strava.store_data.store_df_streams_copy).
+-- UNLOGGED et sans index : le COPY n'écrit pas de WAL, la fusion se fait en un seul INSERT ... SELECT.
+
+CREATE UNLOGGED TABLE IF NOT EXISTS streams_staging (LIKE streams INCLUDING DEFAULTS);
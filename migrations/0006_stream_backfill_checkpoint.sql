@@ -0,0 +1,9 @@
+-- Points de reprise du backfill des streams (scripts/backfill_streams.py).
+-- Une ligne par activité terminée, écrite dans la même transaction que l'UPDATE des streams :
+-- interrompre puis relancer le script reprend exactement là où il s'était arrêté.
+
+CREATE TABLE IF NOT EXISTS stream_backfill_checkpoint (
+    activity_id VARCHAR(50) PRIMARY KEY,
+    rows_updated INTEGER NOT NULL DEFAULT 0,
+    completed_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
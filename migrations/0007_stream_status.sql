@@ -0,0 +1,43 @@
+-- Registre d'ingestion des streams : une ligne par activité, tenue à jour par le chemin d'ingestion.
+-- Remplace l'anti-jointure `activites LEFT JOIN streams ON a.id::text = s.activity_id`, dont le coût
+-- croissait avec le nombre total d'échantillons, et mémorise les activités sans GPS (no_stream)
+-- pour ne plus les redemander à Strava à chaque synchronisation.
+--
+--   pending   : activité importée, streams jamais demandés
+--   fetched   : streams stockés (sample_count échantillons)
+--   no_stream : Strava n'a pas de trace GPS (workout indoor, activité manuelle, 404)
+--   failed    : erreur lors de la récupération, retentée tant que attempts < MAX_STREAM_ATTEMPTS
+
+CREATE TABLE IF NOT EXISTS stream_status (
+    activity_id BIGINT PRIMARY KEY REFERENCES activites(id) ON DELETE CASCADE,
+    status VARCHAR(16) NOT NULL DEFAULT 'pending'
+        CHECK (status IN ('pending', 'fetched', 'no_stream', 'failed')),
+    attempts INTEGER NOT NULL DEFAULT 0,
+    sample_count INTEGER,
+    last_error TEXT,
+    start_date TIMESTAMP,
+    created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    last_attempt_at TIMESTAMP,
+    fetched_at TIMESTAMP
+);
+
+-- "Ce qu'il reste à récupérer" : index partiel, les activités terminées n'y figurent pas
+CREATE INDEX IF NOT EXISTS stream_status_todo_idx
+    ON stream_status (start_date DESC)
+    WHERE status IN ('pending', 'failed');
+
+-- Initialisation à partir des données existantes (un seul passage sur streams)
+INSERT INTO stream_status (activity_id, status, sample_count, start_date, fetched_at)
+SELECT
+    a.id,
+    CASE WHEN s.sample_count IS NULL THEN 'pending' ELSE 'fetched' END,
+    s.sample_count,
+    a.start_date,
+    CASE WHEN s.sample_count IS NULL THEN NULL ELSE NOW() END
+FROM activites a
+LEFT JOIN (
+    SELECT activity_id, COUNT(*) AS sample_count
+    FROM streams
+    GROUP BY activity_id
+) s ON s.activity_id = a.id::text
+ON CONFLICT (activity_id) DO NOTHING;
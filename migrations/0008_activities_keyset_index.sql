@@ -0,0 +1,9 @@
+-- Index de la pagination par curseur (keyset) sur (start_date, id) des listes d'activités :
+-- la première page coûte une lecture d'index bornée par LIMIT, quel que soit le nombre d'activités.
+
+CREATE INDEX IF NOT EXISTS activites_start_date_id_idx
+    ON activites (start_date DESC, id DESC);
+
+-- Variante pour le filtre par sport du fil d'activités
+CREATE INDEX IF NOT EXISTS activites_sport_start_date_id_idx
+    ON activites (sport_type, start_date DESC, id DESC);
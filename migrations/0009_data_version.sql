@@ -0,0 +1,37 @@
+-- Marqueur de version des données, base des ETag des endpoints de lecture (utils/etag.py).
+-- Chaque écriture sur activites, streams ou records (ingestion Strava, CRUD, records, TRUNCATE)
+-- incrémente la version de la table concernée via un trigger par instruction : les ETag
+-- changent dès que les données changent, sans que le code applicatif ait à y penser.
+
+CREATE TABLE IF NOT EXISTS data_version (
+    scope TEXT PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 1,
+    updated_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+INSERT INTO data_version (scope) VALUES ('activites'), ('streams'), ('records')
+ON CONFLICT (scope) DO NOTHING;
+
+CREATE OR REPLACE FUNCTION bump_data_version() RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE data_version
+    SET version = version + 1, updated_at = NOW()
+    WHERE scope = TG_TABLE_NAME;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DO $$
+DECLARE
+    tbl TEXT;
+BEGIN
+    FOREACH tbl IN ARRAY ARRAY['activites', 'streams', 'records'] LOOP
+        EXECUTE format('DROP TRIGGER IF EXISTS %I ON %I', tbl || '_data_version', tbl);
+        EXECUTE format(
+            'CREATE TRIGGER %I AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON %I '
+            'FOR EACH STATEMENT EXECUTE FUNCTION bump_data_version()',
+            tbl || '_data_version', tbl
+        );
+    END LOOP;
+END
+$$;
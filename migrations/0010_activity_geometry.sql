@@ -0,0 +1,21 @@
+-- Géométrie des tracés précalculée à l'ingestion (voir utils/geometry.py) : la polyline résumée
+-- est décodée une seule fois, simplifiée (Ramer–Douglas–Peucker) pour les zooms 14, 12 et 10,
+-- et sa bbox est stockée. Les cartes et listes d'activités lisent ces colonnes directement,
+-- sans json.loads ni polyline.decode par requête.
+--
+-- Coordonnées : tableaux [[lat, lon], ...] ; NULL si l'activité n'a pas de tracé.
+-- Les activités existantes sont remplies par scripts/backfill_geometry.py.
+
+CREATE TABLE IF NOT EXISTS activity_geometry (
+    activity_id BIGINT PRIMARY KEY REFERENCES activites(id) ON DELETE CASCADE,
+    min_lat DOUBLE PRECISION,
+    min_lon DOUBLE PRECISION,
+    max_lat DOUBLE PRECISION,
+    max_lon DOUBLE PRECISION,
+    point_count INTEGER NOT NULL DEFAULT 0,
+    coords DOUBLE PRECISION[][],
+    coords_z14 DOUBLE PRECISION[][],
+    coords_z12 DOUBLE PRECISION[][],
+    coords_z10 DOUBLE PRECISION[][],
+    updated_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
@@ -0,0 +1,53 @@
+-- Cache persistant des analyses calculées sur les streams (services/analysis_service.py).
+--
+-- stream_status.stream_version est incrémentée pour chaque activité dont les streams changent
+-- (triggers par instruction avec tables de transition : une seule mise à jour groupée par
+-- COPY / UPDATE / DELETE, pas un trigger par échantillon). Un résultat en cache n'est servi
+-- que si sa stream_version est la version courante de l'activité.
+
+ALTER TABLE stream_status ADD COLUMN IF NOT EXISTS stream_version BIGINT NOT NULL DEFAULT 0;
+
+CREATE TABLE IF NOT EXISTS analysis_cache (
+    activity_id BIGINT NOT NULL REFERENCES activites(id) ON DELETE CASCADE,
+    analysis VARCHAR(64) NOT NULL,
+    params TEXT NOT NULL,
+    stream_version BIGINT NOT NULL,
+    payload BYTEA NOT NULL,  -- réponse JSON déjà sérialisée
+    computed_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (activity_id, analysis, params)
+);
+
+CREATE OR REPLACE FUNCTION bump_stream_version() RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'TRUNCATE' THEN
+        UPDATE stream_status SET stream_version = stream_version + 1;
+    ELSE
+        -- changed_rows : lignes insérées, modifiées ou supprimées par l'instruction
+        UPDATE stream_status ss
+        SET stream_version = stream_version + 1
+        FROM (SELECT DISTINCT activity_id FROM changed_rows) c
+        WHERE ss.activity_id = c.activity_id::BIGINT;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Une table de transition par trigger : un trigger par opération
+DROP TRIGGER IF EXISTS streams_version_insert ON streams;
+CREATE TRIGGER streams_version_insert AFTER INSERT ON streams
+    REFERENCING NEW TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_stream_version();
+
+DROP TRIGGER IF EXISTS streams_version_update ON streams;
+CREATE TRIGGER streams_version_update AFTER UPDATE ON streams
+    REFERENCING NEW TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_stream_version();
+
+DROP TRIGGER IF EXISTS streams_version_delete ON streams;
+CREATE TRIGGER streams_version_delete AFTER DELETE ON streams
+    REFERENCING OLD TABLE AS changed_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_stream_version();
+
+DROP TRIGGER IF EXISTS streams_version_truncate ON streams;
+CREATE TRIGGER streams_version_truncate AFTER TRUNCATE ON streams
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_stream_version();
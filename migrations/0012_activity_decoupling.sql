@@ -0,0 +1,34 @@
+-- Découplage aérobie (Pa:HR) et dérive cardiaque par activité, calculés par le job
+-- scripts/compute_decoupling.py (services/decoupling_service.py) et lus par /analysis/decoupling.
+--
+-- stream_version : version des streams utilisée pour le calcul (stream_status.stream_version,
+-- migration 0011) ; le job ne recalcule que les activités dont les streams ont changé.
+-- Les métriques sont NULL si l'activité n'a pas assez de temps en mouvement avec FC et vitesse.
+
+CREATE TABLE IF NOT EXISTS activity_decoupling (
+    activity_id BIGINT PRIMARY KEY REFERENCES activites(id) ON DELETE CASCADE,
+    stream_version BIGINT NOT NULL,
+    start_date TIMESTAMP,
+    sport_type VARCHAR(50),
+    moving_seconds DOUBLE PRECISION,
+    avg_heartrate DOUBLE PRECISION,
+    avg_speed DOUBLE PRECISION,       -- m/s, en mouvement
+    ef_first_half DOUBLE PRECISION,   -- efficiency factor : vitesse / FC
+    ef_second_half DOUBLE PRECISION,
+    decoupling_pct DOUBLE PRECISION,  -- (EF1 - EF2) / EF1 * 100
+    cardiac_drift_pct DOUBLE PRECISION, -- (FC2 - FC1) / FC1 * 100
+    computed_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS activity_decoupling_trend_idx
+    ON activity_decoupling (start_date)
+    WHERE decoupling_pct IS NOT NULL;
+
+-- ETag de /analysis/decoupling (voir migration 0009)
+INSERT INTO data_version (scope) VALUES ('activity_decoupling')
+ON CONFLICT (scope) DO NOTHING;
+
+DROP TRIGGER IF EXISTS activity_decoupling_data_version ON activity_decoupling;
+CREATE TRIGGER activity_decoupling_data_version
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON activity_decoupling
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_data_version();
@@ -0,0 +1,73 @@
+-- Modèle charge / forme (services/training_load_service.py) :
+--   activity_load        : charge (TRIMP) de chaque activité et sa source
+--   training_load_daily  : charge du jour, CTL (forme, 42 j), ATL (fatigue, 7 j), TSB (fraîcheur)
+--   training_load_dirty  : jours à recalculer, marqués par triggers
+--
+-- Toute écriture sur une activité (création, modification, suppression) ou sur ses streams
+-- (stream_version, migration 0011) marque son jour. La mise à jour recalcule la charge des
+-- activités des jours marqués, puis la récurrence CTL/ATL/TSB à partir du premier jour marqué
+-- seulement, en repartant de l'état de la veille stocké dans training_load_daily.
+
+CREATE TABLE IF NOT EXISTS activity_load (
+    activity_id BIGINT PRIMARY KEY REFERENCES activites(id) ON DELETE CASCADE,
+    day DATE NOT NULL,
+    trimp DOUBLE PRECISION NOT NULL,
+    source VARCHAR(16) NOT NULL CHECK (source IN ('hr_stream', 'suffer_score', 'avg_hr', 'duration')),
+    computed_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS activity_load_day_idx ON activity_load (day);
+
+CREATE TABLE IF NOT EXISTS training_load_daily (
+    day DATE PRIMARY KEY,
+    load DOUBLE PRECISION NOT NULL,
+    ctl DOUBLE PRECISION NOT NULL,
+    atl DOUBLE PRECISION NOT NULL,
+    tsb DOUBLE PRECISION NOT NULL,
+    updated_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+CREATE TABLE IF NOT EXISTS training_load_dirty (
+    day DATE PRIMARY KEY
+);
+
+CREATE OR REPLACE FUNCTION mark_training_load_dirty() RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_TABLE_NAME = 'stream_status' THEN
+        INSERT INTO training_load_dirty (day)
+        SELECT COALESCE(start_date_local, start_date)::date FROM activites
+        WHERE id = NEW.activity_id AND COALESCE(start_date_local, start_date) IS NOT NULL
+        ON CONFLICT (day) DO NOTHING;
+        RETURN NULL;
+    END IF;
+
+    IF TG_OP IN ('UPDATE', 'DELETE') AND COALESCE(OLD.start_date_local, OLD.start_date) IS NOT NULL THEN
+        INSERT INTO training_load_dirty (day) VALUES (COALESCE(OLD.start_date_local, OLD.start_date)::date)
+        ON CONFLICT (day) DO NOTHING;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') AND COALESCE(NEW.start_date_local, NEW.start_date) IS NOT NULL THEN
+        INSERT INTO training_load_dirty (day) VALUES (COALESCE(NEW.start_date_local, NEW.start_date)::date)
+        ON CONFLICT (day) DO NOTHING;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS activites_training_load ON activites;
+CREATE TRIGGER activites_training_load
+    AFTER INSERT OR UPDATE OR DELETE ON activites
+    FOR EACH ROW EXECUTE FUNCTION mark_training_load_dirty();
+
+DROP TRIGGER IF EXISTS stream_status_training_load ON stream_status;
+CREATE TRIGGER stream_status_training_load
+    AFTER UPDATE OF stream_version ON stream_status
+    FOR EACH ROW
+    WHEN (OLD.stream_version IS DISTINCT FROM NEW.stream_version)
+    EXECUTE FUNCTION mark_training_load_dirty();
+
+-- Premier calcul : tout l'historique est à traiter
+INSERT INTO training_load_dirty (day)
+SELECT DISTINCT COALESCE(start_date_local, start_date)::date
+FROM activites
+WHERE COALESCE(start_date_local, start_date) IS NOT NULL
+ON CONFLICT (day) DO NOTHING;
@@ -0,0 +1,16 @@
+-- Index spatial des streams (utils/spatial.py) : une ligne par cellule de grille traversée
+-- par une activité. Cellules de GRID_CELL_DEG degrés : cell_y = floor(lat / GRID_CELL_DEG),
+-- cell_x = floor(lon / GRID_CELL_DEG).
+--
+-- Rempli à l'ingestion des streams ; pour les streams déjà en base :
+--     python scripts/backfill_stream_cells.py
+
+CREATE TABLE IF NOT EXISTS stream_cells (
+    cell_y INTEGER NOT NULL,
+    cell_x INTEGER NOT NULL,
+    activity_id BIGINT NOT NULL REFERENCES activites(id) ON DELETE CASCADE,
+    PRIMARY KEY (cell_y, cell_x, activity_id)
+);
+
+-- Backfill : recherche des activités déjà indexées
+CREATE INDEX IF NOT EXISTS stream_cells_activity_idx ON stream_cells (activity_id);
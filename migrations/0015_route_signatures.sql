@@ -0,0 +1,23 @@
+-- Signatures de parcours (utils/route_signature.py) pour retrouver les sorties sur un même parcours.
+--   route_signature : signature MinHash des cellules de grille visitées par le tracé simplifié
+--   route_lsh       : bucket de chaque bande de la signature ; deux activités qui partagent
+--                     un (band, bucket) sont candidates
+--
+-- Calculées avec la géométrie (utils/geometry.py) ; pour les activités déjà en base :
+--     python scripts/backfill_route_signatures.py
+
+CREATE TABLE IF NOT EXISTS route_signature (
+    activity_id BIGINT PRIMARY KEY REFERENCES activites(id) ON DELETE CASCADE,
+    minhash BIGINT[] NOT NULL,
+    cell_count INTEGER NOT NULL,
+    computed_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+CREATE TABLE IF NOT EXISTS route_lsh (
+    band SMALLINT NOT NULL,
+    bucket BIGINT NOT NULL,
+    activity_id BIGINT NOT NULL REFERENCES activites(id) ON DELETE CASCADE,
+    PRIMARY KEY (band, bucket, activity_id)
+);
+
+CREATE INDEX IF NOT EXISTS route_lsh_activity_idx ON route_lsh (activity_id);
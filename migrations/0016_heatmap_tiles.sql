@@ -0,0 +1,36 @@
+-- Heatmap personnelle (utils/heatmap.py, services/heatmap_service.py).
+--   heatmap_tiles    : une ligne par tuile z/x/y touchée ; counts = tableau uint32 256 x 256
+--                      (little-endian) compressé par zlib, max_count = plus grand compte
+--                      d'un pixel (saturation du rendu par zoom)
+--   heatmap_activity : activités déjà comptées dans les tuiles (construction incrémentale)
+--
+-- Les tuiles sont additives : une activité supprimée ou dont les streams changent reste
+-- comptée jusqu'à la reconstruction complète (python scripts/build_heatmap.py --rebuild).
+
+CREATE TABLE IF NOT EXISTS heatmap_tiles (
+    z SMALLINT NOT NULL,
+    x INTEGER NOT NULL,
+    y INTEGER NOT NULL,
+    counts BYTEA NOT NULL,
+    sample_count BIGINT NOT NULL,
+    max_count BIGINT NOT NULL,
+    updated_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (z, x, y)
+);
+
+CREATE INDEX IF NOT EXISTS heatmap_tiles_saturation_idx ON heatmap_tiles (z, max_count DESC);
+
+CREATE TABLE IF NOT EXISTS heatmap_activity (
+    activity_id BIGINT PRIMARY KEY,
+    stream_version BIGINT NOT NULL,
+    sample_count INTEGER NOT NULL,
+    added_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+INSERT INTO data_version (scope) VALUES ('heatmap_tiles')
+ON CONFLICT (scope) DO NOTHING;
+
+DROP TRIGGER IF EXISTS heatmap_tiles_data_version ON heatmap_tiles;
+CREATE TRIGGER heatmap_tiles_data_version
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON heatmap_tiles
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_data_version();
@@ -0,0 +1,61 @@
+-- Segments définis par l'utilisateur et efforts détectés (services/segment_service.py).
+--   segments        : tracé [[lat, lon], ...], portes de départ et d'arrivée (perpendiculaires
+--                     au tracé, de gate_width_m mètres de part et d'autre), longueur
+--   segment_cells   : cellules de la grille de stream_cells (migration 0014) couvertes par
+--                     le tracé ; une activité est candidate si ses streams en couvrent l'essentiel
+--   segment_efforts : passages détectés (franchissement de la porte de départ puis d'arrivée),
+--                     temps interpolés entre échantillons
+
+CREATE TABLE IF NOT EXISTS segments (
+    id SERIAL PRIMARY KEY,
+    name VARCHAR(255) NOT NULL,
+    sport_type VARCHAR(50),
+    coords DOUBLE PRECISION[][] NOT NULL,
+    distance_m DOUBLE PRECISION NOT NULL,
+    gate_width_m DOUBLE PRECISION NOT NULL DEFAULT 25,
+    cell_count INTEGER NOT NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+CREATE TABLE IF NOT EXISTS segment_cells (
+    cell_y INTEGER NOT NULL,
+    cell_x INTEGER NOT NULL,
+    segment_id INTEGER NOT NULL REFERENCES segments(id) ON DELETE CASCADE,
+    PRIMARY KEY (cell_y, cell_x, segment_id)
+);
+
+CREATE INDEX IF NOT EXISTS segment_cells_segment_idx ON segment_cells (segment_id);
+
+CREATE TABLE IF NOT EXISTS segment_efforts (
+    id BIGSERIAL PRIMARY KEY,
+    segment_id INTEGER NOT NULL REFERENCES segments(id) ON DELETE CASCADE,
+    activity_id BIGINT NOT NULL REFERENCES activites(id) ON DELETE CASCADE,
+    start_date TIMESTAMP,
+    start_time_s DOUBLE PRECISION NOT NULL,
+    elapsed_time_s DOUBLE PRECISION NOT NULL,
+    distance_m DOUBLE PRECISION,
+    matched_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    UNIQUE (segment_id, activity_id, start_time_s)
+);
+
+-- Classement : efforts d'un segment par temps croissant
+CREATE INDEX IF NOT EXISTS segment_efforts_leaderboard_idx ON segment_efforts (segment_id, elapsed_time_s);
+CREATE INDEX IF NOT EXISTS segment_efforts_activity_idx ON segment_efforts (activity_id);
+
+INSERT INTO data_version (scope) VALUES ('segments'), ('segment_efforts')
+ON CONFLICT (scope) DO NOTHING;
+
+DO $$
+DECLARE
+    tbl TEXT;
+BEGIN
+    FOREACH tbl IN ARRAY ARRAY['segments', 'segment_efforts'] LOOP
+        EXECUTE format('DROP TRIGGER IF EXISTS %I ON %I', tbl || '_data_version', tbl);
+        EXECUTE format(
+            'CREATE TRIGGER %I AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON %I '
+            'FOR EACH STATEMENT EXECUTE FUNCTION bump_data_version()',
+            tbl || '_data_version', tbl
+        );
+    END LOOP;
+END
+$$;
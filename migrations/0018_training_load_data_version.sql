@@ -0,0 +1,10 @@
+-- Version de données de training_load_daily (ETag de /kpi/training_load) : la série change
+-- aussi sans écriture sur activites ni streams (prolongation quotidienne, mise à jour après ingestion).
+
+INSERT INTO data_version (scope) VALUES ('training_load_daily')
+ON CONFLICT (scope) DO NOTHING;
+
+DROP TRIGGER IF EXISTS training_load_daily_data_version ON training_load_daily;
+CREATE TRIGGER training_load_daily_data_version
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON training_load_daily
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_data_version();
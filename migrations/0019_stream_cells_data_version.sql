@@ -0,0 +1,10 @@
+-- Version de données de stream_cells (ETag de /activities/near) : le backfill de l'index
+-- spatial change les résultats sans écrire dans activites ni streams.
+
+INSERT INTO data_version (scope) VALUES ('stream_cells')
+ON CONFLICT (scope) DO NOTHING;
+
+DROP TRIGGER IF EXISTS stream_cells_data_version ON stream_cells;
+CREATE TRIGGER stream_cells_data_version
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON stream_cells
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_data_version();
@@ -0,0 +1,20 @@
+-- Versions de données de route_signature et route_lsh (ETag de /activities/similar_routes) :
+-- le backfill et --recompute des signatures changent les résultats sans écrire dans activites.
+
+INSERT INTO data_version (scope) VALUES ('route_signature'), ('route_lsh')
+ON CONFLICT (scope) DO NOTHING;
+
+DO $$
+DECLARE
+    tbl TEXT;
+BEGIN
+    FOREACH tbl IN ARRAY ARRAY['route_signature', 'route_lsh'] LOOP
+        EXECUTE format('DROP TRIGGER IF EXISTS %I ON %I', tbl || '_data_version', tbl);
+        EXECUTE format(
+            'CREATE TRIGGER %I AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON %I '
+            'FOR EACH STATEMENT EXECUTE FUNCTION bump_data_version()',
+            tbl || '_data_version', tbl
+        );
+    END LOOP;
+END
+$$;
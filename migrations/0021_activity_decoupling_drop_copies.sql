@@ -0,0 +1,11 @@
+-- activity_decoupling ne garde plus de copie de start_date et sport_type : /analysis/decoupling
+-- les lit dans activites (jointure sur la clé primaire). Une modification de l'activité
+-- (PUT/PATCH) est ainsi visible aussitôt, sans attendre un nouveau calcul du découplage.
+--
+-- Les filtres de la tendance (sport, dates) passent par les index de activites
+-- (migration 0008) ; l'index sur la copie de start_date disparaît avec elle.
+
+DROP INDEX IF EXISTS activity_decoupling_trend_idx;
+
+ALTER TABLE activity_decoupling DROP COLUMN IF EXISTS start_date;
+ALTER TABLE activity_decoupling DROP COLUMN IF EXISTS sport_type;
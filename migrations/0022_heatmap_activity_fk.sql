@@ -0,0 +1,19 @@
+-- heatmap_activity référence activites : une activité supprimée quitte le registre. Sans
+-- cela, sa ligne restait et une réimportation du même id Strava n'était jamais ajoutée.
+-- Les lignes d'activités déjà supprimées sont retirées avant d'ajouter la contrainte ;
+-- leurs échantillons restent dans les tuiles et update_heatmap() le signale (--rebuild).
+
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_constraint
+        WHERE conrelid = 'heatmap_activity'::regclass AND contype = 'f'
+    ) THEN
+        DELETE FROM heatmap_activity h
+        WHERE NOT EXISTS (SELECT 1 FROM activites a WHERE a.id = h.activity_id);
+
+        ALTER TABLE heatmap_activity ADD CONSTRAINT heatmap_activity_activity_fk
+            FOREIGN KEY (activity_id) REFERENCES activites(id) ON DELETE CASCADE;
+    END IF;
+END
+$$;
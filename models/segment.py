@@ -0,0 +1,34 @@
+from pydantic import BaseModel, Field, validator
+from typing import List, Optional
+import polyline
+
+
+class SegmentCreate(BaseModel):
+    """
+    Modèle pour créer un segment.
+    Le tracé est donné en coordonnées [[lat, lon], ...] ou en polyline encodée (format Strava / Google).
+    """
+    name: str = Field(..., min_length=1, max_length=255, description="Nom du segment")
+    sport_type: Optional[str] = Field(None, description="Ne comparer que les activités de ce sport (None = toutes)")
+    coords: Optional[List[List[float]]] = Field(None, description="Tracé [[lat, lon], ...] du départ à l'arrivée")
+    polyline: Optional[str] = Field(None, description="Tracé en polyline encodée (si coords absent)")
+    gate_width_m: float = Field(25, gt=0, le=200, description="Demi-largeur des portes de départ et d'arrivée (mètres)")
+
+    @validator('polyline', always=True)
+    def check_route(cls, v, values):
+        """Un tracé d'au moins 2 points, en coords ou en polyline"""
+        coords = values.get('coords')
+        if not coords and v:
+            try:
+                coords = polyline.decode(v)
+            except (IndexError, TypeError, ValueError):
+                raise ValueError("Polyline encodée invalide")
+        if not coords or len(coords) < 2:
+            raise ValueError("Le tracé du segment doit contenir au moins 2 points (coords ou polyline)")
+        if any(len(point) != 2 or not (-90 <= point[0] <= 90 and -180 <= point[1] <= 180) for point in coords):
+            raise ValueError("Chaque point du tracé doit être [lat, lon] en degrés")
+        return v
+
+    def route(self):
+        """Tracé [[lat, lon], ...] du segment"""
+        return self.coords if self.coords else [list(point) for point in polyline.decode(self.polyline)]
@@ -1,8 +1,11 @@
 from services import update_service
-from fastapi import APIRouter, Query, HTTPException, status
+from fastapi import APIRouter, Query, HTTPException, status, Depends, Header
 from typing import Optional, List
 import pandas as pd
 from services.activity_service import *
+from services.activity_detail_service import get_activity_detail
+from services.route_service import get_similar_routes, DEFAULT_MAX_FRECHET_M
+from services.spatial_service import get_activities_near, MAX_NEAR_RADIUS_M, MAX_NEAR_RESULTS
 from services.activity_crud import (
     create_activity,
     update_activity,
@@ -12,97 +15,188 @@ from services.activity_crud import (
 )
 from models.activity import ActivityCreate, ActivityUpdate, ActivityResponse
 from datetime import datetime, timedelta
+from utils.json_response import FastJSONResponse
+from utils.etag import etag_for
+from utils.stream_formats import STREAM_FORMATS, negotiate_stream_format, stream_response, json_streams_payload
+from utils.json_response import dumps as json_dumps
+from fastapi.responses import StreamingResponse
 
 router = APIRouter()
 
 
-@router.get("/filter_activities")
+def _page_or_400(**kwargs):
+    try:
+        return get_activities_page(**kwargs)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
+@router.get("/filter_activities", dependencies=[Depends(etag_for("activites"))])
 def filter_activities(
     sport_type: Optional[str] = Query(None, description="Filtrer par type de sport"),
     start_date: Optional[str] = Query(None, description="Filtrer les activités après cette date YYYY-MM-DD"),
-    end_date: Optional[str] = Query(None, description="Filtrer les activités avant cette date YYYY-MM-DD")
+    end_date: Optional[str] = Query(None, description="Filtrer les activités avant cette date YYYY-MM-DD"),
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE, description="Nombre d'activités par page"),
+    cursor: Optional[str] = Query(None, description="next_cursor de la page précédente"),
+    include_total: bool = Query(False, description="Ajouter le nombre total d'activités filtrées"),
+    include_map: bool = Query(False, description="Inclure la polyline (map)"),
+    fields: Optional[str] = Query(None, description="Colonnes à renvoyer, séparées par des virgules (ex: id,start_date,distance,moving_time)")
 ):
     """
-    Renvoie toutes les activités filtrées.
+    Renvoie les activités filtrées, par pages triées de la plus récente à la plus ancienne.
+    Passer `next_cursor` en `cursor` pour obtenir la page suivante (None = dernière page).
     """
-    df = get_all_activities()
-    if df.empty:
-        return {"activities": []}
-
-    if sport_type:
-        df = df[df["sport_type"] == sport_type]
+    return _page_or_400(
+        limit=limit, cursor=cursor, sport_type=sport_type, start_date=start_date, end_date=end_date,
+        include_total=include_total, include_map=include_map, fields=fields
+    )
+
+@router.get("/last_activity", dependencies=[Depends(etag_for("activites"))])
+def last_activity(
+    sport_type: Optional[str] = Query(None),
+    zoom: Optional[int] = Query(None, description="Tracé simplifié pour ce zoom de carte (14, 12 ou 10) ; absent = tracé complet")
+):
+    try:
+        result = get_last_activity(sport_type=sport_type, zoom=zoom)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    if not result:
+        return {"message": f"Aucune activité trouvée pour le sport '{sport_type}'."}
+    return result
 
-    # Convertir start_date en datetime une seule fois
-    df["start_date"] = pd.to_datetime(df["start_date"])
+@router.get("/activities", dependencies=[Depends(etag_for("activites"))])
+def all_activities(
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE, description="Nombre d'activités par page"),
+    cursor: Optional[str] = Query(None, description="next_cursor de la page précédente"),
+    include_total: bool = Query(False, description="Ajouter le nombre total d'activités"),
+    include_map: bool = Query(False, description="Inclure la polyline (map)"),
+    fields: Optional[str] = Query(None, description="Colonnes à renvoyer, séparées par des virgules (ex: id,start_date,distance,moving_time)")
+):
+    """
+    Renvoie les activités par pages (keyset sur (start_date, id)), de la plus récente à la plus ancienne.
+    """
+    return _page_or_400(
+        limit=limit, cursor=cursor, include_total=include_total, include_map=include_map, fields=fields
+    )
+
+@router.get("/near", dependencies=[Depends(etag_for("activites", "streams", "stream_cells"))])
+def activities_near(
+    lat: float = Query(..., ge=-90, le=90, description="Latitude du point (degrés)"),
+    lon: float = Query(..., ge=-180, le=180, description="Longitude du point (degrés)"),
+    radius: float = Query(200, gt=0, le=MAX_NEAR_RADIUS_M, description="Rayon de recherche en mètres"),
+    sport_type: Optional[str] = Query(None, description="Filtrer par type de sport"),
+    limit: int = Query(100, ge=1, le=MAX_NEAR_RESULTS, description="Nombre max d'activités (les plus récentes)")
+):
+    """
+    Activités passées à moins de `radius` mètres du point, avec la distance et l'instant
+    (time_s) du passage le plus proche. Candidates lues dans l'index spatial stream_cells,
+    puis distance exacte (haversine) sur leurs échantillons GPS.
+    """
+    return FastJSONResponse(get_activities_near(lat, lon, radius_m=radius, sport_type=sport_type, limit=limit))
+
+@router.get("/last_activity_streams", dependencies=[Depends(etag_for("activites", "streams"))])
+def last_activity_streams(
+    sport_type: Optional[str] = Query(None),
+    max_points: Optional[int] = Query(None, ge=3, le=20000, description="Sous-échantillonnage LTTB à max_points points"),
+    y_channel: str = Query("altitude", enum=LTTB_Y_CHANNELS, description="Canal dont la forme est préservée"),
+    format: Optional[str] = Query(None, enum=STREAM_FORMATS, description="Format des streams (défaut: records, ou selon Accept)"),
+    accept: Optional[str] = Header(None)
+):
+    fmt = negotiate_stream_format(format, accept)
+    if fmt == "records":
+        return FastJSONResponse(get_last_activity_streams(sport_type, max_points=max_points, y_channel=y_channel))
 
-    if start_date:
-        start_date_dt = pd.to_datetime(start_date)
-        df = df[df["start_date"] >= start_date_dt]
+    result = get_last_activity_streams(sport_type, max_points=max_points, y_channel=y_channel, as_frame=True)
+    if "streams" not in result:
+        return result
+    return stream_response(result["streams"], fmt, meta={"activity_id": result["activity_id"]})
 
-    if end_date:
-        end_date_dt = pd.to_datetime(end_date)
-        # Ajouter 1 jour pour inclure toute la journée de end_date
-        end_date_dt = end_date_dt + pd.Timedelta(days=1)
-        df = df[df["start_date"] < end_date_dt]
 
-    return {"activities": df.to_dict(orient="records")}
 
-@router.get("/last_activity")
-def last_activity(sport_type: Optional[str] = Query(None)):
-    result = get_last_activity(sport_type=sport_type)
-    if not result:
-        return {"message": f"Aucune activité trouvée pour le sport '{sport_type}'."}
-    return result
+@router.get("/activity_streams", dependencies=[Depends(etag_for("streams"))])
+def activity_streams(
+    activity_id: str = Query(..., description="ID de l'activité Strava"),
+    max_points: Optional[int] = Query(None, ge=3, le=20000, description="Sous-échantillonnage LTTB à max_points points"),
+    y_channel: str = Query("altitude", enum=LTTB_Y_CHANNELS, description="Canal dont la forme est préservée"),
+    format: Optional[str] = Query(None, enum=STREAM_FORMATS, description="Format des streams (défaut: records, ou selon Accept)"),
+    accept: Optional[str] = Header(None)
+):
+    df = get_streams_df(activity_id, max_points=max_points, y_channel=y_channel)
+    if df.empty:
+        return {"message": f"Aucune donnée de streams trouvée pour l'activité ID {activity_id}."}
 
-@router.get("/activities")
-def all_activities():
-    df = get_all_activities()
-    return df.to_dict(orient="records")
+    return stream_response(df, negotiate_stream_format(format, accept))
 
-@router.get("/last_activity_streams")
-def last_activity_streams(sport_type: Optional[str] = Query(None)):
-    return get_last_activity_streams(sport_type)
 
+MAX_BULK_ACTIVITIES = 100
 
 
-@router.get("/activity_streams")
-def activity_streams(activity_id: str = Query(..., description="ID de l'activité Strava")):
-    streams = get_streams_for_activity(activity_id)
-    if not streams:
-        return {"message": f"Aucune donnée de streams trouvée pour l'activité ID {activity_id}."}
+@router.get("/bulk_streams", dependencies=[Depends(etag_for("streams"))])
+def bulk_streams(
+    activity_ids: List[str] = Query(..., description="IDs des activités (paramètre répété)"),
+    max_points: Optional[int] = Query(None, ge=3, le=20000, description="Sous-échantillonnage LTTB à max_points points"),
+    y_channel: str = Query("altitude", enum=LTTB_Y_CHANNELS, description="Canal dont la forme est préservée"),
+    format: str = Query("columnar", enum=["records", "columnar", "delta"], description="Format des streams de chaque ligne")
+):
+    """
+    Streams de plusieurs activités en NDJSON : une ligne {"activity_id", "streams"} par activité,
+    envoyée dès qu'elle est lue (streams null si l'activité n'en a pas).
+    Le front peut afficher chaque activité dès réception de sa ligne.
+    """
+    if len(activity_ids) > MAX_BULK_ACTIVITIES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Maximum {MAX_BULK_ACTIVITIES} activités par requête"
+        )
 
-    # Extraire les coordonnées pour le polyligne
-    coords = [(point['lat'], point['lon']) for point in streams if point['lat'] is not None and point['lon'] is not None]
+    def ndjson_lines():
+        for activity_id, df in iter_activities_streams(activity_ids, max_points=max_points, y_channel=y_channel):
+            streams = json_streams_payload(df, format) if df is not None else None
+            yield json_dumps({"activity_id": activity_id, "format": format, "streams": streams}) + b"\n"
 
-    return {
-        "streams": streams
-    }
+    return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
 
 
-@router.get("/activity_detail/{activity_id}")
-def activity_detail(activity_id: str):
+@router.get("/activity_detail/{activity_id}", dependencies=[Depends(etag_for("activites", "streams"))])
+def activity_detail(
+    activity_id: str,
+    max_points: Optional[int] = Query(None, ge=3, le=20000, description="Sous-échantillonnage LTTB à max_points points"),
+    y_channel: str = Query("altitude", enum=LTTB_Y_CHANNELS, description="Canal dont la forme est préservée"),
+    format: Optional[str] = Query(None, enum=STREAM_FORMATS, description="Format des streams (défaut: records, ou selon Accept)"),
+    accept: Optional[str] = Header(None),
+    fields: Optional[str] = Query(None, description="Colonnes à renvoyer, séparées par des virgules (ex: id,name,distance)")
+):
     """
     Renvoie les détails complets d'une activité avec ses streams.
     Inclut: info globale + streams (lat, lon, altitude, distance_m, time_s, heartrate, cadence, velocity_smooth, temp, power, grade_smooth)
     """
-    # Récupérer les infos générales de l'activité
-    df = get_all_activities()
-    activity_info = df[df["id"] == int(activity_id)]
-
-    if activity_info.empty:
+    # Activité + streams en une seule requête (clés primaires)
+    try:
+        detail = get_activity_detail(activity_id, max_points=max_points, y_channel=y_channel, fields=fields)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    if detail is None:
         return {"error": f"Activité {activity_id} introuvable"}
 
-    # Convertir en dict
-    activity = activity_info.iloc[0].to_dict()
-
-    # Récupérer les streams
-    streams = get_streams_for_activity(activity_id)
+    activity, df = detail
+    return stream_response(df, negotiate_stream_format(format, accept), meta={"activity": activity})
 
-    return {
-        "activity": activity,
-        "streams": streams if streams else []
-    }
 
+@router.get("/similar_routes/{activity_id}", dependencies=[Depends(etag_for("activites", "route_signature", "route_lsh"))])
+def similar_routes(
+    activity_id: int,
+    max_distance: float = Query(DEFAULT_MAX_FRECHET_M, gt=0, le=2000, description="Distance de Fréchet maximale entre les tracés (mètres)"),
+    sport_type: Optional[str] = Query(None, description="Filtrer par type de sport"),
+    limit: int = Query(100, ge=1, le=500, description="Nombre max d'activités (les plus récentes)")
+):
+    """
+    Activités sur le même parcours (même boucle, même sens) que l'activité donnée, avec la
+    similarité de Jaccard estimée et la distance de Fréchet (mètres) entre les tracés.
+    """
+    result = get_similar_routes(activity_id, max_frechet_m=max_distance, sport_type=sport_type, limit=limit)
+    if result is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Pas de tracé pour l'activité {activity_id}")
+    return FastJSONResponse(result)
 
 
 @router.post("/update_db")
@@ -148,7 +242,7 @@ def create_new_activity(activity: ActivityCreate):
         )
 
 
-@router.get("/activities/{activity_id}", response_model=ActivityResponse)
+@router.get("/activities/{activity_id}", response_model=ActivityResponse, dependencies=[Depends(etag_for("activites"))])
 def get_activity(activity_id: int):
     """
     Récupère une activité par son ID.
@@ -1,19 +1,24 @@
 """
 Router pour les analyses avancées
 """
-from fastapi import APIRouter, Query
-from services.analysis_service import calculate_rolling_hr_speed_correlation
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import Response
+from services.analysis_service import rolling_hr_speed_correlation_json
+from services.decoupling_service import get_decoupling_trend
+from utils.etag import etag_for
 
 router = APIRouter()
 
 
-@router.get("/rolling_hr_speed_correlation/{activity_id}")
+@router.get("/rolling_hr_speed_correlation/{activity_id}", dependencies=[Depends(etag_for("streams"))])
 def get_rolling_hr_speed_correlation(
-    activity_id: str,
+    activity_id: int,
     window_seconds: int = Query(180, description="Taille de la fenêtre glissante en secondes", ge=30, le=600)
 ):
     """
     Calcule la corrélation glissante entre fréquence cardiaque et vitesse.
+    Le résultat est mis en cache par (activité, fenêtre) jusqu'à la modification de ses streams.
 
     Args:
         activity_id: ID de l'activité Strava
@@ -22,5 +27,22 @@ def get_rolling_hr_speed_correlation(
     Returns:
         Données de corrélation glissante et points de rupture
     """
-    result = calculate_rolling_hr_speed_correlation(activity_id, window_seconds)
-    return result
+    payload = rolling_hr_speed_correlation_json(activity_id, window_seconds)
+    return Response(payload, media_type="application/json")
+
+
+@router.get("/decoupling", dependencies=[Depends(etag_for("activites", "activity_decoupling"))])
+def get_decoupling(
+    sport_type: Optional[str] = Query(None, description="Filtrer par type de sport"),
+    start_date: Optional[str] = Query(None, description="Activités après cette date YYYY-MM-DD"),
+    end_date: Optional[str] = Query(None, description="Activités avant cette date YYYY-MM-DD (incluse)")
+):
+    """
+    Évolution du découplage aérobie (Pa:HR) et de la dérive cardiaque.
+    Une valeur par activité et la médiane par semaine, calculées par scripts/compute_decoupling.py.
+    Date et sport sont lus dans activites : une activité modifiée change aussitôt la tendance.
+    """
+    try:
+        return get_decoupling_trend(sport_type=sport_type, start_date=start_date, end_date=end_date)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
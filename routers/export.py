@@ -0,0 +1,51 @@
+from fastapi import APIRouter, Query, HTTPException, status
+from fastapi.responses import StreamingResponse
+from typing import Optional, List
+from datetime import date
+from services.export_service import export_rows, EXPORT_FORMATS
+
+router = APIRouter()
+
+
+def _export_response(kind, format, start_date, end_date, sport_type):
+    try:
+        content = export_rows(kind, format, start_date=start_date, end_date=end_date, sport_type=sport_type)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except ImportError:
+        raise HTTPException(status_code=status.HTTP_406_NOT_ACCEPTABLE, detail="Export Parquet indisponible (pyarrow non installé)")
+
+    media_type, extension = EXPORT_FORMATS[format]
+    filename = f"eyesight_{kind}_{date.today().isoformat()}.{extension}"
+    return StreamingResponse(
+        content,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
+@router.get("/activities")
+def export_activities(
+    format: str = Query("csv", enum=list(EXPORT_FORMATS), description="Format du fichier"),
+    start_date: Optional[str] = Query(None, description="Activités à partir de cette date YYYY-MM-DD"),
+    end_date: Optional[str] = Query(None, description="Activités jusqu'à cette date incluse YYYY-MM-DD"),
+    sport_type: Optional[List[str]] = Query(None, description="Types de sport (paramètre répété)")
+):
+    """
+    Exporte toutes les activités (filtrées) en CSV, NDJSON ou Parquet, en streaming.
+    """
+    return _export_response("activities", format, start_date, end_date, sport_type)
+
+
+@router.get("/streams")
+def export_streams(
+    format: str = Query("csv", enum=list(EXPORT_FORMATS), description="Format du fichier"),
+    start_date: Optional[str] = Query(None, description="Activités à partir de cette date YYYY-MM-DD"),
+    end_date: Optional[str] = Query(None, description="Activités jusqu'à cette date incluse YYYY-MM-DD"),
+    sport_type: Optional[List[str]] = Query(None, description="Types de sport (paramètre répété)")
+):
+    """
+    Exporte les streams (un échantillon par ligne) des activités filtrées, en streaming.
+    Mémoire constante : lecture par curseur côté serveur, encodage par paquets de lignes.
+    """
+    return _export_response("streams", format, start_date, end_date, sport_type)
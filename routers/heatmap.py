@@ -0,0 +1,51 @@
+"""
+Router de la heatmap personnelle : tuiles z/x/y en PNG ou en tableau de comptes
+"""
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import Response
+from services.heatmap_service import get_heatmap_tile
+from utils.etag import etag_for
+from utils.heatmap import HEATMAP_MAX_ZOOM, HEATMAP_MIN_ZOOM, TILE_SIZE, colorize
+from utils.png import encode_png_rgba
+from utils.timing import span
+
+router = APIRouter()
+
+
+@router.get("/{z}/{x}/{y}", dependencies=[Depends(etag_for("heatmap_tiles"))])
+def heatmap_tile(
+    z: int,
+    x: int,
+    y: int,
+    format: str = Query("png", enum=["png", "array"], description="png (rendu couleur) ou array (comptes uint32)")
+):
+    """
+    Tuile Web Mercator de la heatmap (schéma XYZ, compatible Leaflet / MapLibre).
+
+    - png : image RGBA 256 x 256, intensité logarithmique saturée au pixel le plus fréquenté du zoom
+    - array : 256 x 256 comptes uint32 little-endian, ligne par ligne (application/octet-stream)
+
+    204 si aucune activité ne passe dans la tuile.
+    """
+    if not HEATMAP_MIN_ZOOM <= z <= HEATMAP_MAX_ZOOM:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Zoom disponible de {HEATMAP_MIN_ZOOM} à {HEATMAP_MAX_ZOOM}"
+        )
+    if not (0 <= x < 2 ** z and 0 <= y < 2 ** z):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Tuile {z}/{x}/{y} hors de la carte")
+
+    tile = get_heatmap_tile(z, x, y)
+    if tile is None:
+        return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+    counts, saturation = tile
+    if format == "array":
+        return Response(
+            counts.astype("<u4").tobytes(),
+            media_type="application/octet-stream",
+            headers={"X-Tile-Shape": f"{TILE_SIZE},{TILE_SIZE}", "X-Tile-Dtype": "uint32-le"}
+        )
+    with span("png"):
+        png = encode_png_rgba(colorize(counts, saturation))
+    return Response(png, media_type="image/png")
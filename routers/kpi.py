@@ -1,11 +1,13 @@
-from fastapi import APIRouter, Query
+from fastapi import APIRouter, Query, Depends, HTTPException, status
 from typing import Optional
 from services.kpi_service import prepare_kpis, calculate_streak
 from services.records_service import get_records_from_db, ensure_records_initialized
+from services.training_load_service import get_training_load
+from utils.etag import etag_for
 
 router = APIRouter()
 
-@router.get("/")
+@router.get("/", dependencies=[Depends(etag_for("activites"))])
 def get_kpis(
     start_date: Optional[str] = Query(None, description="Date de début YYYY-MM-DD"),
     end_date: Optional[str] = Query(None, description="Date de fin YYYY-MM-DD")
@@ -17,7 +19,7 @@ def get_kpis(
     return {"kpis": kpis}
 
 
-@router.get("/streak")
+@router.get("/streak", dependencies=[Depends(etag_for("activites"))])
 def get_streak():
     """
     Calcule la série d'activités hebdomadaires consécutives.
@@ -27,7 +29,26 @@ def get_streak():
     return streak_data
 
 
-@router.get("/records")
+@router.get("/training_load", dependencies=[Depends(etag_for("activites", "streams", "training_load_daily"))])
+def get_training_load_route(
+    start_date: Optional[str] = Query(None, description="Date de début YYYY-MM-DD (défaut: 180 jours avant la fin)"),
+    end_date: Optional[str] = Query(None, description="Date de fin YYYY-MM-DD (défaut: aujourd'hui)")
+):
+    """
+    Charge d'entraînement par jour : charge (TRIMP), CTL (forme, 42 j), ATL (fatigue, 7 j)
+    et TSB (fraîcheur = CTL - ATL de la veille).
+
+    La série est mise à jour de façon incrémentale avant la lecture : seuls les jours
+    modifiés depuis le dernier appel et les suivants sont recalculés. L'ETag dépend aussi
+    de la date du jour (utils/etag.py) : la série prolongée à minuit n'est pas servie en 304.
+    """
+    try:
+        return {"training_load": get_training_load(start_date=start_date, end_date=end_date)}
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
+@router.get("/records", dependencies=[Depends(etag_for("records"))])
 def get_records():
     """
     Retourne les records personnels de l'utilisateur depuis la base de données.
@@ -1,15 +1,17 @@
 import pandas as pd
 from services.activity_service import get_all_activities
-from fastapi import APIRouter, Query
+from fastapi import APIRouter, Query, Depends
 from typing import Optional, List
 from services.activity_service import *
 from services.plot_service import *
+from utils.json_response import FastJSONResponse
+from utils.etag import etag_for
 
 router = APIRouter()
 
 
 
-@router.get("/weekly_bar")
+@router.get("/weekly_bar", dependencies=[Depends(etag_for("activites"))])
 def weekly_bar(value_col: str = Query("moving_time", enum=["moving_time", "distance", "total_elevation_gain", "average_speed"]),
     weeks: int = Query(12, ge=1, le=52),
     sport_types: Optional[List[str]] = Query(None),
@@ -30,7 +32,7 @@ def weekly_bar(value_col: str = Query("moving_time", enum=["moving_time", "dista
     return weekly_df.to_dict(orient="records")
 
 
-@router.get("/repartition_run")
+@router.get("/repartition_run", dependencies=[Depends(etag_for("activites"))])
 def repartition_run(
     sport_type: Optional[List[str]] = Query(
         None, description="Nom du sport ou sports séparés par une virgule"
@@ -47,13 +49,13 @@ def repartition_run(
 
 
 
-@router.get("/calendar_heatmap")
+@router.get("/calendar_heatmap", dependencies=[Depends(etag_for("activites"))])
 def calendar_heatmap(value_col: str = "distance"):
     df = get_all_activities()
     return get_calendar_heatmap_data(df, value_col=value_col)
 
 
-@router.get("/daily_hours_bar")
+@router.get("/daily_hours_bar", dependencies=[Depends(etag_for("activites"))])
 def daily_hours_bar(week_offset: int = Query(0, ge=0, le=52)):
     # Récupérer suffisamment de semaines pour couvrir l'offset demandé
     weeks_to_fetch = week_offset + 1
@@ -61,19 +63,20 @@ def daily_hours_bar(week_offset: int = Query(0, ge=0, le=52)):
     return get_weekly_daily_barchart(df, week_offset)
 
 
-@router.get("/poster_dplus")
+@router.get("/poster_dplus", dependencies=[Depends(etag_for("activites", "streams"))])
 def poster_dplus(
     n: int = Query(40, description="Nombre d'activités à récupérer"),
-    sport_type: List[str] = Query(None, description="Types de sport à filtrer, ex: Trail,Run")
+    sport_type: List[str] = Query(None, description="Types de sport à filtrer, ex: Trail,Run"),
+    max_points: int = Query(POSTER_MAX_POINTS, ge=10, le=2000, description="Points par profil d'élévation")
 ):
-    data = get_poster_elev_profile(n=n, sport_type=sport_type)
+    data = get_poster_elev_profile(n=n, sport_type=sport_type, max_points=max_points)
     if not data:
         return {"message": "Aucune donnée de streams trouvée."}
 
-    return {"poster_dplus": data}
+    return FastJSONResponse({"poster_dplus": data})
 
 
-@router.get("/weekly_pace")
+@router.get("/weekly_pace", dependencies=[Depends(etag_for("activites"))])
 def weekly_pace(
     weeks: int = Query(12, ge=1, le=52),
     sport_types: Optional[List[str]] = Query(None),
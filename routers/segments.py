@@ -0,0 +1,72 @@
+"""
+Router des segments : création, liste, suppression et classement des efforts
+"""
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import Response
+from models.segment import SegmentCreate
+from services.segment_service import (
+    create_segment, delete_segment, get_leaderboard, get_segment, list_segments
+)
+from utils.etag import etag_for
+
+router = APIRouter()
+
+
+@router.post("/", status_code=status.HTTP_201_CREATED)
+def create_new_segment(segment: SegmentCreate):
+    """
+    Crée un segment (tracé du départ à l'arrivée) et recherche ses efforts dans tout l'historique.
+    Les activités importées ensuite sont comparées automatiquement aux segments existants.
+    """
+    try:
+        return create_segment(segment)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Erreur lors de la création du segment: {str(e)}"
+        )
+
+
+@router.get("/", dependencies=[Depends(etag_for("segments", "segment_efforts"))])
+def get_segments():
+    """
+    Liste des segments avec leur nombre d'efforts et le meilleur temps (secondes).
+    """
+    return {"segments": list_segments()}
+
+
+@router.get("/{segment_id}", dependencies=[Depends(etag_for("segments"))])
+def get_segment_by_id(segment_id: int):
+    """
+    Segment avec son tracé [[lat, lon], ...].
+    """
+    segment = get_segment(segment_id)
+    if segment is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Segment {segment_id} introuvable")
+    return segment
+
+
+@router.delete("/{segment_id}", status_code=status.HTTP_204_NO_CONTENT)
+def delete_segment_by_id(segment_id: int):
+    """
+    Supprime un segment et tous ses efforts.
+    """
+    if not delete_segment(segment_id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Segment {segment_id} introuvable")
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+
+@router.get("/{segment_id}/leaderboard", dependencies=[Depends(etag_for("segments", "segment_efforts"))])
+def segment_leaderboard(
+    segment_id: int,
+    limit: int = Query(50, ge=1, le=500, description="Nombre d'efforts"),
+    best_per_activity: bool = Query(True, description="Un seul effort (le meilleur) par activité")
+):
+    """
+    Classement des efforts sur le segment, du plus rapide au plus lent : temps écoulé entre
+    les portes (secondes, interpolé entre échantillons), distance parcourue et vitesse moyenne (km/h).
+    """
+    leaderboard = get_leaderboard(segment_id, limit=limit, best_per_activity=best_per_activity)
+    if leaderboard is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Segment {segment_id} introuvable")
+    return {"segment_id": segment_id, "efforts": leaderboard}
@@ -0,0 +1,83 @@
+"""
+Script to backfill the precomputed route geometry (activity_geometry table) of existing activities.
+
+New activities get their geometry at ingest (strava/store_data.py, services/activity_crud.py).
+This script decodes the summary polyline of every activity that has no geometry row yet,
+simplifies it for each zoom level and stores it, one transaction per batch. Interrupting it
+loses at most the batch in flight; restarting it resumes with the remaining activities.
+
+Run this after migration 0010 (see migrations/README.md).
+"""
+
+import sys
+import os
+import time
+import argparse
+from psycopg2 import connect
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from strava.params import HOST, DATABASE, USER, PASSWORD, PORT
+from utils.geometry import upsert_activity_geometries
+
+
+def get_activities_to_backfill(conn, recompute=False):
+    """Activity IDs without a geometry row (every activity with recompute=True)."""
+    with conn.cursor() as cur:
+        if recompute:
+            cur.execute("SELECT id FROM activites ORDER BY id")
+        else:
+            cur.execute("""
+                SELECT a.id
+                FROM activites a
+                WHERE NOT EXISTS (SELECT 1 FROM activity_geometry g WHERE g.activity_id = a.id)
+                ORDER BY a.id
+            """)
+        return [row[0] for row in cur.fetchall()]
+
+
+def backfill_geometry(batch_size=500, recompute=False):
+    """
+    Args:
+        batch_size: Number of activities per transaction
+        recompute: Recompute the geometry of every activity (e.g. after changing the zoom levels)
+    """
+    print("🚀 Démarrage du backfill des tracés...\n")
+
+    conn = connect(
+        host=HOST,
+        database=DATABASE,
+        user=USER,
+        password=PASSWORD,
+        port=PORT
+    )
+
+    try:
+        activity_ids = get_activities_to_backfill(conn, recompute=recompute)
+        print(f"📋 {len(activity_ids)} activités à traiter\n")
+
+        start_time = time.time()
+        for offset in range(0, len(activity_ids), batch_size):
+            batch = activity_ids[offset:offset + batch_size]
+            with conn.cursor() as cur:
+                cur.execute("SELECT id, map FROM activites WHERE id = ANY(%s)", (batch,))
+                upsert_activity_geometries(cur, cur.fetchall())
+            conn.commit()
+
+            done = offset + len(batch)
+            elapsed = time.time() - start_time
+            print(f"  ✅ {done}/{len(activity_ids)} activités ({done / elapsed:.0f} act/s)")
+
+        print("\n🎉 Backfill des tracés terminé")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill route geometry for existing activities")
+    parser.add_argument("--batch-size", type=int, default=500, help="Activities per transaction (default: 500)")
+    parser.add_argument("--recompute", action="store_true", help="Recompute every activity, not only the missing ones")
+    args = parser.parse_args()
+
+    backfill_geometry(batch_size=args.batch_size, recompute=args.recompute)
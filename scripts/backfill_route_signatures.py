@@ -0,0 +1,84 @@
+"""
+Script to backfill the route signatures (route_signature and route_lsh tables) of existing activities.
+
+New activities get their signature with their geometry at ingest (utils/geometry.py). This script
+computes it from the stored simplified route (activity_geometry) of every activity that has a
+route and no signature yet, one transaction per batch.
+
+Run this after migration 0015 (see migrations/README.md), and after scripts/backfill_geometry.py.
+"""
+
+import sys
+import os
+import time
+import argparse
+from psycopg2 import connect
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from strava.params import HOST, DATABASE, USER, PASSWORD, PORT
+from utils.geometry import ROUTE_SIGNATURE_ZOOM, coords_column
+from utils.route_signature import upsert_route_signatures
+
+
+def get_activities_to_sign(conn, recompute=False):
+    """Activity IDs with a route and no signature (every activity with a route with recompute=True)."""
+    with conn.cursor() as cur:
+        cur.execute(f"""
+            SELECT g.activity_id
+            FROM activity_geometry g
+            WHERE g.coords IS NOT NULL
+            {"" if recompute else "AND NOT EXISTS (SELECT 1 FROM route_signature s WHERE s.activity_id = g.activity_id)"}
+            ORDER BY g.activity_id
+        """)
+        return [row[0] for row in cur.fetchall()]
+
+
+def backfill_route_signatures(batch_size=500, recompute=False):
+    """
+    Args:
+        batch_size: Number of activities per transaction
+        recompute: Recompute every signature (e.g. after changing the MinHash or LSH parameters)
+    """
+    print("🚀 Démarrage du backfill des signatures de parcours...\n")
+
+    conn = connect(
+        host=HOST,
+        database=DATABASE,
+        user=USER,
+        password=PASSWORD,
+        port=PORT
+    )
+
+    try:
+        activity_ids = get_activities_to_sign(conn, recompute=recompute)
+        print(f"📋 {len(activity_ids)} activités à traiter\n")
+
+        start_time = time.time()
+        for offset in range(0, len(activity_ids), batch_size):
+            batch = activity_ids[offset:offset + batch_size]
+            with conn.cursor() as cur:
+                cur.execute(
+                    f"SELECT activity_id, {coords_column(ROUTE_SIGNATURE_ZOOM)} FROM activity_geometry WHERE activity_id = ANY(%s)",
+                    (batch,)
+                )
+                upsert_route_signatures(cur, cur.fetchall())
+            conn.commit()
+
+            done = offset + len(batch)
+            elapsed = time.time() - start_time
+            print(f"  ✅ {done}/{len(activity_ids)} activités ({done / elapsed:.0f} act/s)")
+
+        print("\n🎉 Backfill des signatures de parcours terminé")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill route signatures for existing activities")
+    parser.add_argument("--batch-size", type=int, default=500, help="Activities per transaction (default: 500)")
+    parser.add_argument("--recompute", action="store_true", help="Recompute every activity, not only the missing ones")
+    args = parser.parse_args()
+
+    backfill_route_signatures(batch_size=args.batch_size, recompute=args.recompute)
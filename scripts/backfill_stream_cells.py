@@ -0,0 +1,81 @@
+"""
+Script to backfill the spatial index (stream_cells table) of activities whose streams are already stored.
+
+New streams are indexed at ingest (strava/store_data.py). This script indexes every activity
+with fetched streams and no stream_cells row yet, one transaction per batch. Activities without
+GPS samples never get a row and are simply scanned again on the next run (cheap).
+
+Run this after migration 0014 (see migrations/README.md).
+"""
+
+import sys
+import os
+import time
+import argparse
+from psycopg2 import connect
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from strava.params import HOST, DATABASE, USER, PASSWORD, PORT
+from utils.spatial import index_stream_cells
+
+
+def get_activities_to_index(conn, recompute=False):
+    """Activity IDs with fetched streams and no stream_cells row (every one with recompute=True)."""
+    with conn.cursor() as cur:
+        cur.execute(f"""
+            SELECT ss.activity_id
+            FROM stream_status ss
+            WHERE ss.status = 'fetched'
+            {"" if recompute else "AND NOT EXISTS (SELECT 1 FROM stream_cells c WHERE c.activity_id = ss.activity_id)"}
+            ORDER BY ss.activity_id
+        """)
+        return [row[0] for row in cur.fetchall()]
+
+
+def backfill_stream_cells(batch_size=200, recompute=False):
+    """
+    Args:
+        batch_size: Number of activities per transaction
+        recompute: Rebuild the index of every activity (e.g. after changing GRID_CELL_DEG)
+    """
+    print("🚀 Démarrage du backfill de l'index spatial...\n")
+
+    conn = connect(
+        host=HOST,
+        database=DATABASE,
+        user=USER,
+        password=PASSWORD,
+        port=PORT
+    )
+
+    try:
+        activity_ids = get_activities_to_index(conn, recompute=recompute)
+        print(f"📋 {len(activity_ids)} activités à indexer\n")
+
+        start_time = time.time()
+        for offset in range(0, len(activity_ids), batch_size):
+            batch = activity_ids[offset:offset + batch_size]
+            with conn.cursor() as cur:
+                if recompute:
+                    cur.execute("DELETE FROM stream_cells WHERE activity_id = ANY(%s)", (batch,))
+                cells = index_stream_cells(cur, "streams", activity_ids=batch)
+            conn.commit()
+
+            done = offset + len(batch)
+            elapsed = time.time() - start_time
+            print(f"  ✅ {done}/{len(activity_ids)} activités, {cells} cellules ({done / elapsed:.0f} act/s)")
+
+        print("\n🎉 Backfill de l'index spatial terminé")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill the spatial grid index for existing streams")
+    parser.add_argument("--batch-size", type=int, default=200, help="Activities per transaction (default: 200)")
+    parser.add_argument("--recompute", action="store_true", help="Rebuild every activity, not only the missing ones")
+    args = parser.parse_args()
+
+    backfill_stream_cells(batch_size=args.batch_size, recompute=args.recompute)
@@ -2,90 +2,143 @@
 Script to backfill new stream data for existing activities.
 
 This script will:
-1. Get all activity IDs from the database
+1. Get the activity IDs that have streams but are not yet in the checkpoint table
 2. Fetch the new stream data (heartrate, cadence, velocity_smooth, temp, power, grade_smooth)
-3. Update existing stream records with new data using PostgreSQL UPDATE queries
+   concurrently, sharing one quota-aware Strava rate limiter between workers
+3. Per batch: COPY the fetched streams into the staging table, run one set-based
+   UPDATE ... FROM staging, and record the completed activities in the checkpoint table
+   in the same transaction
 
-Run this after the migration to add new stream columns.
+Killing the script loses at most the batch in flight; restarting it resumes exactly
+from the checkpoint table. Use --reset to start over.
+
+Run this after the migration that adds the new stream columns (see migrations/README.md).
 """
 
 import sys
 import os
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from psycopg2 import connect
 from psycopg2.extras import execute_values
 import pandas as pd
-import time
+import requests
 
 # Add parent directory to path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from strava.fetch_strava import get_strava_header, fetch_stream, get_all_activity_ids_from_db
-from strava.params import HOST, DATABASE, USER, PASSWORD, PORT, TABLE_NAME
+from strava.fetch_strava import get_strava_header, fetch_stream
+from strava.rate_limit import StravaRateLimiter
+from strava.store_data import copy_streams_to_staging, STREAMS_STAGING_TABLE
+from strava.params import HOST, DATABASE, USER, PASSWORD, PORT
+
 
+BACKFILL_COLUMNS = ['heartrate', 'cadence', 'velocity_smooth', 'temp', 'power', 'grade_smooth']
 
-def get_activities_in_streams(conn):
-    """Get unique activity IDs that already have streams in the database."""
+
+def get_activities_to_backfill(conn):
+    """Activity IDs that have streams in the database and are not checkpointed yet, in numeric order."""
     with conn.cursor() as cur:
-        cur.execute("SELECT DISTINCT activity_id FROM streams ORDER BY activity_id")
+        cur.execute("""
+            SELECT s.activity_id
+            FROM (SELECT DISTINCT activity_id FROM streams) s
+            WHERE NOT EXISTS (
+                SELECT 1 FROM stream_backfill_checkpoint c
+                WHERE c.activity_id = s.activity_id
+            )
+            ORDER BY s.activity_id::BIGINT
+        """)
         return [row[0] for row in cur.fetchall()]
 
 
-def update_streams_with_new_data(conn, df_stream, activity_id):
+def reset_checkpoint(conn):
+    with conn.cursor() as cur:
+        cur.execute("TRUNCATE stream_backfill_checkpoint")
+    conn.commit()
+
+
+def fetch_activity_stream(activity_id, header, rate_limiter):
     """
-    Update existing stream records with new data fields.
-    Uses UPDATE queries to add the new stream data to existing rows.
+    Fetch one activity's streams (runs in a worker thread).
+
+    Returns:
+        (activity_id, DataFrame or None, error or None) - a 404 is a completed
+        activity with no data, any other error is retried on the next run.
     """
-    if df_stream.empty:
-        print(f"  ⚠️  Pas de données stream pour l'activité {activity_id}")
-        return 0
+    try:
+        return activity_id, fetch_stream(activity_id, header, rate_limiter=rate_limiter), None
+    except requests.HTTPError as e:
+        if e.response is not None and e.response.status_code == 404:
+            return activity_id, pd.DataFrame(), None
+        return activity_id, None, e
+    except Exception as e:
+        return activity_id, None, e
+
+
+def update_streams_batch(conn, results):
+    """
+    Apply one batch: COPY to staging, one UPDATE ... FROM staging, checkpoint rows.
+    Everything is committed together.
+
+    Args:
+        results: list of (activity_id, DataFrame) successfully fetched
+
+    Returns:
+        dict {activity_id: rows updated}
+    """
+    frames = [df for _, df in results if df is not None and not df.empty]
 
     with conn.cursor() as cur:
-        # Prepare update data
-        updates = []
-        for _, row in df_stream.iterrows():
-            updates.append((
-                row.get('heartrate'),
-                row.get('cadence'),
-                row.get('velocity_smooth'),
-                row.get('temp'),
-                row.get('power'),
-                row.get('grade_smooth'),
-                str(activity_id),
-                float(row['time_s'])
-            ))
-
-        # Batch update with explicit type casting
-        update_query = """
-            UPDATE streams
-            SET heartrate = data.heartrate::INTEGER,
-                cadence = data.cadence::INTEGER,
-                velocity_smooth = data.velocity_smooth::DOUBLE PRECISION,
-                temp = data.temp::INTEGER,
-                power = data.power::INTEGER,
-                grade_smooth = data.grade_smooth::DOUBLE PRECISION
-            FROM (VALUES %s) AS data(heartrate, cadence, velocity_smooth, temp, power, grade_smooth, activity_id, time_s)
-            WHERE streams.activity_id = data.activity_id
-            AND streams.time_s = data.time_s::DOUBLE PRECISION
-        """
-
-        execute_values(cur, update_query, updates)
-        updated_count = cur.rowcount
-
-    return updated_count
-
-
-def backfill_streams(start_from=None, max_activities=None, max_per_15min=590):
+        updated_per_activity = {}
+
+        if frames:
+            batch_df = pd.concat(frames, ignore_index=True)
+            copy_streams_to_staging(cur, batch_df)
+
+            set_clause = ",\n                    ".join(f"{col} = st.{col}" for col in BACKFILL_COLUMNS)
+            cur.execute(f"""
+                WITH updated AS (
+                    UPDATE streams s
+                    SET {set_clause}
+                    FROM {STREAMS_STAGING_TABLE} st
+                    WHERE s.activity_id = st.activity_id
+                    AND s.time_s = st.time_s
+                    RETURNING s.activity_id
+                )
+                SELECT activity_id, COUNT(*) FROM updated GROUP BY activity_id
+            """)
+            updated_per_activity = {row[0]: row[1] for row in cur.fetchall()}
+            cur.execute(f"TRUNCATE {STREAMS_STAGING_TABLE}")
+
+        checkpoints = [
+            (str(activity_id), updated_per_activity.get(str(activity_id), 0))
+            for activity_id, _ in results
+        ]
+        execute_values(cur, """
+            INSERT INTO stream_backfill_checkpoint (activity_id, rows_updated)
+            VALUES %s
+            ON CONFLICT (activity_id) DO UPDATE
+            SET rows_updated = EXCLUDED.rows_updated, completed_at = NOW()
+        """, checkpoints)
+
+    conn.commit()
+    return {activity_id: updated_per_activity.get(str(activity_id), 0) for activity_id, _ in results}
+
+
+def backfill_streams(max_activities=None, max_per_15min=590, workers=4, batch_size=25, reset=False):
     """
     Backfill new stream data for all existing activities.
 
     Args:
-        start_from: Activity ID to start from (useful for resuming)
         max_activities: Maximum number of activities to process (None = all)
         max_per_15min: Max API calls per 15 minutes to respect Strava rate limits
+        workers: Number of concurrent Strava requests
+        batch_size: Number of activities per database batch (one UPDATE + commit)
+        reset: Clear the checkpoint table before starting
     """
     print("🚀 Démarrage du backfill des streams...\n")
 
-    # Connect to database
     conn = connect(
         host=HOST,
         database=DATABASE,
@@ -96,69 +149,81 @@ def backfill_streams(start_from=None, max_activities=None, max_per_15min=590):
     conn.autocommit = False
 
     try:
-        # Get Strava API header
+        if reset:
+            reset_checkpoint(conn)
+            print("♻️  Points de reprise effacés\n")
+
         print("🔑 Authentification Strava...")
         header = get_strava_header()
 
-        # Get all activities that have streams
-        print("📋 Récupération des activités ayant des streams...")
-        activity_ids = get_activities_in_streams(conn)
-        print(f"   ✅ {len(activity_ids)} activités trouvées\n")
+        print("📋 Récupération des activités restant à traiter...")
+        activity_ids = get_activities_to_backfill(conn)
+        print(f"   ✅ {len(activity_ids)} activités à traiter (les activités déjà terminées sont ignorées)\n")
 
-        # Filter by start_from if specified
-        if start_from:
-            activity_ids = [aid for aid in activity_ids if str(aid) >= str(start_from)]
-            print(f"   ⏩ Démarrage depuis l'activité {start_from}")
-            print(f"   📊 {len(activity_ids)} activités à traiter\n")
-
-        # Limit if specified
         if max_activities:
             activity_ids = activity_ids[:max_activities]
             print(f"   🎯 Limitation à {max_activities} activités\n")
 
-        # Process activities
+        rate_limiter = StravaRateLimiter(max_per_15min=max_per_15min)
         total_updated = 0
-        api_calls = 0
+        completed = 0
+        failed = []
+        batch = []
         start_time = time.time()
 
-        for i, activity_id in enumerate(activity_ids, 1):
-            # Rate limiting
-            if api_calls >= max_per_15min:
-                elapsed = time.time() - start_time
-                wait_time = 15 * 60 - elapsed
-
-                if wait_time > 0:
-                    print(f"\n⏸  Limite Strava atteinte ({max_per_15min} appels)")
-                    print(f"   ⏳ Pause de {int(wait_time/60)} minutes...")
-                    time.sleep(wait_time)
-
-                # Reset counters
-                api_calls = 0
-                start_time = time.time()
-
+        def flush(batch):
+            nonlocal total_updated, completed
             try:
-                print(f"[{i}/{len(activity_ids)}] Activité {activity_id}...")
-
-                # Fetch stream data
-                df_stream = fetch_stream(activity_id, header)
-                api_calls += 1
-
-                # Update database
-                updated = update_streams_with_new_data(conn, df_stream, activity_id)
-                conn.commit()
-
-                total_updated += updated
-                print(f"  ✅ {updated} lignes mises à jour")
-
+                updated = update_streams_batch(conn, batch)
             except Exception as e:
-                print(f"  ❌ Erreur: {e}")
                 conn.rollback()
-                continue
-
+                print(f"  ❌ Erreur sur le batch ({len(batch)} activités), repris au prochain lancement: {e}")
+                return
+            total_updated += sum(updated.values())
+            completed += len(batch)
+            elapsed = time.time() - start_time
+            print(f"  ✅ {completed}/{len(activity_ids)} activités - {total_updated} lignes mises à jour "
+                  f"({completed / elapsed:.1f} act/s)")
+
+        # Fenêtre glissante de requêtes : les workers continuent de télécharger
+        # pendant que le thread principal écrit le batch précédent en base
+        pending_ids = iter(activity_ids)
+        in_flight = set()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            def submit_next():
+                activity_id = next(pending_ids, None)
+                if activity_id is not None:
+                    in_flight.add(executor.submit(fetch_activity_stream, activity_id, header, rate_limiter))
+
+            for _ in range(workers * 2):
+                submit_next()
+
+            while in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    in_flight.discard(future)
+                    activity_id, df_stream, error = future.result()
+                    if error is not None:
+                        print(f"  ❌ Activité {activity_id}: {error}")
+                        failed.append(activity_id)
+                    else:
+                        batch.append((activity_id, df_stream))
+                    submit_next()
+
+                if len(batch) >= batch_size:
+                    flush(batch)
+                    batch = []
+
+        if batch:
+            flush(batch)
+
+        quota = rate_limiter.snapshot()
         print(f"\n✅ Backfill terminé!")
         print(f"   📊 Total: {total_updated} lignes mises à jour")
-        print(f"   🔄 {len(activity_ids)} activités traitées")
-        print(f"   📞 {api_calls} appels API effectués")
+        print(f"   🔄 {completed} activités traitées")
+        print(f"   📞 {quota['total_calls']} appels API effectués")
+        if failed:
+            print(f"   ⚠️  {len(failed)} activités en erreur, elles seront retentées au prochain lancement")
 
     except Exception as e:
         print(f"\n❌ Erreur fatale: {e}")
@@ -170,17 +235,19 @@ def backfill_streams(start_from=None, max_activities=None, max_per_15min=590):
 
 
 if __name__ == "__main__":
-    import argparse
-
     parser = argparse.ArgumentParser(description="Backfill new stream data for existing activities")
-    parser.add_argument("--start-from", type=str, help="Activity ID to start from (resume)")
     parser.add_argument("--max", type=int, help="Maximum number of activities to process")
     parser.add_argument("--rate-limit", type=int, default=590, help="Max API calls per 15 minutes (default: 590)")
+    parser.add_argument("--workers", type=int, default=4, help="Concurrent Strava requests (default: 4)")
+    parser.add_argument("--batch-size", type=int, default=25, help="Activities per database batch (default: 25)")
+    parser.add_argument("--reset", action="store_true", help="Clear the checkpoint table and start over")
 
     args = parser.parse_args()
 
     backfill_streams(
-        start_from=args.start_from,
         max_activities=args.max,
-        max_per_15min=args.rate_limit
+        max_per_15min=args.rate_limit,
+        workers=args.workers,
+        batch_size=args.batch_size,
+        reset=args.reset
     )
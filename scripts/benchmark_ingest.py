@@ -0,0 +1,204 @@
+"""
+End-to-end ingest throughput benchmark against the fake Strava server.
+
+Starts scripts/fake_strava_server.py in-process, points the Strava client at it and runs,
+into a dedicated local PostgreSQL database:
+1. a full import: every activity page, clean_data, store_df_in_postgresql, then every stream
+2. an incremental sync: new activities are added on the fake server, then
+   update_service.update_activities_database() and update_service.update_streams_database()
+
+Reports activities/s and stream samples/s for each phase (with the fetch / store split
+for the full import), so ingest regressions show up without touching the real API.
+
+The benchmark TRUNCATEs the ingest tables of the target database: it refuses to run on the
+database configured in .env unless --force is given.
+
+Usage:
+    python scripts/benchmark_ingest.py --database eyesight_bench --activities 300 --incremental 30
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from dotenv import load_dotenv
+import requests
+
+import fake_strava_server
+
+
+def _configure_environment(server, database):
+    """Must run before importing strava.* / db.* : they read the environment at import time."""
+    load_dotenv()
+    os.environ["DATABASE"] = database
+    os.environ["AUTH_URL"] = f"{server.base_url}/oauth/token"
+    os.environ["ACTIVITES_URL"] = f"{server.base_url}/api/v3/athlete/activities"
+    os.environ["STRAVA_API_URL"] = f"{server.base_url}/api/v3"
+    os.environ["STRAVA_REFRESH_TOKEN"] = "bench-athlete-1"
+    os.environ["TABLE_NAME"] = "activites"
+    os.environ["TABLE_NAME2"] = "streams"
+
+
+def _quiet(verbose):
+    """Le code d'ingestion est très bavard : on coupe stdout pendant les mesures."""
+    return contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+
+
+def _count(cur, query):
+    cur.execute(query)
+    return list(cur.fetchone().values())[0]
+
+
+def run_benchmark(database, n_activities=200, n_incremental=20, latency_ms=80, stream_latency_ms=150,
+                  limit_15min=100_000, limit_day=1_000_000, verbose=False):
+    server = fake_strava_server.start_in_thread(
+        n_activities=n_activities,
+        latency_ms=latency_ms,
+        stream_latency_ms=stream_latency_ms,
+        limit_15min=limit_15min,
+        limit_day=limit_day,
+    )
+    _configure_environment(server, database)
+
+    from db.connection import get_conn
+    from db.schema import apply_migrations
+    from strava.params import HOST, DATABASE, USER, PASSWORD, PORT
+    from strava.fetch_strava import fetch_strava_data, get_strava_header, fetch_multiple_streams_df
+    from strava.clean_data import clean_data
+    from strava.store_data import store_df_in_postgresql, store_df_streams_copy, store_stream_status
+    from strava.rate_limit import StravaRateLimiter
+    from services import update_service
+
+    print(f"🏁 Fake Strava sur {server.base_url} - base '{DATABASE}'")
+    with _quiet(verbose):
+        apply_migrations()
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute("TRUNCATE activites, streams, records, heatmap_activity, heatmap_tiles CASCADE")
+        conn.commit()
+
+    results = {}
+
+    # ---- Import complet ----
+    print(f"📥 Import complet de {n_activities} activités...")
+    with _quiet(verbose):
+        t0 = time.perf_counter()
+        activities_df = fetch_strava_data()
+        t_fetch = time.perf_counter()
+        store_df_in_postgresql(clean_data(activities_df), host=HOST, database=DATABASE,
+                               user=USER, password=PASSWORD, port=PORT)
+        t_store = time.perf_counter()
+
+        activity_ids = update_service.get_activities_without_streams()
+        rate_limiter = StravaRateLimiter(max_per_15min=limit_15min)
+        t1 = time.perf_counter()
+        streams_df, no_stream_ids, failed = fetch_multiple_streams_df(
+            activity_ids, get_strava_header(), rate_limiter=rate_limiter, return_status=True
+        )
+        t_streams_fetch = time.perf_counter()
+        store_df_streams_copy(streams_df, host=HOST, database=DATABASE, user=USER, password=PASSWORD, port=PORT)
+        store_stream_status(no_stream_ids, failed, host=HOST, database=DATABASE, user=USER, password=PASSWORD, port=PORT)
+        t_streams_store = time.perf_counter()
+
+    n_samples = len(streams_df)
+    results["full_import"] = {
+        "activities": len(activities_df),
+        "samples": n_samples,
+        "activities_fetch_s": round(t_fetch - t0, 3),
+        "activities_store_s": round(t_store - t_fetch, 3),
+        "streams_fetch_s": round(t_streams_fetch - t1, 3),
+        "streams_store_s": round(t_streams_store - t_streams_fetch, 3),
+        "activities_per_s": round(len(activities_df) / (t_store - t0), 1),
+        "samples_per_s": round(n_samples / (t_streams_store - t1), 1),
+        "store_samples_per_s": round(n_samples / max(t_streams_store - t_streams_fetch, 1e-9), 1),
+    }
+
+    # ---- Synchronisation incrémentale ----
+    print(f"🔁 Synchronisation incrémentale de {n_incremental} nouvelles activités...")
+    requests.post(f"{server.base_url}/_fake/add_activities", params={"athlete": 1, "count": n_incremental})
+
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            samples_before = _count(cur, "SELECT COUNT(*) FROM streams")
+
+    with _quiet(verbose):
+        t0 = time.perf_counter()
+        update_service.update_activities_database()
+        t_activities = time.perf_counter()
+        update_service.update_streams_database(batch_size=n_incremental)
+        t_streams = time.perf_counter()
+
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            samples_after = _count(cur, "SELECT COUNT(*) FROM streams")
+
+    new_samples = samples_after - samples_before
+    results["incremental_sync"] = {
+        "activities": n_incremental,
+        "samples": new_samples,
+        "activities_s": round(t_activities - t0, 3),
+        "streams_s": round(t_streams - t_activities, 3),
+        "activities_per_s": round(n_incremental / (t_streams - t0), 1),
+        "samples_per_s": round(new_samples / max(t_streams - t_activities, 1e-9), 1),
+    }
+
+    server.shutdown()
+    return results
+
+
+def print_report(results):
+    full = results["full_import"]
+    inc = results["incremental_sync"]
+    print("\n📊 Résultats")
+    print(f"   Import complet      : {full['activities']} activités, {full['samples']} échantillons")
+    print(f"     activités         : fetch {full['activities_fetch_s']} s, store {full['activities_store_s']} s "
+          f"-> {full['activities_per_s']} act/s")
+    print(f"     streams           : fetch {full['streams_fetch_s']} s, store {full['streams_store_s']} s "
+          f"-> {full['samples_per_s']} éch/s (store seul : {full['store_samples_per_s']} éch/s)")
+    print(f"   Sync incrémentale   : {inc['activities']} activités, {inc['samples']} échantillons")
+    print(f"     activités {inc['activities_s']} s, streams {inc['streams_s']} s "
+          f"-> {inc['activities_per_s']} act/s, {inc['samples_per_s']} éch/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingest throughput benchmark against a fake Strava server")
+    parser.add_argument("--database", required=True, help="Dedicated benchmark database (tables are truncated)")
+    parser.add_argument("--activities", type=int, default=200, help="Activities for the full import (default: 200)")
+    parser.add_argument("--incremental", type=int, default=20, help="New activities for the incremental sync (default: 20)")
+    parser.add_argument("--latency-ms", type=float, default=80, help="Median latency of list/auth calls (default: 80)")
+    parser.add_argument("--stream-latency-ms", type=float, default=150, help="Median latency of stream calls (default: 150)")
+    parser.add_argument("--limit-15min", type=int, default=100_000, help="Fake server 15-minute quota (default: 100000)")
+    parser.add_argument("--limit-day", type=int, default=1_000_000, help="Fake server daily quota (default: 1000000)")
+    parser.add_argument("--json", help="Write the results to this JSON file")
+    parser.add_argument("--force", action="store_true", help="Allow running on the database configured in .env")
+    parser.add_argument("--verbose", action="store_true", help="Keep the ingest code output")
+    args = parser.parse_args()
+
+    load_dotenv()
+    if args.database == os.getenv("DATABASE") and not args.force:
+        print(f"❌ '{args.database}' est la base configurée dans .env : utilisez une base dédiée ou --force")
+        sys.exit(1)
+
+    results = run_benchmark(
+        args.database,
+        n_activities=args.activities,
+        n_incremental=args.incremental,
+        latency_ms=args.latency_ms,
+        stream_latency_ms=args.stream_latency_ms,
+        limit_15min=args.limit_15min,
+        limit_day=args.limit_day,
+        verbose=args.verbose,
+    )
+    print_report(results)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\n💾 Résultats écrits dans {args.json}")
@@ -0,0 +1,125 @@
+"""
+Benchmark of JSON encoding and response compression for a stream-heavy payload.
+
+Builds the /activities/activity_detail/{id} payload of a synthetic 3-hour activity
+(1 Hz, 10,800 samples, every stream channel) and measures, without a database:
+1. encode time with FastAPI's default path (jsonable_encoder + JSONResponse)
+2. encode time with FastJSONResponse, through jsonable_encoder and returned directly
+3. bytes on the wire and compression time for identity / gzip / brotli
+
+Usage:
+    python scripts/benchmark_json.py
+    python scripts/benchmark_json.py --hours 6 --repeat 10
+"""
+
+import argparse
+import os
+import sys
+import time
+import zlib
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from utils.json_response import FastJSONResponse
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def build_activity_payload(hours=3.0, seed=42):
+    """Payload identique à celui de activity_detail : infos de l'activité + liste de points."""
+    rng = np.random.default_rng(seed)
+    n = int(hours * 3600)
+    t = np.arange(n, dtype=float)
+    velocity = np.clip(2.8 + np.cumsum(rng.normal(0, 0.02, n)) * 0.05, 1.0, 5.0)
+    distance = np.cumsum(velocity)
+    heading = np.cumsum(rng.normal(0, 0.01, n))
+
+    df = pd.DataFrame({
+        "distance_m": distance.round(1),
+        "altitude": (800 + 150 * np.sin(t / 1800) + rng.normal(0, 0.5, n)).round(1),
+        "time_s": t,
+        "lat": (45.9 + np.cumsum(np.cos(heading) * velocity) / 111_000).round(6),
+        "lon": (6.8 + np.cumsum(np.sin(heading) * velocity) / 78_000).round(6),
+        "heartrate": rng.integers(120, 175, n).astype(float),
+        "cadence": rng.integers(80, 92, n).astype(float),
+        "velocity_smooth": velocity.round(3),
+        "temp": np.full(n, 14.0),
+        "power": np.full(n, np.nan),
+        "grade_smooth": rng.normal(0, 4, n).round(1),
+    })
+    # Même conversion que get_streams_for_activity
+    streams = df.to_dict(orient="records")
+
+    activity = {
+        "id": 12_345_678_901, "name": "Sortie longue", "distance": distance[-1] / 1000,
+        "moving_time": n / 60, "sport_type": "Trail", "start_date": "2025-06-01T06:30:00",
+        "average_heartrate": 148.2, "total_elevation_gain": 1850.0,
+    }
+    return {"activity": activity, "streams": streams}
+
+
+def _best_of(repeat, func):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def run_benchmark(hours=3.0, repeat=5):
+    payload = build_activity_payload(hours)
+    results = {"samples": len(payload["streams"])}
+
+    # NaN -> None comme le ferait un endpoint avec le JSONResponse standard (allow_nan=False)
+    default_payload = {
+        "activity": payload["activity"],
+        "streams": [{k: (None if isinstance(v, float) and v != v else v) for k, v in point.items()}
+                    for point in payload["streams"]],
+    }
+
+    results["default_s"], _ = _best_of(repeat, lambda: JSONResponse(jsonable_encoder(default_payload)).body)
+    results["fast_via_encoder_s"], _ = _best_of(repeat, lambda: FastJSONResponse(jsonable_encoder(payload)).body)
+    results["fast_direct_s"], body = _best_of(repeat, lambda: FastJSONResponse(payload).body)
+
+    results["identity_bytes"] = len(body)
+    results["gzip_s"], gz = _best_of(repeat, lambda: zlib.compress(body, 6))
+    results["gzip_bytes"] = len(gz)
+    if brotli is not None:
+        results["brotli_s"], br = _best_of(repeat, lambda: brotli.compress(body, quality=4))
+        results["brotli_bytes"] = len(br)
+    return results
+
+
+def print_report(results):
+    print(f"\n📊 Activité de {results['samples']} échantillons")
+    print("   Encodage JSON (meilleur temps)")
+    print(f"     jsonable_encoder + JSONResponse   : {results['default_s'] * 1000:8.1f} ms")
+    print(f"     jsonable_encoder + FastJSONResponse: {results['fast_via_encoder_s'] * 1000:8.1f} ms")
+    print(f"     FastJSONResponse direct            : {results['fast_direct_s'] * 1000:8.1f} ms "
+          f"(x{results['default_s'] / results['fast_direct_s']:.0f})")
+    print("   Octets transférés")
+    print(f"     identity : {results['identity_bytes'] / 1024:8.0f} Ko")
+    print(f"     gzip -6  : {results['gzip_bytes'] / 1024:8.0f} Ko en {results['gzip_s'] * 1000:.1f} ms "
+          f"({results['identity_bytes'] / results['gzip_bytes']:.1f}:1)")
+    if "brotli_bytes" in results:
+        print(f"     brotli 4 : {results['brotli_bytes'] / 1024:8.0f} Ko en {results['brotli_s'] * 1000:.1f} ms "
+              f"({results['identity_bytes'] / results['brotli_bytes']:.1f}:1)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="JSON encoding and compression benchmark")
+    parser.add_argument("--hours", type=float, default=3.0, help="Activity duration at 1 Hz (default: 3)")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per measurement, best time kept (default: 5)")
+    args = parser.parse_args()
+
+    print_report(run_benchmark(hours=args.hours, repeat=args.repeat))
@@ -0,0 +1,31 @@
+"""
+Build the personal heatmap tile pyramid (heatmap_tiles table, see services/heatmap_service.py).
+
+Stream ingest adds new activities to the heatmap automatically; this script adds every activity
+with fetched streams that is not in the heatmap yet (first build after migration 0016).
+Tiles are additive: the build reports activities deleted or with changed streams since they
+were added; use --rebuild to drop them.
+
+Run this after migration 0016 (see migrations/README.md).
+"""
+
+import sys
+import os
+import argparse
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.heatmap_service import update_heatmap, HEATMAP_BATCH_SIZE
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the personal heatmap tile pyramid")
+    parser.add_argument("--batch-size", type=int, default=HEATMAP_BATCH_SIZE,
+                        help=f"Activities per transaction (default: {HEATMAP_BATCH_SIZE})")
+    parser.add_argument("--rebuild", action="store_true", help="Empty the heatmap and rebuild it from every stream")
+    args = parser.parse_args()
+
+    print("🚀 Construction de la heatmap...\n")
+    done = update_heatmap(batch_size=args.batch_size, rebuild=args.rebuild)
+    print(f"\n🎉 {done} activités ajoutées à la heatmap")
@@ -0,0 +1,31 @@
+"""
+Batch job computing aerobic decoupling (Pa:HR) and cardiac drift for every activity
+with heart rate and velocity streams (see services/decoupling_service.py).
+
+Only activities whose streams changed since the last run (stream_version) are recomputed,
+so the job can run after every stream sync. Use --recompute to redo the whole history.
+
+Run this after migration 0012 (see migrations/README.md).
+"""
+
+import sys
+import os
+import argparse
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.decoupling_service import run_decoupling_job, DECOUPLING_BATCH_SIZE
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compute aerobic decoupling for all activities")
+    parser.add_argument("--batch-size", type=int, default=DECOUPLING_BATCH_SIZE,
+                        help=f"Activities per stream read and transaction (default: {DECOUPLING_BATCH_SIZE})")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--recompute", action="store_true", help="Recompute every activity")
+    args = parser.parse_args()
+
+    print("🚀 Calcul du découplage aérobie...\n")
+    done = run_decoupling_job(batch_size=args.batch_size, workers=args.workers, recompute=args.recompute)
+    print(f"\n🎉 {done} activités analysées")
@@ -0,0 +1,448 @@
+"""
+Fake Strava HTTP server for offline ingest tests and benchmarks.
+
+Serves deterministic synthetic data with the same shapes as the real API:
+- POST /oauth/token                          -> access token (one athlete per refresh token)
+- GET  /api/v3/athlete/activities            -> paginated activity summaries (per_page, page, after)
+- GET  /api/v3/activities/{id}/streams       -> streams keyed by type (key_by_type=true)
+- POST /_fake/add_activities?count=N         -> appends N new activities (incremental sync tests)
+
+Every activity is generated from (athlete seed, activity index), so two runs see exactly the
+same data. About 10% of activities are indoor workouts without GPS. Responses carry
+X-RateLimit-* / X-ReadRateLimit-* headers and a 429 is returned once the 15-minute or daily
+budget is exhausted. Latency is log-normal around a configurable median.
+
+Usage:
+    python scripts/fake_strava_server.py --port 8765 --activities 300
+
+then point the ingest code at it:
+    AUTH_URL=http://localhost:8765/oauth/token
+    ACTIVITES_URL=http://localhost:8765/api/v3/athlete/activities
+    STRAVA_API_URL=http://localhost:8765/api/v3
+"""
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import numpy as np
+import polyline
+
+
+SPORTS = [
+    # (sport_type, share, speed m/s, cadence)
+    ("Run", 0.55, 3.1, 84),
+    ("TrailRun", 0.15, 2.4, 80),
+    ("Ride", 0.20, 7.5, 88),
+    ("Swim", 0.05, 0.9, 30),
+    ("Workout", 0.05, 0.0, 0),
+]
+
+HISTORY_START = datetime(2019, 1, 1, 7, 0, tzinfo=timezone.utc)
+BASE_ACTIVITY_ID = 10_000_000_000
+
+
+def _athlete_seed(refresh_token):
+    match = re.search(r"(\d+)$", refresh_token or "")
+    return int(match.group(1)) if match else 1
+
+
+class FakeAthlete:
+    """Deterministic synthetic athlete: activity i is a pure function of (seed, i)."""
+
+    def __init__(self, seed, n_activities):
+        self.seed = seed
+        self.n_activities = n_activities
+        rng = np.random.default_rng(seed)
+        self.home = (45.0 + rng.uniform(-2, 2), 5.0 + rng.uniform(-2, 2))
+        self._lock = threading.Lock()
+
+    def activity_id(self, index):
+        return BASE_ACTIVITY_ID + self.seed * 1_000_000 + index
+
+    def index_of(self, activity_id):
+        index = activity_id - BASE_ACTIVITY_ID - self.seed * 1_000_000
+        return index if 0 <= index < self.n_activities else None
+
+    def add_activities(self, count):
+        with self._lock:
+            self.n_activities += count
+            return self.n_activities
+
+    def _profile(self, index):
+        """Tirages communs au résumé et aux streams d'une activité."""
+        rng = np.random.default_rng([self.seed, index])
+        shares = np.array([sport[1] for sport in SPORTS])
+        sport_type, _, speed, cadence = SPORTS[rng.choice(len(SPORTS), p=shares / shares.sum())]
+        return {
+            "sport_type": sport_type,
+            "speed": speed,
+            "cadence": cadence,
+            "moving_time": int(rng.uniform(1800, 7200)),
+            "pause": int(rng.uniform(0, 600)),
+            "has_gps": sport_type != "Workout" and rng.random() > 0.05,
+            "has_hr": rng.random() > 0.1,
+            "rng": rng,
+        }
+
+    def start_date(self, index):
+        # Une activité toutes les ~31 heures : les nouvelles activités sont toujours plus récentes
+        offset = int(np.random.default_rng([self.seed, index, 2]).integers(0, 6))
+        return HISTORY_START + timedelta(hours=31 * index + offset)
+
+    def first_index_after(self, timestamp):
+        """Premier index dont la date de début est strictement après `timestamp`."""
+        after = datetime.fromtimestamp(timestamp, timezone.utc)
+        index = max(0, int((after - HISTORY_START).total_seconds() // (31 * 3600)) - 1)
+        while index < self.n_activities and self.start_date(index) <= after:
+            index += 1
+        return index
+
+    def summary(self, index):
+        profile = self._profile(index)
+        rng = profile["rng"]
+        sport_type = profile["sport_type"]
+        start = self.start_date(index)
+        moving_time = profile["moving_time"]
+        has_gps = profile["has_gps"]
+        has_hr = profile["has_hr"]
+
+        streams = self.streams(index)
+        distance = float(streams["distance"][-1]) if profile["speed"] > 0 else 0.0
+        altitude = streams["altitude"]
+        elevation = float(np.clip(np.diff(altitude), 0, None).sum()) if has_gps else 0.0
+
+        summary_polyline = ""
+        start_latlng = []
+        end_latlng = []
+        if has_gps:
+            coords = list(zip(streams["lat"][::30], streams["lon"][::30]))
+            summary_polyline = polyline.encode(coords, 5)
+            start_latlng = [float(streams["lat"][0]), float(streams["lon"][0])]
+            end_latlng = [float(streams["lat"][-1]), float(streams["lon"][-1])]
+
+        activity_id = self.activity_id(index)
+        return {
+            "resource_state": 2,
+            "athlete": {"id": self.seed, "resource_state": 1},
+            "name": f"{sport_type} #{index}",
+            "distance": round(distance, 1),
+            "moving_time": moving_time,
+            "elapsed_time": moving_time + profile["pause"],
+            "total_elevation_gain": round(elevation, 1),
+            "type": sport_type,
+            "sport_type": sport_type,
+            "workout_type": None,
+            "id": activity_id,
+            "start_date": start.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "start_date_local": (start + timedelta(hours=1)).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "timezone": "(GMT+01:00) Europe/Paris",
+            "utc_offset": 3600.0,
+            "achievement_count": int(rng.integers(0, 5)),
+            "kudos_count": int(rng.integers(0, 30)),
+            "comment_count": 0,
+            "athlete_count": 1,
+            "photo_count": 0,
+            "map": {"id": f"a{activity_id}", "summary_polyline": summary_polyline, "resource_state": 2},
+            "trainer": not has_gps,
+            "commute": False,
+            "manual": False,
+            "private": False,
+            "visibility": "everyone",
+            "flagged": False,
+            "gear_id": f"g{self.seed}",
+            "start_latlng": start_latlng,
+            "end_latlng": end_latlng,
+            "average_speed": round(distance / moving_time, 3),
+            "max_speed": round(float(streams["velocity_smooth"].max()), 3),
+            "average_cadence": float(profile["cadence"]) if profile["cadence"] else None,
+            "average_temp": 18,
+            "has_heartrate": has_hr,
+            "average_heartrate": round(float(streams["heartrate"].mean()), 1) if has_hr else None,
+            "max_heartrate": float(streams["heartrate"].max()) if has_hr else None,
+            "heartrate_opt_out": False,
+            "display_hide_heartrate_option": True,
+            "elev_high": round(float(altitude.max()), 1) if has_gps else None,
+            "elev_low": round(float(altitude.min()), 1) if has_gps else None,
+            "upload_id": activity_id + 7,
+            "upload_id_str": str(activity_id + 7),
+            "external_id": f"fake-{activity_id}.fit",
+            "from_accepted_tag": False,
+            "pr_count": int(rng.integers(0, 3)),
+            "total_photo_count": 0,
+            "has_kudoed": False,
+            "suffer_score": int(moving_time / 60 * rng.uniform(0.5, 1.5)) if has_hr else None,
+        }
+
+    def streams(self, index):
+        """Streams à 1 Hz de l'activité `index` (tableaux NumPy)."""
+        profile = self._profile(index)
+        rng = np.random.default_rng([self.seed, index, 1])
+        speed = profile["speed"]
+
+        time_s = np.arange(0, profile["moving_time"], dtype=np.int64)
+        n = len(time_s)
+        velocity = np.clip(speed * (1 + 0.15 * np.sin(time_s / 300.0)) + rng.normal(0, 0.2, n), 0, None)
+        if speed == 0:
+            velocity = np.zeros(n)
+        distance = np.cumsum(velocity)
+
+        # Boucle autour du domicile avec un peu de bruit GPS
+        total = max(float(distance[-1]), 1.0)
+        radius = total / (2 * np.pi) / 111_000
+        angle = 2 * np.pi * distance / total + rng.uniform(0, 2 * np.pi)
+        lat = self.home[0] + radius * np.sin(angle) + rng.normal(0, 2e-5, n)
+        lon = self.home[1] + radius * np.cos(angle) / np.cos(np.radians(self.home[0])) + rng.normal(0, 2e-5, n)
+
+        altitude = 300 + 40 * np.sin(distance / 1500.0) + rng.normal(0, 0.5, n)
+        grade = np.gradient(altitude) / np.maximum(velocity, 0.5) * 100
+        heartrate = np.clip(120 + 8 * velocity + 0.002 * time_s + rng.normal(0, 3, n), 60, 200).round()
+
+        return {
+            "time": time_s,
+            "distance": distance.round(1),
+            "lat": lat.round(6),
+            "lon": lon.round(6),
+            "altitude": altitude.round(1),
+            "velocity_smooth": velocity.round(3),
+            "grade_smooth": np.clip(grade, -40, 40).round(1),
+            "heartrate": heartrate.astype(int),
+            "cadence": np.full(n, profile["cadence"], dtype=int),
+            "temp": np.full(n, 18, dtype=int),
+            "power": (velocity * 30).round().astype(int) if profile["sport_type"] == "Ride" else None,
+        }
+
+
+class RateLimitState:
+    """Server-side rate-limit counters (15-minute windows aligned like Strava's, plus daily)."""
+
+    def __init__(self, limit_15min, limit_day, window_seconds=900):
+        self.limit_15min = limit_15min
+        self.limit_day = limit_day
+        self.window_seconds = window_seconds
+        self._lock = threading.Lock()
+        self._window = None
+        self._day = None
+        self.usage_15min = 0
+        self.usage_day = 0
+
+    def hit(self):
+        """Counts one request. Returns (allowed, headers)."""
+        with self._lock:
+            now = time.time()
+            window = int(now // self.window_seconds)
+            day = int(now // 86400)
+            if window != self._window:
+                self._window, self.usage_15min = window, 0
+            if day != self._day:
+                self._day, self.usage_day = day, 0
+
+            allowed = self.usage_15min < self.limit_15min and self.usage_day < self.limit_day
+            if allowed:
+                self.usage_15min += 1
+                self.usage_day += 1
+
+            limit = f"{self.limit_15min},{self.limit_day}"
+            usage = f"{self.usage_15min},{self.usage_day}"
+            headers = {
+                "X-RateLimit-Limit": limit,
+                "X-RateLimit-Usage": usage,
+                "X-ReadRateLimit-Limit": limit,
+                "X-ReadRateLimit-Usage": usage,
+            }
+            return allowed, headers
+
+
+class FakeStravaHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "FakeStrava/1.0"
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _latency(self, median_ms):
+        if median_ms > 0:
+            time.sleep(random.lognormvariate(np.log(median_ms / 1000.0), 0.35))
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _athlete(self):
+        auth = self.headers.get("Authorization", "")
+        match = re.match(r"Bearer fake-(\d+)$", auth)
+        if not match:
+            return None
+        return self.server.get_athlete(int(match.group(1)))
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        length = int(self.headers.get("Content-Length") or 0)
+        form = parse_qs(self.rfile.read(length).decode()) if length else {}
+        query = parse_qs(url.query)
+
+        if url.path == "/oauth/token":
+            seed = _athlete_seed((form.get("refresh_token") or [""])[0])
+            self.server.get_athlete(seed)
+            self._latency(self.server.latency_ms)
+            self._send_json(200, {
+                "token_type": "Bearer",
+                "access_token": f"fake-{seed}",
+                "refresh_token": f"fake-refresh-{seed}",
+                "expires_at": int(time.time()) + 6 * 3600,
+                "expires_in": 6 * 3600,
+            })
+            return
+
+        if url.path == "/_fake/add_activities":
+            seed = int((query.get("athlete") or ["1"])[0])
+            count = int((query.get("count") or ["10"])[0])
+            total = self.server.get_athlete(seed).add_activities(count)
+            self._send_json(200, {"athlete": seed, "n_activities": total})
+            return
+
+        self._send_json(404, {"message": "Record Not Found"})
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+
+        athlete = self._athlete()
+        if athlete is None:
+            self._send_json(401, {"message": "Authorization Error"})
+            return
+
+        allowed, rate_headers = self.server.rate_limit.hit()
+        if not allowed:
+            self._send_json(429, {
+                "message": "Rate Limit Exceeded",
+                "errors": [{"resource": "Application", "field": "rate limit", "code": "exceeded"}],
+            }, rate_headers)
+            return
+
+        if url.path == "/api/v3/athlete/activities":
+            self._latency(self.server.latency_ms)
+            per_page = min(int((query.get("per_page") or ["30"])[0]), 200)
+            page = max(int((query.get("page") or ["1"])[0]), 1)
+            after = int((query.get("after") or ["0"])[0])
+
+            if after:
+                # Avec `after`, Strava renvoie les activités de la plus ancienne à la plus récente
+                ordered = range(athlete.first_index_after(after), athlete.n_activities)
+            else:
+                ordered = range(athlete.n_activities - 1, -1, -1)
+
+            selected = ordered[(page - 1) * per_page:page * per_page]
+            self._send_json(200, [athlete.summary(i) for i in selected], rate_headers)
+            return
+
+        match = re.match(r"^/api/v3/activities/(\d+)/streams$", url.path)
+        if match:
+            self._latency(self.server.stream_latency_ms)
+            index = athlete.index_of(int(match.group(1)))
+            if index is None:
+                self._send_json(404, {"message": "Record Not Found"}, rate_headers)
+                return
+
+            streams = athlete.streams(index)
+            keys = (query.get("keys") or [""])[0].split(",")
+            profile = athlete._profile(index)
+            if not profile["has_gps"]:
+                keys = [k for k in keys if k in ("time", "heartrate")]
+            if not profile["has_hr"]:
+                keys = [k for k in keys if k != "heartrate"]
+
+            payload = {}
+            for key in keys:
+                if key == "latlng":
+                    data = np.column_stack([streams["lat"], streams["lon"]]).tolist()
+                elif key in streams and streams[key] is not None:
+                    data = streams[key].tolist()
+                else:
+                    continue
+                payload[key] = {
+                    "data": data,
+                    "series_type": "distance",
+                    "original_size": len(data),
+                    "resolution": "high",
+                }
+            self._send_json(200, payload, rate_headers)
+            return
+
+        self._send_json(404, {"message": "Record Not Found"}, rate_headers)
+
+
+class FakeStravaServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, n_activities=200, latency_ms=80, stream_latency_ms=150,
+                 limit_15min=600, limit_day=30000, window_seconds=900, verbose=False):
+        super().__init__(address, FakeStravaHandler)
+        self.n_activities = n_activities
+        self.latency_ms = latency_ms
+        self.stream_latency_ms = stream_latency_ms
+        self.rate_limit = RateLimitState(limit_15min, limit_day, window_seconds)
+        self.verbose = verbose
+        self._athletes = {}
+        self._athletes_lock = threading.Lock()
+
+    def get_athlete(self, seed):
+        with self._athletes_lock:
+            if seed not in self._athletes:
+                self._athletes[seed] = FakeAthlete(seed, self.n_activities)
+            return self._athletes[seed]
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+def start_in_thread(**kwargs):
+    """Starts a fake server on a free local port in a daemon thread and returns it."""
+    server = FakeStravaServer(("127.0.0.1", kwargs.pop("port", 0)), **kwargs)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline fake Strava API")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--activities", type=int, default=200, help="Activities per athlete (default: 200)")
+    parser.add_argument("--latency-ms", type=float, default=80, help="Median latency of list/auth calls")
+    parser.add_argument("--stream-latency-ms", type=float, default=150, help="Median latency of stream calls")
+    parser.add_argument("--limit-15min", type=int, default=600, help="Requests per 15-minute window (default: 600)")
+    parser.add_argument("--limit-day", type=int, default=30000, help="Requests per day (default: 30000)")
+    parser.add_argument("--window-seconds", type=int, default=900, help="Rate-limit window length (default: 900)")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    server = FakeStravaServer(
+        ("127.0.0.1", args.port),
+        n_activities=args.activities,
+        latency_ms=args.latency_ms,
+        stream_latency_ms=args.stream_latency_ms,
+        limit_15min=args.limit_15min,
+        limit_day=args.limit_day,
+        window_seconds=args.window_seconds,
+        verbose=args.verbose,
+    )
+    print(f"🏃 Fake Strava sur {server.base_url} ({args.activities} activités par athlète)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -7,6 +7,7 @@ from datetime import datetime
 from typing import Optional
 from db.connection import get_conn
 from models.activity import ActivityCreate, ActivityUpdate
+from utils.geometry import upsert_activity_geometries
 import pandas as pd
 
 
@@ -115,6 +116,16 @@ def create_activity(activity: ActivityCreate) -> dict:
 
             cur.execute(query, values)
             result = cur.fetchone()
+
+            # Activité manuelle : aucun stream Strava à récupérer
+            if result:
+                cur.execute("""
+                    INSERT INTO stream_status (activity_id, status, start_date)
+                    VALUES (%s, 'no_stream', %s)
+                    ON CONFLICT (activity_id) DO NOTHING;
+                """, (result['id'], result.get('start_date')))
+                upsert_activity_geometries(cur, [(result['id'], result.get('map'))])
+
             conn.commit()
 
             # Convertir le résultat en dict
@@ -202,6 +213,10 @@ def update_activity(activity_id: int, activity: ActivityUpdate) -> Optional[dict
 
             cur.execute(query, values)
             result = cur.fetchone()
+
+            if result:
+                upsert_activity_geometries(cur, [(result['id'], result.get('map'))])
+
             conn.commit()
 
             if result:
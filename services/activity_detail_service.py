@@ -0,0 +1,74 @@
+"""
+Détail d'une activité : l'activité et ses streams en un seul aller-retour.
+
+Une seule requête : lecture de l'activité par clé primaire, et agrégation de ses streams
+en un tableau par canal (LATERAL + array_agg) via la clé primaire (activity_id, time_s).
+Aucun parcours de la table activites, une seule connexion.
+"""
+import numpy as np
+import pandas as pd
+
+from db.connection import get_conn
+from services.activity_service import _json_safe, parse_fields
+from utils.lttb import lttb_downsample_df
+
+
+DETAIL_STREAM_CHANNELS = [
+    'distance_m', 'altitude', 'time_s', 'lat', 'lon',
+    'heartrate', 'cadence', 'velocity_smooth', 'temp', 'power', 'grade_smooth'
+]
+
+_STREAM_AGGREGATES = ",\n               ".join(
+    f"array_agg({col} ORDER BY time_s) AS s_{col}" for col in DETAIL_STREAM_CHANNELS
+)
+
+DETAIL_QUERY = """
+    SELECT {activity_columns}, s.*
+    FROM activites a
+    LEFT JOIN LATERAL (
+        SELECT {stream_aggregates}
+        FROM streams
+        WHERE activity_id = %(activity_key)s
+    ) s ON TRUE
+    WHERE a.id = %(activity_id)s
+"""
+
+
+def get_activity_detail(activity_id, max_points=None, y_channel="altitude", fields=None):
+    """
+    Récupère une activité et ses streams.
+
+    Args:
+        activity_id: ID de l'activité
+        max_points / y_channel: sous-échantillonnage LTTB des streams (None = tous les points)
+        fields: colonnes de l'activité à renvoyer ("id,name,distance"), None = toutes
+
+    Returns:
+        tuple (dict activité, DataFrame des streams) ou None si l'activité n'existe pas
+
+    Raises:
+        ValueError: si un champ demandé n'existe pas
+    """
+    columns = parse_fields(fields)
+    activity_columns = ", ".join(f"a.{col}" for col in columns) if columns else "a.*"
+    query = DETAIL_QUERY.format(activity_columns=activity_columns, stream_aggregates=_STREAM_AGGREGATES)
+
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute(query, {"activity_id": int(activity_id), "activity_key": str(activity_id)})
+            row = cur.fetchone()
+
+    if row is None:
+        return None
+
+    activity = {key: _json_safe(value) for key, value in row.items() if not key.startswith("s_")}
+
+    if row["s_time_s"] is None:
+        streams = pd.DataFrame(columns=DETAIL_STREAM_CHANNELS)
+    else:
+        streams = pd.DataFrame({
+            col: np.array(row[f"s_{col}"], dtype=float) for col in DETAIL_STREAM_CHANNELS
+        })
+        streams = lttb_downsample_df(streams, max_points, y_col=y_channel)
+
+    return activity, streams
@@ -1,18 +1,28 @@
 import pandas as pd
 import json
-import polyline
+import base64
+import math
 from db.connection import *
 import numpy as np
 from datetime import timedelta, datetime
+from utils.geometry import coords_column, route_geometry
+from utils.lttb import lttb_downsample_df
+from utils.metrics import add_rows_read
+from utils.timing import span
 
 def get_all_activities():
     """Récupère toutes les activités dans un DataFrame et rend les données JSON-compliant."""
-    with get_conn() as conn:
+    with get_conn() as conn, span("db"):
         with conn.cursor() as cur:
             cur.execute("SELECT * FROM activites ORDER BY start_date DESC;")
             rows = cur.fetchall()
             colnames = [desc[0] for desc in cur.description]
 
+    with span("pandas"):
+        return _activities_frame(rows, colnames)
+
+
+def _activities_frame(rows, colnames):
     df = pd.DataFrame(rows, columns=colnames)
 
     # Remplacer tous les NaN par None
@@ -32,47 +42,243 @@ def get_all_activities():
     # Les colonnes bool et object sont déjà JSON-safe
     return df
 
-def get_last_activity(sport_type=None):
-    df = get_all_activities()
-    if df.empty:
+# ============== Pagination par curseur (keyset) ==============
+
+# Colonnes renvoyées par les listes d'activités ; 'map' (JSONB lourd) seulement sur demande
+ACTIVITY_LIST_COLUMNS = [
+    'id', 'name', 'distance', 'moving_time', 'elapsed_time', 'moving_time_hms',
+    'elapsed_time_hms', 'average_speed', 'speed_minutes_per_km', 'speed_minutes_per_km_hms',
+    'total_elevation_gain', 'sport_type', 'start_date', 'start_date_local', 'timezone',
+    'achievement_count', 'kudos_count', 'gear_id', 'start_latlng', 'end_latlng', 'max_speed',
+    'average_cadence', 'average_temp', 'has_heartrate', 'average_heartrate', 'max_heartrate',
+    'elev_high', 'elev_low', 'pr_count', 'has_kudoed', 'average_watts', 'kilojoules'
+]
+
+MAX_PAGE_SIZE = 500
+
+# Colonnes sélectionnables avec fields= (liste blanche : les noms sont insérés dans le SQL)
+ACTIVITY_FIELDS = ACTIVITY_LIST_COLUMNS + ['map']
+
+
+def parse_fields(fields, required=("id",)):
+    """
+    Parse le paramètre fields= ("id,start_date,distance") en liste de colonnes.
+
+    Args:
+        fields: chaîne de noms séparés par des virgules (None ou vide = toutes les colonnes)
+        required: colonnes toujours renvoyées (ajoutées en tête si absentes)
+
+    Returns:
+        list ou None (toutes les colonnes)
+
+    Raises:
+        ValueError: si un champ n'existe pas
+    """
+    if not fields:
         return None
+    requested = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in requested if field not in ACTIVITY_FIELDS]
+    if unknown:
+        raise ValueError(f"Champ(s) inconnu(s): {', '.join(unknown)}. Champs disponibles: {', '.join(ACTIVITY_FIELDS)}")
+    columns = [col for col in required if col not in requested] + requested
+    return list(dict.fromkeys(columns))
 
-    if sport_type:
-        df = df[df["sport_type"] == sport_type]
 
-    if df.empty:
+def encode_cursor(start_date, activity_id):
+    """Curseur opaque : base64 url-safe de (start_date ISO, id) de la dernière ligne de la page."""
+    payload = json.dumps([start_date.isoformat(), int(activity_id)], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """
+    Raises:
+        ValueError: si le curseur est invalide
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        start_date, activity_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(start_date), int(activity_id)
+    except Exception:
+        raise ValueError(f"Curseur invalide: {cursor}")
+
+
+def _json_safe(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, float) and not math.isfinite(value):
         return None
+    return value
+
+
+def get_activities_page(limit=50, cursor=None, sport_type=None, start_date=None, end_date=None,
+                        include_total=False, include_map=False, fields=None):
+    """
+    Page d'activités triée par (start_date, id) décroissants, paginée par curseur.
+
+    Le curseur désigne la dernière activité de la page précédente : la requête reprend
+    juste après avec `(start_date, id) < (curseur)` sur l'index activites_start_date_id_idx,
+    donc le coût d'une page ne dépend pas de sa position ni du nombre total d'activités.
+    Les activités sans start_date ne sont pas listées.
+
+    Args:
+        limit: nombre d'activités par page (1 à MAX_PAGE_SIZE)
+        cursor: next_cursor renvoyé par la page précédente (None = première page)
+        sport_type: filtre optionnel par sport
+        start_date / end_date: bornes optionnelles YYYY-MM-DD (end_date incluse)
+        include_total: si True, ajoute le nombre total d'activités correspondant aux filtres
+        include_map: si True, inclut la colonne map (polyline)
+        fields: colonnes à renvoyer ("id,start_date,distance"), seules lues en SQL ;
+            id et start_date (curseur) sont toujours inclus, include_map est alors ignoré
+
+    Returns:
+        dict: {"activities": [...], "next_cursor": str ou None[, "total": int]}
+
+    Raises:
+        ValueError: si le curseur, les dates ou les champs sont invalides
+    """
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+    selected = parse_fields(fields, required=("id", "start_date"))
+
+    filters = ["start_date IS NOT NULL"]
+    params = []
+    if sport_type:
+        filters.append("sport_type = %s")
+        params.append(sport_type)
+    if start_date:
+        filters.append("start_date >= %s")
+        params.append(datetime.strptime(start_date, "%Y-%m-%d"))
+    if end_date:
+        # Ajouter 1 jour pour inclure toute la journée de end_date
+        filters.append("start_date < %s")
+        params.append(datetime.strptime(end_date, "%Y-%m-%d") + timedelta(days=1))
+
+    page_filters = list(filters)
+    page_params = list(params)
+    if cursor:
+        cursor_date, cursor_id = decode_cursor(cursor)
+        page_filters.append("(start_date, id) < (%s, %s)")
+        page_params.extend([cursor_date, cursor_id])
+
+    columns = selected or ACTIVITY_LIST_COLUMNS + (['map'] if include_map else [])
+
+    with get_conn() as conn, span("db"):
+        with conn.cursor() as cur:
+            # limit + 1 lignes : la ligne en trop indique qu'une page suivante existe
+            cur.execute(f"""
+                SELECT {', '.join(columns)}
+                FROM activites
+                WHERE {' AND '.join(page_filters)}
+                ORDER BY start_date DESC, id DESC
+                LIMIT %s
+            """, page_params + [limit + 1])
+            rows = cur.fetchall()
+
+            total = None
+            if include_total:
+                cur.execute(f"SELECT COUNT(*) AS total FROM activites WHERE {' AND '.join(filters)}", params)
+                total = cur.fetchone()["total"]
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = encode_cursor(rows[-1]["start_date"], rows[-1]["id"]) if has_more else None
+
+    page = {
+        "activities": [{key: _json_safe(value) for key, value in row.items()} for row in rows],
+        "next_cursor": next_cursor,
+    }
+    if include_total:
+        page["total"] = total
+    return page
+
+
+# Colonnes lues pour les cartes d'activité (dernière activité, dernières activités)
+ACTIVITY_CARD_COLUMNS = [
+    'id', 'name', 'start_date', 'sport_type', 'distance', 'moving_time', 'moving_time_hms',
+    'speed_minutes_per_km_hms', 'average_speed', 'total_elevation_gain', 'average_heartrate'
+]
+
+
+def _fetch_activity_cards(n, sport_types=None, zoom=None):
+    """
+    Dernières activités avec leur tracé précalculé (table activity_geometry).
+
+    Une seule requête triée sur l'index (start_date, id) ; le tracé est lu tel quel au niveau
+    de zoom demandé. Une activité pas encore traitée par scripts/backfill_geometry.py est
+    décodée à la volée depuis sa colonne map.
+
+    Raises:
+        ValueError: si le zoom n'est pas précalculé
+    """
+    column = coords_column(zoom)
+    filters = ["TRUE"]
+    params = []
+    if sport_types:
+        filters.append("a.sport_type = ANY(%s)")
+        params.append(list(sport_types))
+
+    with get_conn() as conn, span("db"):
+        with conn.cursor() as cur:
+            cur.execute(f"""
+                SELECT {', '.join(f'a.{col}' for col in ACTIVITY_CARD_COLUMNS)},
+                       g.activity_id IS NOT NULL AS has_geometry,
+                       g.{column} AS coords,
+                       g.min_lat, g.min_lon, g.max_lat, g.max_lon,
+                       CASE WHEN g.activity_id IS NULL THEN a.map END AS map
+                FROM activites a
+                LEFT JOIN activity_geometry g ON g.activity_id = a.id
+                WHERE {' AND '.join(filters)}
+                ORDER BY a.start_date DESC NULLS LAST, a.id DESC
+                LIMIT %s
+            """, params + [n])
+            rows = cur.fetchall()
+
+    return [_activity_card(row, column) for row in rows]
 
-    #dernier_serie = df.sort_values(by="start_date", ascending=False).iloc[0]
-    dernier = df.sort_values(by="start_date", ascending=False).iloc[0] #c'est une serie car une seule paire de crochets
-    # Convertir tous les types numpy.* en types Python natifs
-    dernier = dernier.apply(
-    lambda x: x.item() if isinstance(x, (np.generic,)) else x)
 
-    # Extraire la polyline
-    map_json = json.loads(dernier.get("map", "{}"))
-    polyline_str = map_json.get("summary_polyline")
-    coords = polyline.decode(polyline_str) if polyline_str else []
+def _activity_card(row, column):
+    if row["has_geometry"]:
+        coords = row["coords"] or []
+        bbox = [row["min_lat"], row["min_lon"], row["max_lat"], row["max_lon"]] if coords else None
+    else:
+        geometry = route_geometry(row["map"])
+        coords = geometry[column] or []
+        bbox = geometry["bbox"]
 
+    row = {key: _json_safe(value) for key, value in row.items()}
     return {
-    "id": dernier.get("id"),
-    "name": dernier.get("name"),
-    "date": dernier.get("start_date"),
-    "type": dernier.get("sport_type"),
-    "distance_km": round(dernier.get("distance", 0), 2),
-    "duree_minutes": dernier.get("moving_time"),
-    "duree_hms": dernier.get("moving_time_hms"),
-    "allure_min_per_km": dernier.get("speed_minutes_per_km_hms"),
-    "vitesse_kmh": round(dernier.get("average_speed", 0), 2),
-    "denivele_m": round(dernier.get("total_elevation_gain", 0)),
-    "bpm_moyen": dernier.get("average_heartrate"),
-    "polyline_coords": coords
-}
-
-def get_last_activity_streams(sport_type=None):
+        "id": row["id"],
+        "name": row["name"],
+        "date": row["start_date"],
+        "type": row["sport_type"],
+        "distance_km": round(row["distance"] or 0, 2),
+        "duree_minutes": row["moving_time"],
+        "duree_hms": row["moving_time_hms"],
+        "allure_min_per_km": row["speed_minutes_per_km_hms"],
+        "vitesse_kmh": round(row["average_speed"] or 0, 2),
+        "denivele_m": round(row["total_elevation_gain"] or 0),
+        "bpm_moyen": row["average_heartrate"],
+        "polyline_coords": coords,
+        "bbox": bbox
+    }
+
+
+def get_last_activity(sport_type=None, zoom=None):
+    """
+    Dernière activité (optionnellement d'un sport) avec son tracé.
+
+    Args:
+        zoom: niveau de simplification du tracé (voir utils.geometry.GEOMETRY_ZOOMS), None = complet
+    """
+    cards = _fetch_activity_cards(1, [sport_type] if sport_type else None, zoom=zoom)
+    return cards[0] if cards else None
+
+def get_last_activity_streams(sport_type=None, max_points=None, y_channel="altitude", as_frame=False):
     """
     Récupère les streams de la dernière activité (optionnellement filtrée par sport_type),
     en utilisant get_last_activity() pour récupérer son ID.
+    max_points / y_channel : sous-échantillonnage LTTB (voir get_streams_df).
+    as_frame : si True, "streams" est un DataFrame (formats columnar / binaires).
     """
     last = get_last_activity(sport_type)
     if not last:
@@ -80,6 +286,12 @@ def get_last_activity_streams(sport_type=None):
 
     activity_id = str(last["id"])
 
+    if as_frame:
+        return {
+            "activity_id": activity_id,
+            "streams": get_streams_df(activity_id, max_points=max_points, y_channel=y_channel)
+        }
+
     with get_conn() as conn:
         with conn.cursor() as cur:
             cur.execute(
@@ -88,54 +300,32 @@ def get_last_activity_streams(sport_type=None):
             )
             streams = cur.fetchall()  # Liste de dicts grâce à RealDictCursor
 
+    if max_points and len(streams) > max_points:
+        streams = lttb_downsample_df(pd.DataFrame(streams), max_points, y_col=y_channel).to_dict(orient="records")
+
     return {
         "activity_id": activity_id,
         "streams": streams or []  # Liste vide si aucun stream
     }
 
 
-def get_last_activities(n=40, sport_type: list[str] = None):
-    df = get_all_activities()
-    if df.empty:
-        return []
+def get_last_activities(n=40, sport_type: list[str] = None, zoom=None):
+    """Les n dernières activités (optionnellement filtrées par sports) avec leur tracé."""
+    return _fetch_activity_cards(n, sport_type, zoom=zoom)
 
-    if sport_type:
-        df = df[df["sport_type"].isin(sport_type)]
+# Canaux utilisables pour guider le sous-échantillonnage LTTB
+LTTB_Y_CHANNELS = ["altitude", "heartrate", "velocity_smooth", "cadence", "power", "grade_smooth", "temp"]
 
-    if df.empty:
-        return []
-
-    df_sorted = df.sort_values(by="start_date", ascending=False).head(n)
-
-    activities = []
-    for _, row in df_sorted.iterrows():
-        map_json = json.loads(row.get("map", "{}"))
-        polyline_str = map_json.get("summary_polyline")
-        coords = polyline.decode(polyline_str) if polyline_str else []
-
-        activities.append({
-            "id": row.get("id"),
-            "name": row.get("name"),
-            "date": row.get("start_date"),
-            "type": row.get("sport_type"),
-            "distance_km": round(row.get("distance", 0), 2),
-            "duree_minutes": row.get("moving_time"),
-            "duree_hms": row.get("moving_time_hms"),
-            "allure_min_per_km": row.get("speed_minutes_per_km_hms"),
-            "vitesse_kmh": round(row.get("average_speed", 0), 2),
-            "denivele_m": round(row.get("total_elevation_gain", 0)),
-            "bpm_moyen": row.get("average_heartrate"),
-            "polyline_coords": coords
-        })
 
-    return activities
-
-def get_streams_for_activity(activity_id):
-    """
-    Récupère les données de streams (altitude, distance, etc.) pour une activité donnée.
-    Inclut maintenant heartrate, cadence, velocity_smooth, temp, power, grade_smooth.
+def get_streams_df(activity_id, max_points=None, y_channel="altitude"):
     """
+    Streams d'une activité sous forme de DataFrame (une colonne par canal, trié par time_s).
 
+    Args:
+        max_points: si fourni, réduit la série à max_points points par LTTB (toutes les
+            colonnes restent alignées) ; None = tous les échantillons
+        y_channel: canal dont la forme est préservée par le sous-échantillonnage
+    """
     # s'assurer que c'est une string
     activity_id = str(activity_id)
 
@@ -147,7 +337,20 @@ def get_streams_for_activity(activity_id):
         WHERE activity_id = %s
         ORDER BY time_s
     """
-    df = pd.read_sql(query, engine, params=(activity_id,))
+    with span("db"):
+        df = pd.read_sql(query, engine, params=(activity_id,))
+    add_rows_read(len(df))
+    with span("lttb"):
+        return lttb_downsample_df(df, max_points, y_col=y_channel)
+
+
+def get_streams_for_activity(activity_id, max_points=None, y_channel="altitude"):
+    """
+    Récupère les données de streams (altitude, distance, etc.) pour une activité donnée.
+    Inclut maintenant heartrate, cadence, velocity_smooth, temp, power, grade_smooth.
+    max_points / y_channel : sous-échantillonnage LTTB (voir get_streams_df).
+    """
+    df = get_streams_df(activity_id, max_points=max_points, y_channel=y_channel)
 
     if df.empty:
         return []
@@ -155,6 +358,43 @@ def get_streams_for_activity(activity_id):
     # Conversion en JSON-ready (liste de points)
     return df.to_dict(orient="records")
 
+STREAM_CHANNELS = ['distance_m', 'altitude', 'time_s', 'lat', 'lon',
+                   'heartrate', 'cadence', 'velocity_smooth', 'temp', 'power', 'grade_smooth']
+
+
+def iter_activities_streams(activity_ids, max_points=None, y_channel="altitude"):
+    """
+    Génère les streams de plusieurs activités, une activité à la fois.
+
+    Lecture par curseur côté serveur : une ligne par activité (un tableau par canal),
+    transférée paquet par paquet, donc seuls les streams de quelques activités sont en
+    mémoire à un instant donné. Les activités sans streams sont renvoyées à la fin avec None.
+
+    Yields:
+        tuple: (activity_id, DataFrame des streams ou None)
+    """
+    activity_ids = [str(activity_id) for activity_id in dict.fromkeys(activity_ids)]
+    aggregates = ",\n               ".join(f"array_agg({col} ORDER BY time_s) AS {col}" for col in STREAM_CHANNELS)
+    query = f"""
+        SELECT activity_id,
+               {aggregates}
+        FROM streams
+        WHERE activity_id = ANY(%s)
+        GROUP BY activity_id
+        ORDER BY activity_id
+    """
+
+    found = set()
+    for row in iter_query(query, (activity_ids,), itersize=2, name="bulk_streams"):
+        found.add(row["activity_id"])
+        df = pd.DataFrame({col: np.array(row[col], dtype=float) for col in STREAM_CHANNELS})
+        yield row["activity_id"], lttb_downsample_df(df, max_points, y_col=y_channel)
+
+    for activity_id in activity_ids:
+        if activity_id not in found:
+            yield activity_id, None
+
+
 def get_recent_activities(weeks: int = 12, sport_types=None):
     """
     Récupère les activités des dernières `weeks` depuis la BDD.
@@ -168,8 +408,9 @@ def get_recent_activities(weeks: int = 12, sport_types=None):
                 ORDER BY start_date DESC;
             """
             start_date = (datetime.now() - pd.Timedelta(weeks=weeks)).isoformat()
-            cur.execute(query, (start_date,))
-            rows = cur.fetchall()
+            with span("db"):
+                cur.execute(query, (start_date,))
+                rows = cur.fetchall()
             colnames = [desc[0] for desc in cur.description]
 
     df = pd.DataFrame(rows, columns=colnames)
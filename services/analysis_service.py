@@ -1,14 +1,250 @@
 """
 Service pour les analyses avancées des activités
+
+La corrélation glissante FC / vitesse est calculée sur des tableaux NumPy : grille à 1 Hz par
+np.interp, moyennes / écarts-types / corrélations glissants par sommes cumulées (coût O(n)
+quelle que soit la fenêtre). Le résultat sérialisé est mémorisé dans la table analysis_cache
+par (activité, paramètres) et n'est resservi que pour la stream_version courante de
+l'activité (migration 0011) : le curseur de fenêtre de l'interface ne recalcule rien.
 """
-import pandas as pd
+import warnings
+
 import numpy as np
-from services.activity_service import get_streams_for_activity
+from psycopg2 import Binary
+
+from db.connection import get_conn
+from utils.json_response import dumps as json_dumps
+from utils.metrics import record_cache
+from utils.timing import span
+
+
+ROLLING_CORRELATION_ANALYSIS = "rolling_hr_speed_correlation:v1"
+
+# Fenêtre longue de normalisation (z-score) et filtre médian anti-bruit GPS
+NORMALIZATION_WINDOW = 600
+NORMALIZATION_MIN_PERIODS = 60
+MEDIAN_WINDOW = 5
+MOVING_SPEED = 0.5          # m/s (1.8 km/h)
+BREAKPOINT_THRESHOLD = -0.3
+MAX_OUTPUT_POINTS = 10000
+
+
+def _window_bounds(n, window, center):
+    """Bornes [lo, hi) de la fenêtre de chaque point (mêmes conventions que pandas.rolling)."""
+    idx = np.arange(n)
+    lo = idx - window // 2 if center else idx - window + 1
+    return np.clip(lo, 0, n), np.clip(lo + window, 0, n)
+
+
+def _window_sums(values, lo, hi):
+    cumsum = np.concatenate(([0.0], np.cumsum(values)))
+    return cumsum[hi] - cumsum[lo]
+
+
+def rolling_mean_std(values, window, min_periods, center=True):
+    """Moyenne et écart-type (ddof=1) glissants ; NaN si moins de min_periods valeurs."""
+    valid = np.isfinite(values)
+    offset = values[valid].mean() if valid.any() else 0.0
+    x = np.where(valid, values - offset, 0.0)  # centrage : limite les erreurs d'arrondi
+    lo, hi = _window_bounds(len(values), window, center)
+    count = _window_sums(valid.astype(float), lo, hi)
+    total = _window_sums(x, lo, hi)
+    total_sq = _window_sums(x * x, lo, hi)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = total / count
+        var = (total_sq - total * mean) / (count - 1)
+    enough = count >= max(min_periods, 1)
+    mean = np.where(enough, mean + offset, np.nan)
+    std = np.where(enough & (count > 1), np.sqrt(np.maximum(var, 0.0)), np.nan)
+    return mean, std
+
+
+def rolling_corr(x, y, window, min_periods):
+    """Corrélation de Pearson glissante (fenêtre se terminant au point courant)."""
+    valid = np.isfinite(x) & np.isfinite(y)
+    xc = np.where(valid, x - (x[valid].mean() if valid.any() else 0.0), 0.0)
+    yc = np.where(valid, y - (y[valid].mean() if valid.any() else 0.0), 0.0)
+    lo, hi = _window_bounds(len(x), window, center=False)
+
+    n = _window_sums(valid.astype(float), lo, hi)
+    sx, sy = _window_sums(xc, lo, hi), _window_sums(yc, lo, hi)
+    sxy = _window_sums(xc * yc, lo, hi)
+    sxx, syy = _window_sums(xc * xc, lo, hi), _window_sums(yc * yc, lo, hi)
+
+    cov = n * sxy - sx * sy
+    var_x = n * sxx - sx * sx
+    var_y = n * syy - sy * sy
+    with np.errstate(invalid="ignore", divide="ignore"):
+        corr = cov / np.sqrt(var_x * var_y)
+    ok = (n >= max(min_periods, 1)) & (var_x > 1e-12) & (var_y > 1e-12)
+    return np.where(ok, np.clip(corr, -1.0, 1.0), np.nan)
+
+
+def rolling_median(values, window):
+    """Médiane glissante centrée (min_periods=1 : fenêtre tronquée aux extrémités)."""
+    half = window // 2
+    padded = np.concatenate((np.full(half, np.nan), values, np.full(window - half - 1, np.nan)))
+    windows = np.lib.stride_tricks.sliding_window_view(padded, window)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # fenêtres entièrement NaN
+        return np.nanmedian(windows, axis=1)
+
+
+def resample_1hz(time_s, values, n):
+    """Valeurs sur la grille 0..n-1 s, interpolées linéairement (extrémités prolongées)."""
+    grid = np.full(n, np.nan)
+    on_grid = (time_s >= 0) & (time_s < n) & (time_s == np.floor(time_s))
+    grid[time_s[on_grid].astype(int)] = values[on_grid]
+    known = np.isfinite(grid)
+    if not known.any():
+        return grid
+    seconds = np.arange(n, dtype=float)
+    return np.interp(seconds, seconds[known], grid[known])
+
+
+def compute_rolling_hr_speed_correlation(time_s, heartrate, velocity, window_seconds=180, min_periods_ratio=0.5):
+    """
+    Calcul de la corrélation glissante sur les tableaux de streams d'une activité.
+
+    Returns:
+        dict de tableaux NumPy (voir calculate_rolling_hr_speed_correlation)
+    """
+    time_s = np.asarray(time_s, dtype=float)
+    heartrate = np.asarray(heartrate, dtype=float)
+    velocity = np.asarray(velocity, dtype=float)
+
+    keep = np.isfinite(time_s)
+    order = np.argsort(time_s[keep], kind="stable")
+    time_s, heartrate, velocity = time_s[keep][order], heartrate[keep][order], velocity[keep][order]
+
+    # Grille à 1 seconde de 0 à max(time_s)
+    n = int(time_s.max()) + 1
+    seconds = np.arange(n, dtype=float)
+    hr = resample_1hz(time_s, heartrate, n)
+    speed = resample_1hz(time_s, velocity, n)
+
+    with np.errstate(invalid="ignore"):
+        is_moving = speed > MOVING_SPEED
+
+    hr_filtered = rolling_median(hr, MEDIAN_WINDOW)
+    speed_filtered = rolling_median(speed, MEDIAN_WINDOW)
+
+    # Normalisation z-score sur une fenêtre longue (10 minutes)
+    hr_mean, hr_std = rolling_mean_std(hr_filtered, NORMALIZATION_WINDOW, NORMALIZATION_MIN_PERIODS)
+    speed_mean, speed_std = rolling_mean_std(speed_filtered, NORMALIZATION_WINDOW, NORMALIZATION_MIN_PERIODS)
+    hr_normalized = (hr_filtered - hr_mean) / (hr_std + 1e-6)
+    speed_normalized = (speed_filtered - speed_mean) / (speed_std + 1e-6)
+
+    correlation = rolling_corr(hr_normalized, speed_normalized, window_seconds, int(window_seconds * min_periods_ratio))
+
+    # Points de rupture : corrélation < seuil sur 2 secondes consécutives
+    with np.errstate(invalid="ignore"):
+        below = correlation < BREAKPOINT_THRESHOLD
+    is_breakpoint = np.zeros(n, dtype=bool)
+    is_breakpoint[1:] = below[1:] & below[:-1]
+    breakpoints = seconds[is_breakpoint]
+
+    # Sous-échantillonnage pour le frontend (1 point sur `step` au-delà de MAX_OUTPUT_POINTS)
+    step = n // MAX_OUTPUT_POINTS if n > MAX_OUTPUT_POINTS else 1
+
+    return {
+        "time": seconds[::step],
+        "hr": hr_filtered[::step],
+        "speed": speed_filtered[::step],
+        "hr_normalized": hr_normalized[::step],
+        "speed_normalized": speed_normalized[::step],
+        "correlation_pearson": correlation[::step],
+        "is_moving": is_moving[::step],
+        "breakpoints": breakpoints,
+        "window_seconds": int(window_seconds),
+        "total_breakpoints": int(len(breakpoints))
+    }
+
+
+def _correlation_params(window_seconds, min_periods_ratio):
+    return f"window={int(window_seconds)};min_periods_ratio={float(min_periods_ratio)}"
+
+
+def _fetch_hr_speed_streams(cur, activity_id):
+    cur.execute("""
+        SELECT array_agg(time_s ORDER BY time_s) AS time_s,
+               array_agg(heartrate ORDER BY time_s) AS heartrate,
+               array_agg(velocity_smooth ORDER BY time_s) AS velocity_smooth,
+               COUNT(heartrate) AS hr_count,
+               COUNT(velocity_smooth) AS speed_count
+        FROM streams
+        WHERE activity_id = %s
+    """, (str(activity_id),))
+    return cur.fetchone()
+
+
+def _correlation_from_streams(streams, window_seconds, min_periods_ratio):
+    if streams is None or streams["time_s"] is None:
+        return {"error": "Pas de données de streams disponibles"}
+    if not streams["hr_count"] or not streams["speed_count"]:
+        return {"error": "Données de fréquence cardiaque ou vitesse manquantes"}
+    with span("analysis"):
+        return compute_rolling_hr_speed_correlation(
+            np.array(streams["time_s"], dtype=float),
+            np.array(streams["heartrate"], dtype=float),
+            np.array(streams["velocity_smooth"], dtype=float),
+            window_seconds, min_periods_ratio
+        )
+
+
+def rolling_hr_speed_correlation_json(activity_id, window_seconds=180, min_periods_ratio=0.5):
+    """
+    Corrélation glissante sérialisée en JSON, servie depuis analysis_cache si les streams
+    de l'activité n'ont pas changé depuis le calcul.
+
+    Returns:
+        bytes: réponse JSON (résultat ou {"error": ...}, les erreurs ne sont pas mises en cache)
+    """
+    params = _correlation_params(window_seconds, min_periods_ratio)
+
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            with span("db"):
+                cur.execute("""
+                    SELECT ss.stream_version, c.payload
+                    FROM stream_status ss
+                    LEFT JOIN analysis_cache c
+                        ON c.activity_id = ss.activity_id
+                        AND c.analysis = %s AND c.params = %s
+                        AND c.stream_version = ss.stream_version
+                    WHERE ss.activity_id = %s
+                """, (ROLLING_CORRELATION_ANALYSIS, params, int(activity_id)))
+                status = cur.fetchone()
+
+            record_cache("analysis", hit=bool(status and status["payload"] is not None))
+            if status and status["payload"] is not None:
+                return bytes(status["payload"])
+
+            with span("db"):
+                streams = _fetch_hr_speed_streams(cur, activity_id)
+            result = _correlation_from_streams(streams, window_seconds, min_periods_ratio)
+            payload = json_dumps(result)
+
+            # Pas de cache sans version connue (activité absente du registre) ni pour les erreurs
+            if status is not None and "error" not in result:
+                with span("db"):
+                    cur.execute("""
+                        INSERT INTO analysis_cache (activity_id, analysis, params, stream_version, payload)
+                        VALUES (%s, %s, %s, %s, %s)
+                        ON CONFLICT (activity_id, analysis, params) DO UPDATE
+                        SET stream_version = EXCLUDED.stream_version,
+                            payload = EXCLUDED.payload,
+                            computed_at = NOW()
+                    """, (int(activity_id), ROLLING_CORRELATION_ANALYSIS, params, status["stream_version"], Binary(payload)))
+                conn.commit()
+
+    return payload
 
 
 def calculate_rolling_hr_speed_correlation(activity_id: str, window_seconds: int = 180, min_periods_ratio: float = 0.5):
     """
-    Calcule la corrélation glissante entre fréquence cardiaque et vitesse.
+    Calcule la corrélation glissante entre fréquence cardiaque et vitesse (sans cache).
 
     Args:
         activity_id: ID de l'activité Strava
@@ -16,105 +252,17 @@ def calculate_rolling_hr_speed_correlation(activity_id: str, window_seconds: int
         min_periods_ratio: Ratio minimal de données non-nulles dans la fenêtre (défaut: 0.5)
 
     Returns:
-        dict avec:
+        dict avec (tableaux NumPy, NaN = valeur absente, null en JSON):
         - time: timestamps (secondes depuis début)
         - hr: fréquence cardiaque (bpm)
         - speed: vitesse (m/s)
         - hr_normalized: HR normalisée (z-score)
         - speed_normalized: vitesse normalisée (z-score)
-        - correlation: corrélation glissante de Pearson
-        - correlation_spearman: corrélation glissante de Spearman (robuste)
+        - correlation_pearson: corrélation glissante de Pearson
+        - is_moving: en mouvement (vitesse > 0.5 m/s)
         - breakpoints: liste des instants de rupture (corr < -0.3)
     """
-    # Récupérer les streams
-    streams = get_streams_for_activity(activity_id)
-
-    if not streams:
-        return {"error": "Pas de données de streams disponibles"}
-
-    # Convertir en DataFrame
-    df = pd.DataFrame(streams)
-
-    # Vérifier que nous avons les données nécessaires
-    if 'heartrate' not in df.columns or 'velocity_smooth' not in df.columns:
-        return {"error": "Données de fréquence cardiaque ou vitesse manquantes"}
-
-    # Filtrer les lignes avec données valides
-    df = df[['time_s', 'heartrate', 'velocity_smooth']].copy()
-    df = df.dropna(subset=['time_s'])
-
-    # Trier par temps
-    df = df.sort_values('time_s').reset_index(drop=True)
-
-    # Resample à 1 seconde avec interpolation
-    # Créer une série temporelle complète de 0 à max(time_s)
-    max_time = int(df['time_s'].max())
-    time_range = pd.DataFrame({'time_s': range(0, max_time + 1)})
-
-    # Merge et interpolation linéaire
-    df = time_range.merge(df, on='time_s', how='left')
-    df['heartrate'] = df['heartrate'].interpolate(method='linear', limit_direction='both')
-    df['velocity_smooth'] = df['velocity_smooth'].interpolate(method='linear', limit_direction='both')
-
-    # Filtrer les périodes d'arrêt (vitesse < 0.5 m/s = 1.8 km/h)
-    df['is_moving'] = df['velocity_smooth'] > 0.5
-
-    # Appliquer un filtre médian pour réduire le bruit GPS
-    df['hr_filtered'] = df['heartrate'].rolling(window=5, center=True, min_periods=1).median()
-    df['speed_filtered'] = df['velocity_smooth'].rolling(window=5, center=True, min_periods=1).median()
-
-    # Normalisation z-score avec fenêtre longue (10 minutes)
-    rolling_window_long = 600  # 10 minutes
-
-    df['hr_mean_long'] = df['hr_filtered'].rolling(window=rolling_window_long, min_periods=60, center=True).mean()
-    df['hr_std_long'] = df['hr_filtered'].rolling(window=rolling_window_long, min_periods=60, center=True).std()
-    df['hr_normalized'] = (df['hr_filtered'] - df['hr_mean_long']) / (df['hr_std_long'] + 1e-6)
-
-    df['speed_mean_long'] = df['speed_filtered'].rolling(window=rolling_window_long, min_periods=60, center=True).mean()
-    df['speed_std_long'] = df['speed_filtered'].rolling(window=rolling_window_long, min_periods=60, center=True).std()
-    df['speed_normalized'] = (df['speed_filtered'] - df['speed_mean_long']) / (df['speed_std_long'] + 1e-6)
-
-    # Calculer la corrélation glissante de Pearson
-    min_periods = int(window_seconds * min_periods_ratio)
-
-    df['correlation_pearson'] = df['hr_normalized'].rolling(
-        window=window_seconds,
-        min_periods=min_periods
-    ).corr(df['speed_normalized'])
-
-    # Détecter les points de rupture
-    # Critère: corrélation < -0.3 persistante sur au moins 2 fenêtres consécutives
-    threshold = -0.3
-    persistence_count = 2
-
-    df['is_breakpoint'] = (df['correlation_pearson'] < threshold).rolling(
-        window=persistence_count,
-        min_periods=persistence_count
-    ).sum() >= persistence_count
-
-    # Extraire les instants de rupture
-    breakpoints = df[df['is_breakpoint'] == True]['time_s'].tolist()
-
-    # Préparer les données pour le frontend (sous-échantillonner si > 10000 points)
-    if len(df) > 10000:
-        # Garder 1 point tous les N points
-        step = len(df) // 10000
-        df_sampled = df.iloc[::step].copy()
-    else:
-        df_sampled = df.copy()
-
-    # Convertir en format JSON-friendly avec conversion explicite en types Python natifs
-    result = {
-        "time": [float(x) if pd.notna(x) else None for x in df_sampled['time_s'].tolist()],
-        "hr": [float(x) if pd.notna(x) else None for x in df_sampled['hr_filtered'].tolist()],
-        "speed": [float(x) if pd.notna(x) else None for x in df_sampled['speed_filtered'].tolist()],
-        "hr_normalized": [float(x) if pd.notna(x) else None for x in df_sampled['hr_normalized'].tolist()],
-        "speed_normalized": [float(x) if pd.notna(x) else None for x in df_sampled['speed_normalized'].tolist()],
-        "correlation_pearson": [float(x) if pd.notna(x) else None for x in df_sampled['correlation_pearson'].tolist()],
-        "is_moving": [bool(x) if pd.notna(x) else False for x in df_sampled['is_moving'].tolist()],
-        "breakpoints": [float(x) for x in breakpoints if x is not None],
-        "window_seconds": int(window_seconds),
-        "total_breakpoints": len([bp for bp in breakpoints if bp is not None])
-    }
-
-    return result
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            streams = _fetch_hr_speed_streams(cur, activity_id)
+    return _correlation_from_streams(streams, window_seconds, min_periods_ratio)
@@ -34,51 +34,7 @@ def store_df_in_postgresql(df, host, database, user, password, port):
 
     table_name = TABLE_NAME
 
-    # Création de la table (si elle n'existe pas)
-    create_table_query = sql.SQL("""
-    CREATE TABLE IF NOT EXISTS {} (
-        id BIGSERIAL PRIMARY KEY,
-        name VARCHAR(255),
-        distance FLOAT,
-        moving_time FLOAT,
-        elapsed_time FLOAT,
-        moving_time_hms TEXT,
-        elapsed_time_hms TEXT,
-        average_speed FLOAT,
-        speed_minutes_per_km FLOAT,
-        speed_minutes_per_km_hms TEXT,
-        total_elevation_gain FLOAT,
-        sport_type VARCHAR(255),
-        start_date TIMESTAMP,
-        start_date_local TIMESTAMP,
-        timezone VARCHAR(50),
-        achievement_count INTEGER,
-        kudos_count INTEGER,
-        gear_id VARCHAR(255),
-        start_latlng VARCHAR(50),
-        end_latlng VARCHAR(50),
-        max_speed FLOAT,
-        average_cadence FLOAT,
-        average_temp FLOAT,
-        has_heartrate BOOLEAN,
-        average_heartrate FLOAT,
-        max_heartrate FLOAT,
-        elev_high FLOAT,
-        elev_low FLOAT,
-        pr_count INTEGER,
-        has_kudoed BOOLEAN,
-        average_watts FLOAT,
-        kilojoules FLOAT,
-        map JSONB,
-        device_watts BOOLEAN,
-        max_watts INTEGER,
-        weighted_average_watts INTEGER,
-        total_photo_count INTEGER,
-        suffer_score INTEGER
-    );
-    """).format(sql.Identifier(table_name))
-
-    cur.execute(create_table_query)
+    # Le schéma est géré par db/schema.py (migrations appliquées au démarrage)
 
     # Préparer les données
     values = [
@@ -133,13 +89,13 @@ def store_df_in_postgresql(df, host, database, user, password, port):
 
 def store_df_streams_in_postgresql(df_streams, host=None, database=None, user=None, password=None, port=None, table_name="streams"):
     """
-    Wrapper vers la fonction optimisée pour maintenir la compatibilité.
+    Wrapper vers le chargement COPY pour maintenir la compatibilité.
     Utilise les paramètres par défaut si non fournis.
     """
-    from strava.store_data import store_df_streams_in_postgresql_optimized
+    from strava.store_data import store_df_streams_copy
     from strava.params import HOST, DATABASE, USER, PASSWORD, PORT
 
-    return store_df_streams_in_postgresql_optimized(
+    return store_df_streams_copy(
         df_streams,
         host=host or HOST,
         database=database or DATABASE,
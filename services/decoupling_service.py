@@ -0,0 +1,226 @@
+"""
+Découplage aérobie (Pa:HR) et dérive cardiaque sur tout l'historique.
+
+Pour chaque activité avec FC et vitesse, le temps en mouvement est coupé en deux moitiés
+de même durée. Sur chaque moitié on calcule la vitesse et la FC moyennes pondérées par le
+temps, puis l'efficiency factor EF = vitesse / FC :
+
+- decoupling_pct    = (EF1 - EF2) / EF1 * 100   (> 5 % : endurance aérobie insuffisante)
+- cardiac_drift_pct = (FC2 - FC1) / FC1 * 100
+
+Le job lit les streams par paquets d'activités (une requête array_agg par paquet), répartit
+les calculs NumPy sur un pool de processus et enregistre une ligne par activité dans
+activity_decoupling. Seules les activités dont la stream_version a changé sont recalculées.
+"""
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+import numpy as np
+from psycopg2.extras import execute_values
+
+from db.connection import get_conn
+
+
+MOVING_SPEED = 0.5          # m/s : en dessous, l'échantillon est une pause
+MAX_SAMPLE_GAP = 10         # s : un écart plus long entre deux échantillons est une pause (auto-pause)
+MIN_MOVING_SECONDS = 20 * 60
+DECOUPLING_BATCH_SIZE = 50
+
+DECOUPLING_COLUMNS = [
+    'moving_seconds', 'avg_heartrate', 'avg_speed', 'ef_first_half', 'ef_second_half',
+    'decoupling_pct', 'cardiac_drift_pct'
+]
+
+
+def compute_decoupling(time_s, heartrate, velocity):
+    """
+    Returns:
+        dict des DECOUPLING_COLUMNS (métriques à None si moins de MIN_MOVING_SECONDS en mouvement)
+    """
+    time_s = np.asarray(time_s, dtype=float)
+    heartrate = np.asarray(heartrate, dtype=float)
+    velocity = np.asarray(velocity, dtype=float)
+
+    # Durée représentée par chaque échantillon (écart au suivant, pauses exclues)
+    dt = np.diff(time_s, append=time_s[-1] if len(time_s) else 0.0)
+    dt = np.where((dt > 0) & (dt <= MAX_SAMPLE_GAP), dt, 0.0)
+    with np.errstate(invalid="ignore"):
+        moving = np.isfinite(heartrate) & np.isfinite(velocity) & (velocity > MOVING_SPEED) & (heartrate > 0)
+    weights = np.where(moving, dt, 0.0)
+
+    result = dict.fromkeys(DECOUPLING_COLUMNS)
+    moving_seconds = float(weights.sum())
+    result["moving_seconds"] = moving_seconds
+    if moving_seconds < MIN_MOVING_SECONDS:
+        return result
+
+    hr = np.where(moving, heartrate, 0.0)
+    speed = np.where(moving, velocity, 0.0)
+    elapsed = np.cumsum(weights)
+    first = elapsed <= moving_seconds / 2
+
+    def half_means(mask):
+        w = weights[mask]
+        return float((speed[mask] * w).sum() / w.sum()), float((hr[mask] * w).sum() / w.sum())
+
+    speed_1, hr_1 = half_means(first)
+    speed_2, hr_2 = half_means(~first)
+    ef_1, ef_2 = speed_1 / hr_1, speed_2 / hr_2
+
+    result.update({
+        "avg_heartrate": float((hr * weights).sum() / moving_seconds),
+        "avg_speed": float((speed * weights).sum() / moving_seconds),
+        "ef_first_half": ef_1,
+        "ef_second_half": ef_2,
+        "decoupling_pct": (ef_1 - ef_2) / ef_1 * 100,
+        "cardiac_drift_pct": (hr_2 - hr_1) / hr_1 * 100,
+    })
+    return result
+
+
+def _compute_row(row):
+    """Travail d'un processus du pool : une activité (dict de la requête de streams)."""
+    metrics = compute_decoupling(row["time_s"], row["heartrate"], row["velocity_smooth"])
+    return (
+        row["activity_id"], row["stream_version"], *(metrics[col] for col in DECOUPLING_COLUMNS)
+    )
+
+
+def get_activities_to_decouple(cur, recompute=False):
+    """Activités avec streams et FC dont le découplage manque ou date d'anciens streams."""
+    stale = "" if recompute else "AND (d.activity_id IS NULL OR d.stream_version <> ss.stream_version)"
+    cur.execute(f"""
+        SELECT ss.activity_id
+        FROM stream_status ss
+        JOIN activites a ON a.id = ss.activity_id
+        LEFT JOIN activity_decoupling d ON d.activity_id = ss.activity_id
+        WHERE ss.status = 'fetched'
+        AND a.has_heartrate IS NOT FALSE
+        {stale}
+        ORDER BY ss.activity_id
+    """)
+    return [row["activity_id"] for row in cur.fetchall()]
+
+
+def _fetch_batch_streams(cur, activity_ids):
+    cur.execute("""
+        SELECT ss.activity_id, ss.stream_version, s.time_s, s.heartrate, s.velocity_smooth
+        FROM stream_status ss
+        JOIN LATERAL (
+            SELECT array_agg(time_s ORDER BY time_s) AS time_s,
+                   array_agg(heartrate ORDER BY time_s) AS heartrate,
+                   array_agg(velocity_smooth ORDER BY time_s) AS velocity_smooth
+            FROM streams
+            WHERE activity_id = ss.activity_id::text
+        ) s ON s.time_s IS NOT NULL
+        WHERE ss.activity_id = ANY(%s)
+    """, (list(activity_ids),))
+    return cur.fetchall()
+
+
+def _store_batch(cur, rows):
+    columns = ['activity_id', 'stream_version'] + DECOUPLING_COLUMNS
+    updates = ",\n            ".join(f"{col} = EXCLUDED.{col}" for col in columns[1:])
+    execute_values(cur, f"""
+        INSERT INTO activity_decoupling ({', '.join(columns)})
+        VALUES %s
+        ON CONFLICT (activity_id) DO UPDATE SET
+            {updates},
+            computed_at = NOW()
+    """, rows)
+
+
+def run_decoupling_job(batch_size=DECOUPLING_BATCH_SIZE, workers=None, recompute=False):
+    """
+    Calcule le découplage des activités en attente.
+
+    Args:
+        batch_size: activités lues (une requête) et enregistrées (une transaction) par paquet
+        workers: processus de calcul (défaut: nombre de CPU)
+        recompute: recalculer toutes les activités
+
+    Returns:
+        int: nombre d'activités traitées
+    """
+    workers = workers or os.cpu_count() or 1
+
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            activity_ids = get_activities_to_decouple(cur, recompute=recompute)
+        print(f"📋 {len(activity_ids)} activités à analyser ({workers} processus)")
+
+        done = 0
+        start_time = time.time()
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for offset in range(0, len(activity_ids), batch_size):
+                with conn.cursor() as cur:
+                    # dict simples : les lignes RealDictCursor sont envoyées aux processus du pool
+                    rows = [dict(row) for row in _fetch_batch_streams(cur, activity_ids[offset:offset + batch_size])]
+                    results = list(pool.map(_compute_row, rows, chunksize=max(1, len(rows) // workers)))
+                    if results:
+                        _store_batch(cur, results)
+                conn.commit()
+
+                done += len(results)
+                print(f"  ✅ {min(offset + batch_size, len(activity_ids))}/{len(activity_ids)} activités "
+                      f"({done / (time.time() - start_time):.1f} act/s)")
+
+    return done
+
+
+def get_decoupling_trend(sport_type=None, start_date=None, end_date=None):
+    """
+    Évolution du découplage aérobie : une valeur par activité et la médiane par semaine.
+
+    Returns:
+        dict: {"activities": [...], "weekly": [...]}
+
+    Raises:
+        ValueError: si les dates sont invalides
+    """
+    filters = ["d.decoupling_pct IS NOT NULL"]
+    params = []
+    if sport_type:
+        filters.append("a.sport_type = %s")
+        params.append(sport_type)
+    if start_date:
+        filters.append("a.start_date >= %s")
+        params.append(datetime.strptime(start_date, "%Y-%m-%d"))
+    if end_date:
+        filters.append("a.start_date < %s")
+        params.append(datetime.strptime(end_date, "%Y-%m-%d") + timedelta(days=1))
+    where = " AND ".join(filters)
+
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute(f"""
+                SELECT d.activity_id, a.start_date, a.sport_type,
+                       ROUND((d.moving_seconds / 60)::numeric, 1)::float AS moving_minutes,
+                       ROUND(d.decoupling_pct::numeric, 2)::float AS decoupling_pct,
+                       ROUND(d.cardiac_drift_pct::numeric, 2)::float AS cardiac_drift_pct,
+                       d.ef_first_half, d.ef_second_half
+                FROM activity_decoupling d
+                JOIN activites a ON a.id = d.activity_id
+                WHERE {where}
+                ORDER BY a.start_date
+            """, params)
+            activities = cur.fetchall()
+
+            cur.execute(f"""
+                SELECT date_trunc('week', a.start_date)::date AS week_start,
+                       COUNT(*) AS activity_count,
+                       ROUND(percentile_cont(0.5) WITHIN GROUP (ORDER BY d.decoupling_pct)::numeric, 2)::float
+                           AS median_decoupling_pct,
+                       ROUND(percentile_cont(0.5) WITHIN GROUP (ORDER BY d.cardiac_drift_pct)::numeric, 2)::float
+                           AS median_cardiac_drift_pct
+                FROM activity_decoupling d
+                JOIN activites a ON a.id = d.activity_id
+                WHERE {where}
+                GROUP BY 1
+                ORDER BY 1
+            """, params)
+            weekly = cur.fetchall()
+
+    return {"activities": activities, "weekly": weekly}
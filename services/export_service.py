@@ -0,0 +1,207 @@
+"""
+Export complet des activités et des streams (CSV, NDJSON, Parquet) en streaming.
+
+Les lignes sont lues par curseur côté serveur (db.connection.iter_query) et encodées par
+paquets de EXPORT_BATCH_SIZE lignes : chaque paquet devient un morceau de CSV / NDJSON ou un
+row group Parquet envoyé immédiatement. La mémoire utilisée est constante, quelle que soit la
+taille de l'historique. Les filtres (dates, sports) sont appliqués dans la requête SQL.
+"""
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+from itertools import islice
+
+from db.connection import iter_query
+from services.activity_service import ACTIVITY_LIST_COLUMNS, STREAM_CHANNELS
+from utils.json_response import dumps as json_dumps
+
+
+EXPORT_FORMATS = {
+    "csv": ("text/csv; charset=utf-8", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+EXPORT_BATCH_SIZE = 5000
+
+ACTIVITY_EXPORT_COLUMNS = ACTIVITY_LIST_COLUMNS + ['map']
+STREAM_EXPORT_COLUMNS = ['activity_id'] + STREAM_CHANNELS
+
+
+def _activity_filters(start_date=None, end_date=None, sport_type=None):
+    """Clauses WHERE (liste) et paramètres pour les filtres d'activités."""
+    clauses, params = [], []
+    if start_date:
+        clauses.append("start_date >= %s")
+        params.append(datetime.strptime(start_date, "%Y-%m-%d"))
+    if end_date:
+        # end_date incluse
+        clauses.append("start_date < %s")
+        params.append(datetime.strptime(end_date, "%Y-%m-%d") + timedelta(days=1))
+    if sport_type:
+        clauses.append("sport_type = ANY(%s)")
+        params.append(list(sport_type))
+    return clauses, params
+
+
+def activities_export_query(start_date=None, end_date=None, sport_type=None):
+    clauses, params = _activity_filters(start_date, end_date, sport_type)
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    query = f"""
+        SELECT {', '.join(ACTIVITY_EXPORT_COLUMNS)}
+        FROM activites
+        {where}
+        ORDER BY start_date, id
+    """
+    return query, params
+
+
+def streams_export_query(start_date=None, end_date=None, sport_type=None):
+    """
+    Streams triés par (activity_id, time_s) : parcours de la clé primaire, sans tri en mémoire.
+    Avec filtres, les activités retenues sont résolues d'abord puis lues via la clé primaire.
+    """
+    clauses, params = _activity_filters(start_date, end_date, sport_type)
+    where = ""
+    if clauses:
+        where = f"WHERE activity_id = ANY(ARRAY(SELECT id::text FROM activites WHERE {' AND '.join(clauses)}))"
+    query = f"""
+        SELECT {', '.join(STREAM_EXPORT_COLUMNS)}
+        FROM streams
+        {where}
+        ORDER BY activity_id, time_s
+    """
+    return query, params
+
+
+def _batches(rows, size):
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+
+def _export_value(value):
+    """Valeur scalaire pour CSV / Parquet (dates en ISO, JSON en texte)."""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    return value
+
+
+def iter_csv(rows, columns):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for batch in _batches(rows, EXPORT_BATCH_SIZE):
+        writer.writerows([_export_value(row[col]) for col in columns] for row in batch)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def iter_ndjson(rows, columns):
+    for batch in _batches(rows, EXPORT_BATCH_SIZE):
+        yield b"".join(json_dumps({col: row[col] for col in columns}) + b"\n" for row in batch)
+
+
+class _ChunkSink(io.RawIOBase):
+    """Fichier en écriture dont on récupère les octets écrits au fur et à mesure."""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _parquet_schema(kind):
+    import pyarrow as pa
+
+    if kind == "streams":
+        return pa.schema([("activity_id", pa.string())] + [(col, pa.float64()) for col in STREAM_CHANNELS])
+
+    types = {
+        'id': pa.int64(), 'start_date': pa.timestamp('us'), 'start_date_local': pa.timestamp('us'),
+        'has_heartrate': pa.bool_(), 'has_kudoed': pa.bool_(),
+        'achievement_count': pa.int64(), 'kudos_count': pa.int64(), 'pr_count': pa.int64(),
+    }
+    text_columns = {'name', 'moving_time_hms', 'elapsed_time_hms', 'speed_minutes_per_km_hms',
+                    'sport_type', 'timezone', 'gear_id', 'start_latlng', 'end_latlng', 'map'}
+    return pa.schema([
+        (col, types.get(col, pa.string() if col in text_columns else pa.float64()))
+        for col in ACTIVITY_EXPORT_COLUMNS
+    ])
+
+
+def iter_parquet(rows, columns, kind):
+    """Un row group Parquet par paquet de lignes ; le pied de fichier part en dernier."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = _parquet_schema(kind)
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression="zstd")
+    try:
+        for batch in _batches(rows, EXPORT_BATCH_SIZE):
+            data = {
+                col: [row[col] if isinstance(row[col], datetime) else _export_value(row[col]) for row in batch]
+                for col in columns
+            }
+            writer.write_table(pa.Table.from_pydict(data, schema=schema))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def export_rows(kind, fmt, start_date=None, end_date=None, sport_type=None):
+    """
+    Générateur d'octets de l'export demandé.
+
+    Args:
+        kind: 'activities' ou 'streams'
+        fmt: 'csv', 'ndjson' ou 'parquet'
+
+    Raises:
+        ValueError: si les dates sont invalides
+        ImportError: si pyarrow n'est pas installé (format parquet)
+    """
+    if kind == "streams":
+        query, params = streams_export_query(start_date, end_date, sport_type)
+        columns = STREAM_EXPORT_COLUMNS
+    else:
+        query, params = activities_export_query(start_date, end_date, sport_type)
+        columns = ACTIVITY_EXPORT_COLUMNS
+
+    if fmt == "parquet":
+        # Import vérifié avant d'envoyer les en-têtes de la réponse
+        import pyarrow.parquet  # noqa: F401
+
+    rows = iter_query(query, params, itersize=EXPORT_BATCH_SIZE, name=f"export_{kind}")
+
+    if fmt == "parquet":
+        return iter_parquet(rows, columns, kind)
+    if fmt == "ndjson":
+        return iter_ndjson(rows, columns)
+    return iter_csv(rows, columns)
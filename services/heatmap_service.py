@@ -0,0 +1,198 @@
+"""
+Construction incrémentale et lecture de la heatmap personnelle (utils/heatmap.py).
+
+update_heatmap() ajoute aux tuiles les échantillons GPS des activités dont les streams sont
+en base et qui ne sont pas encore dans heatmap_activity, par paquets : une transaction par
+paquet (verrou consultatif, lecture des streams, fusion des tuiles touchées, registre).
+Interrompre la construction perd au plus le paquet en cours.
+
+Les tuiles sont additives : une activité dont les streams ont changé depuis son ajout
+(stream_version du registre dépassée) ou qui a été supprimée y reste comptée. update_heatmap()
+le détecte et le signale ; seule une reconstruction (rebuild=True) corrige les tuiles.
+"""
+import numpy as np
+from psycopg2 import Binary
+from psycopg2.extras import execute_values
+
+from db.connection import get_conn
+from utils.heatmap import (
+    HEATMAP_MIN_ZOOM, HEATMAP_ZOOMS, TILE_SIZE, compress_tile, decompress_tile, global_pixels, tile_pixel_counts
+)
+from utils.timing import span
+
+
+HEATMAP_BATCH_SIZE = 50
+
+# Clé du verrou consultatif : une seule construction à la fois (ingestion, script)
+HEATMAP_LOCK = 460016
+
+
+def _pending_activities(cur, limit):
+    cur.execute("""
+        SELECT ss.activity_id, ss.stream_version
+        FROM stream_status ss
+        WHERE ss.status = 'fetched'
+        AND NOT EXISTS (SELECT 1 FROM heatmap_activity h WHERE h.activity_id = ss.activity_id)
+        ORDER BY ss.activity_id
+        LIMIT %s
+    """, (limit,))
+    return cur.fetchall()
+
+
+def heatmap_staleness(cur):
+    """
+    Écarts entre la heatmap et les streams en base, que seule une reconstruction corrige.
+
+    Returns:
+        tuple (activités du registre dont les streams ont changé ou ne sont plus en base,
+               échantillons des tuiles sans activité au registre : activités supprimées)
+    """
+    cur.execute("""
+        SELECT COUNT(*) FILTER (
+                   WHERE ss.activity_id IS NULL OR ss.status <> 'fetched'
+                   OR ss.stream_version <> h.stream_version
+               ) AS changed,
+               COALESCE(SUM(h.sample_count), 0) AS registered
+        FROM heatmap_activity h
+        LEFT JOIN stream_status ss ON ss.activity_id = h.activity_id
+    """)
+    registry = cur.fetchone()
+    # Chaque échantillon est compté une fois par zoom : au zoom minimal, les tuiles doivent
+    # totaliser les échantillons du registre
+    cur.execute("SELECT COALESCE(SUM(sample_count), 0) AS counted FROM heatmap_tiles WHERE z = %s",
+                (HEATMAP_MIN_ZOOM,))
+    counted = cur.fetchone()["counted"]
+    return int(registry["changed"]), max(int(counted) - int(registry["registered"]), 0)
+
+
+def _fetch_positions(cur, activity_ids):
+    cur.execute("""
+        SELECT activity_id::bigint AS activity_id, array_agg(lat) AS lat, array_agg(lon) AS lon
+        FROM streams
+        WHERE activity_id = ANY(%s) AND lat IS NOT NULL AND lon IS NOT NULL
+        GROUP BY activity_id
+    """, ([str(activity_id) for activity_id in activity_ids],))
+    return {row["activity_id"]: row for row in cur.fetchall()}
+
+
+def _merge_tiles(cur, additions):
+    """
+    Ajoute des comptes aux tuiles stockées (lecture, addition, réécriture).
+
+    Args:
+        additions: dict (z, x, y) -> (indices de pixel, comptes)
+    """
+    keys = list(additions)
+    zs, xs, ys = zip(*keys)
+    cur.execute("""
+        SELECT t.z, t.x, t.y, t.counts
+        FROM heatmap_tiles t
+        JOIN unnest(%s::smallint[], %s::int[], %s::int[]) AS k(z, x, y)
+            ON t.z = k.z AND t.x = k.x AND t.y = k.y
+    """, (list(zs), list(xs), list(ys)))
+    stored = {(row["z"], row["x"], row["y"]): row["counts"] for row in cur.fetchall()}
+
+    rows = []
+    for key, (pixels, counts) in additions.items():
+        payload = stored.get(key)
+        tile = decompress_tile(bytes(payload) if payload is not None else None).reshape(-1)
+        tile[pixels] += counts.astype(np.uint32)
+        rows.append((*key, Binary(compress_tile(tile.reshape(TILE_SIZE, TILE_SIZE))), int(tile.sum()), int(tile.max())))
+
+    execute_values(cur, """
+        INSERT INTO heatmap_tiles (z, x, y, counts, sample_count, max_count)
+        VALUES %s
+        ON CONFLICT (z, x, y) DO UPDATE SET
+            counts = EXCLUDED.counts,
+            sample_count = EXCLUDED.sample_count,
+            max_count = EXCLUDED.max_count,
+            updated_at = NOW()
+    """, rows, page_size=200)
+
+
+def _add_batch(cur, batch_size):
+    """Ajoute un paquet d'activités à la heatmap. Returns: nombre d'activités traitées."""
+    cur.execute("SELECT pg_advisory_xact_lock(%s)", (HEATMAP_LOCK,))
+    pending = _pending_activities(cur, batch_size)
+    if not pending:
+        return 0
+
+    positions = _fetch_positions(cur, [row["activity_id"] for row in pending])
+    if positions:
+        lat = np.concatenate([np.asarray(row["lat"], dtype=float) for row in positions.values()])
+        lon = np.concatenate([np.asarray(row["lon"], dtype=float) for row in positions.values()])
+        px, py = global_pixels(lat, lon)
+        additions = {}
+        for zoom in HEATMAP_ZOOMS:
+            for (x, y), counts in tile_pixel_counts(px, py, zoom).items():
+                additions[(zoom, x, y)] = counts
+        _merge_tiles(cur, additions)
+
+    # Activités sans GPS comprises : elles ne sont plus reprises
+    execute_values(cur, """
+        INSERT INTO heatmap_activity (activity_id, stream_version, sample_count)
+        VALUES %s
+        ON CONFLICT (activity_id) DO NOTHING
+    """, [
+        (row["activity_id"], row["stream_version"],
+         len(positions[row["activity_id"]]["lat"]) if row["activity_id"] in positions else 0)
+        for row in pending
+    ])
+    return len(pending)
+
+
+def update_heatmap(batch_size=HEATMAP_BATCH_SIZE, rebuild=False):
+    """
+    Ajoute à la heatmap les activités dont les streams n'y sont pas encore.
+
+    Args:
+        batch_size: activités par transaction
+        rebuild: vider la heatmap et la reconstruire entièrement
+
+    Returns:
+        int: nombre d'activités ajoutées
+    """
+    done = 0
+    with get_conn() as conn:
+        if rebuild:
+            with conn.cursor() as cur:
+                cur.execute("SELECT pg_advisory_xact_lock(%s)", (HEATMAP_LOCK,))
+                cur.execute("TRUNCATE heatmap_tiles, heatmap_activity")
+            conn.commit()
+
+        while True:
+            with conn.cursor() as cur:
+                added = _add_batch(cur, batch_size)
+            conn.commit()
+            if not added:
+                break
+            done += added
+            print(f"  🗺️ Heatmap : {done} activités ajoutées")
+
+        with conn.cursor() as cur:
+            changed, orphan_samples = heatmap_staleness(cur)
+        if changed or orphan_samples:
+            print(f"⚠️ Heatmap à reconstruire (--rebuild) : {changed} activités aux streams modifiés, "
+                  f"{orphan_samples} échantillons d'activités supprimées")
+    return done
+
+
+def get_heatmap_tile(z, x, y):
+    """
+    Comptes d'une tuile et saturation de son zoom (plus grand compte d'un pixel à ce zoom).
+
+    Returns:
+        tuple (np.ndarray uint32 (256, 256), saturation) ou None si la tuile est vide
+    """
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            with span("db"):
+                cur.execute("SELECT counts FROM heatmap_tiles WHERE z = %s AND x = %s AND y = %s", (z, x, y))
+                row = cur.fetchone()
+                if row is None:
+                    return None
+                cur.execute("SELECT max_count FROM heatmap_tiles WHERE z = %s ORDER BY max_count DESC LIMIT 1", (z,))
+                saturation = cur.fetchone()["max_count"]
+
+    with span("heatmap"):
+        return decompress_tile(bytes(row["counts"])), saturation
@@ -1,6 +1,7 @@
 import pandas as pd
 from services.activity_service import get_all_activities
 from datetime import datetime, timedelta
+from utils.timing import timed
 
 
 SPORT_MAPPING = {
@@ -10,6 +11,7 @@ SPORT_MAPPING = {
     "Swim": "Swim"
 }
 
+@timed("kpi")
 def prepare_kpis(start_date=None, end_date=None):
     """
     Calcule les KPIs globaux pour les activités de l'utilisateur.
@@ -80,6 +82,7 @@ def prepare_kpis(start_date=None, end_date=None):
     }
 
 
+@timed("kpi")
 def calculate_streak():
     """
     Calcule la série d'activités hebdomadaires consécutives.
@@ -164,6 +167,7 @@ def calculate_streak():
     }
 
 
+@timed("kpi")
 def calculate_records():
     """
     Calcule les records de l'utilisateur sur les distances EXACTES standards.
@@ -1,8 +1,13 @@
 from services.activity_service import *
 import pandas as pd
 from typing import List
+from utils.cache import VersionedCache
+from utils.etag import get_data_versions
+from utils.lttb import lttb_indices
+from utils.timing import span, timed
 
 
+@timed("plot")
 def get_calendar_heatmap_data(df, value_col="distance"):
     """
     Prépare les données pour un calendrier / heatmap.
@@ -32,6 +37,7 @@ def get_calendar_heatmap_data(df, value_col="distance"):
     return {"value_col": value_col, "data": data}
 
 
+@timed("plot")
 def get_repartition_run_data(df_filtered, sport_type):
     """
     Prépare les données pour un barplot horizontal du nombre d'activités
@@ -78,34 +84,95 @@ def get_repartition_run_data(df_filtered, sport_type):
     }
 
 
-def get_poster_elev_profile(n=40, sport_type: List[str] = None):
-    activities = get_last_activities(n=n, sport_type=sport_type)
-    poster_data = []
+# Nombre de points conservés par profil d'élévation du poster
+POSTER_MAX_POINTS = 200
+
+_poster_cache = VersionedCache("poster", maxsize=32)
+
+
+def _round_or_none(value, ndigits=None):
+    return None if value is None else round(value, ndigits)
+
+
+def _simplify_profile(distance, altitude, time_s, max_points):
+    """Profil altitude / distance réduit à max_points points par LTTB (forme des montées préservée)."""
+    distance = np.array(distance, dtype=float)
+    altitude = np.array(altitude, dtype=float)
+    time_s = np.array(time_s, dtype=float)
+
+    valid = ~np.isnan(distance) & ~np.isnan(altitude)
+    distance, altitude, time_s = distance[valid], altitude[valid], time_s[valid]
+
+    keep = lttb_indices(distance, altitude, max_points)
+    return [
+        {"distance_m": d, "altitude": a, "time_s": t}
+        for d, a, t in zip(distance[keep].tolist(), altitude[keep].tolist(), time_s[keep].tolist())
+    ]
+
+
+def _build_poster_elev_profile(n, sport_type, max_points):
+    """Deux requêtes sur la même connexion : les n dernières activités, puis tous leurs streams via ANY."""
+    sport_filter = "AND sport_type = ANY(%s)" if sport_type else ""
+    params = [list(sport_type)] if sport_type else []
 
+    with get_conn() as conn, span("db"):
+        with conn.cursor() as cur:
+            cur.execute(f"""
+                SELECT id, sport_type, distance, moving_time, speed_minutes_per_km_hms, total_elevation_gain
+                FROM activites
+                WHERE start_date IS NOT NULL {sport_filter}
+                ORDER BY start_date DESC, id DESC
+                LIMIT %s
+            """, params + [n])
+            activities = cur.fetchall()
+            if not activities:
+                return []
+
+            cur.execute("""
+                SELECT activity_id,
+                       array_agg(distance_m ORDER BY time_s) AS distance_m,
+                       array_agg(altitude ORDER BY time_s) AS altitude,
+                       array_agg(time_s ORDER BY time_s) AS time_s
+                FROM streams
+                WHERE activity_id = ANY(%s)
+                GROUP BY activity_id
+            """, ([str(act["id"]) for act in activities],))
+            streams_by_activity = {row["activity_id"]: row for row in cur.fetchall()}
+
+    poster_data = []
     for act in activities:
-        activity_id = act["id"]
-        streams = get_streams_for_activity(activity_id)
+        streams = streams_by_activity.get(str(act["id"]))
         if not streams:
             continue
 
-        streams_simple = [
-            {"distance_m": p["distance_m"], "altitude": p["altitude"], "time_s": p["time_s"]}
-            for p in streams
-        ]
-
         poster_data.append({
-            "activity_id": activity_id,
-            "type": act["type"],
-            "distance_km": act["distance_km"],
-            "duree_minutes": act["duree_minutes"],
-            "allure_min_per_km": act["allure_min_per_km"],
-            "denivele_m": act["denivele_m"],
-            "stream_points": streams_simple
+            "activity_id": act["id"],
+            "type": act["sport_type"],
+            "distance_km": _round_or_none(act["distance"], 2),
+            "duree_minutes": act["moving_time"],
+            "allure_min_per_km": act["speed_minutes_per_km_hms"],
+            "denivele_m": _round_or_none(act["total_elevation_gain"]),
+            "stream_points": _simplify_profile(streams["distance_m"], streams["altitude"], streams["time_s"], max_points)
         })
 
     return poster_data
 
 
+def get_poster_elev_profile(n=40, sport_type: List[str] = None, max_points=POSTER_MAX_POINTS):
+    """
+    Profils d'élévation simplifiés des n dernières activités (poster D+).
+    Mis en cache par (n, sport_type, max_points) tant que activites et streams ne changent pas.
+    """
+    versions = get_data_versions(("activites", "streams"))
+    key = (n, tuple(sorted(sport_type)) if sport_type else None, max_points)
+    return _poster_cache.get_or_compute(
+        key,
+        tuple(sorted(versions.items())),
+        lambda: _build_poster_elev_profile(n, sport_type, max_points)
+    )
+
+
+@timed("plot")
 def get_weekly_pace_data(df: pd.DataFrame):
     """
     Calcule l'allure moyenne pondérée par semaine.
@@ -0,0 +1,117 @@
+"""
+Sorties sur un même parcours.
+
+Les candidates sont les activités qui partagent au moins un bucket LSH avec l'activité de
+référence (table route_lsh, utils/route_signature.py) : une lecture d'index, quelle que soit
+la taille de l'historique. Elles sont filtrées par la similarité de Jaccard estimée (MinHash),
+puis par la distance de Fréchet discrète entre tracés simplifiés, précédée d'une borne
+inférieure gratuite (écart des points de départ et d'arrivée).
+"""
+import numpy as np
+
+from db.connection import get_conn
+from utils.geometry import coords_column
+from utils.route_signature import discrete_frechet, estimated_jaccard
+from utils.spatial import haversine_m
+from utils.timing import span
+
+
+FRECHET_ZOOM = 12
+DEFAULT_MAX_FRECHET_M = 250
+MIN_JACCARD = 0.3
+
+
+def _route(cur, activity_id):
+    cur.execute(f"""
+        SELECT s.minhash, g.{coords_column(FRECHET_ZOOM)} AS coords
+        FROM route_signature s
+        JOIN activity_geometry g ON g.activity_id = s.activity_id
+        WHERE s.activity_id = %s
+    """, (activity_id,))
+    return cur.fetchone()
+
+
+def _lsh_candidates(cur, activity_id, sport_type=None):
+    sport_filter = "AND a.sport_type = %s" if sport_type else ""
+    cur.execute(f"""
+        SELECT c.activity_id, c.shared_bands, s.minhash, g.{coords_column(FRECHET_ZOOM)} AS coords
+        FROM (
+            SELECT l.activity_id, COUNT(*) AS shared_bands
+            FROM route_lsh me
+            JOIN route_lsh l ON l.band = me.band AND l.bucket = me.bucket
+            WHERE me.activity_id = %s AND l.activity_id <> %s
+            GROUP BY l.activity_id
+        ) c
+        JOIN route_signature s ON s.activity_id = c.activity_id
+        JOIN activity_geometry g ON g.activity_id = c.activity_id
+        JOIN activites a ON a.id = c.activity_id
+        WHERE g.coords IS NOT NULL
+        {sport_filter}
+    """, (activity_id, activity_id, *([sport_type] if sport_type else [])))
+    return cur.fetchall()
+
+
+def _endpoints_gap(route, other):
+    """Borne inférieure de la distance de Fréchet : les deux départs et les deux arrivées s'apparient."""
+    ends = np.array([route[0], route[-1]], dtype=float)
+    other_ends = np.array([other[0], other[-1]], dtype=float)
+    return float(haversine_m(ends[:, 0], ends[:, 1], other_ends[:, 0], other_ends[:, 1]).max())
+
+
+def get_similar_routes(activity_id, max_frechet_m=DEFAULT_MAX_FRECHET_M, sport_type=None, limit=100):
+    """
+    Activités sur le même parcours qu'une activité (même sens de parcours).
+
+    Args:
+        activity_id: activité de référence
+        max_frechet_m: distance de Fréchet maximale entre les tracés (mètres)
+        sport_type: filtrer par type de sport
+        limit: nombre max d'activités renvoyées (les plus récentes)
+
+    Returns:
+        dict {"activity_id", "candidates", "count", "activities": [...]} (chaque activité avec
+        jaccard et frechet_m), None si l'activité n'a pas de signature de parcours
+    """
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            with span("db"):
+                reference = _route(cur, activity_id)
+                if reference is None or not reference["coords"]:
+                    return None
+                candidates = _lsh_candidates(cur, activity_id, sport_type)
+
+            matches = {}
+            with span("routes"):
+                for candidate in candidates:
+                    jaccard = estimated_jaccard(reference["minhash"], candidate["minhash"])
+                    if jaccard < MIN_JACCARD or not candidate["coords"]:
+                        continue
+                    if _endpoints_gap(reference["coords"], candidate["coords"]) > max_frechet_m:
+                        continue
+                    frechet = discrete_frechet(reference["coords"], candidate["coords"])
+                    if frechet <= max_frechet_m:
+                        matches[candidate["activity_id"]] = (jaccard, frechet)
+
+            activities = []
+            if matches:
+                with span("db"):
+                    cur.execute("""
+                        SELECT id, name, sport_type, start_date, distance, moving_time, moving_time_hms
+                        FROM activites
+                        WHERE id = ANY(%s)
+                        ORDER BY start_date DESC
+                        LIMIT %s
+                    """, (list(matches), limit))
+                    activities = cur.fetchall()
+
+    for activity in activities:
+        jaccard, frechet = matches[activity["id"]]
+        activity["jaccard"] = round(jaccard, 3)
+        activity["frechet_m"] = round(frechet, 1)
+
+    return {
+        "activity_id": int(activity_id),
+        "candidates": len(candidates),
+        "count": len(matches),
+        "activities": activities,
+    }
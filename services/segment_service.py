@@ -0,0 +1,379 @@
+"""
+Segments définis par l'utilisateur et détection des efforts.
+
+Un segment est un tracé avec une porte de départ et une porte d'arrivée : segments de
+2 * gate_width_m mètres, perpendiculaires au tracé, à ses extrémités. La détection se fait
+en deux étapes :
+
+1. Candidates : activités dont les cellules de l'index spatial (stream_cells) couvrent au
+   moins SEGMENT_CELL_COVERAGE des cellules du segment (segment_cells), par une jointure SQL.
+2. Passages : sur les streams des candidates (projetés en mètres autour du départ), chaque
+   pas entre deux échantillons est testé contre les portes d'un seul calcul NumPy. L'instant
+   du franchissement est interpolé dans le pas. Un effort va d'un franchissement de la porte
+   de départ (dans le sens du segment) au franchissement suivant de la porte d'arrivée, la
+   distance parcourue devant rester proche de la longueur du segment.
+
+Un nouveau segment est comparé à tout l'historique ; les nouveaux streams le sont à tous les
+segments après leur ingestion (match_activities).
+"""
+import math
+
+import numpy as np
+from psycopg2.extras import execute_values
+
+from db.connection import get_conn
+from utils.route_signature import densify
+from utils.spatial import GRID_CELL_DEG, METERS_PER_DEG_LAT, cell_of
+from utils.timing import span
+
+
+SEGMENT_CELL_COVERAGE = 0.8
+GATE_DIRECTION_M = 20       # direction des portes : tracé sur les 20 premiers / derniers mètres
+MIN_DISTANCE_RATIO = 0.8    # distance parcourue entre les portes / longueur du segment
+MAX_DISTANCE_RATIO = 1.5
+SEGMENT_MATCH_BATCH_SIZE = 50
+
+
+def _to_local(lat, lon, origin):
+    """Projection équirectangulaire en mètres autour de origin (lat, lon)."""
+    scale = math.cos(math.radians(origin[0]))
+    return np.column_stack((
+        (np.asarray(lon, dtype=float) - origin[1]) * METERS_PER_DEG_LAT * scale,
+        (np.asarray(lat, dtype=float) - origin[0]) * METERS_PER_DEG_LAT,
+    ))
+
+
+def _gate_direction(points, cumulative, at_start):
+    """Direction unitaire du tracé sur ses GATE_DIRECTION_M premiers (ou derniers) mètres."""
+    if at_start:
+        far = min(int(np.searchsorted(cumulative, GATE_DIRECTION_M)), len(points) - 1)
+        vector = points[max(far, 1)] - points[0]
+    else:
+        near = max(int(np.searchsorted(cumulative, cumulative[-1] - GATE_DIRECTION_M)) - 1, 0)
+        vector = points[-1] - points[min(near, len(points) - 2)]
+    length = np.hypot(*vector)
+    return vector / length if length > 0 else np.array([0.0, 1.0])
+
+
+def segment_geometry(coords, gate_width_m):
+    """
+    Géométrie d'un segment : longueur, cellules couvertes et portes.
+
+    Args:
+        coords: tracé [[lat, lon], ...]
+
+    Returns:
+        dict: origin, distance_m, cells (tableau (n, 2) cell_y, cell_x), start_gate, end_gate ;
+        une porte est (centre, direction) en mètres dans la projection locale
+    """
+    coords = np.asarray(coords, dtype=float)
+    origin = (float(coords[0, 0]), float(coords[0, 1]))
+    points = _to_local(coords[:, 0], coords[:, 1], origin)
+    cumulative = np.concatenate(([0.0], np.cumsum(np.hypot(*np.diff(points, axis=0).T))))
+
+    dense = densify(coords, GRID_CELL_DEG / 4)
+    cell_y, cell_x = cell_of(dense[:, 0], dense[:, 1])
+    cells = np.unique(np.column_stack((cell_y, cell_x)), axis=0)
+
+    return {
+        "origin": origin,
+        "distance_m": float(cumulative[-1]),
+        "gate_width_m": float(gate_width_m),
+        "cells": cells,
+        "start_gate": (points[0], _gate_direction(points, cumulative, at_start=True)),
+        "end_gate": (points[-1], _gate_direction(points, cumulative, at_start=False)),
+    }
+
+
+def gate_crossings(points, time_s, cumulative, gate, half_width):
+    """
+    Franchissements d'une porte dans le sens du segment, interpolés dans le pas.
+
+    Args:
+        points: positions (n, 2) en mètres ; time_s, cumulative : temps et distance parcourue
+
+    Returns:
+        tuple (instants, distances parcourues) des franchissements, triés
+    """
+    center, direction = gate
+    normal = np.array([-direction[1], direction[0]])
+    along = (points - center) @ direction
+    a, b = along[:-1], along[1:]
+    crossing = (a < 0) & (b >= 0)
+    steps = np.flatnonzero(crossing)
+    if len(steps) == 0:
+        return np.empty(0), np.empty(0)
+
+    t = a[steps] / (a[steps] - b[steps])
+    hit = points[steps] + (points[steps + 1] - points[steps]) * t[:, None]
+    inside = np.abs((hit - center) @ normal) <= half_width
+    steps, t = steps[inside], t[inside]
+    times = time_s[steps] + t * (time_s[steps + 1] - time_s[steps])
+    distances = cumulative[steps] + t * (cumulative[steps + 1] - cumulative[steps])
+    return times, distances
+
+
+def detect_efforts(geometry, time_s, lat, lon, distance_m=None):
+    """
+    Efforts d'une activité sur un segment.
+
+    Args:
+        distance_m: distance cumulée du stream (lissée par Strava) ; à défaut, somme des pas GPS
+
+    Returns:
+        list de tuples (start_time_s, elapsed_time_s, distance_m)
+    """
+    time_s = np.asarray(time_s, dtype=float)
+    if len(time_s) < 2:
+        return []
+    points = _to_local(lat, lon, geometry["origin"])
+    cumulative = np.asarray(distance_m if distance_m is not None else [], dtype=float)
+    if len(cumulative) != len(time_s) or not np.isfinite(cumulative).all():
+        cumulative = np.concatenate(([0.0], np.cumsum(np.hypot(*np.diff(points, axis=0).T))))
+    half_width = geometry["gate_width_m"]
+
+    start_times, start_dist = gate_crossings(points, time_s, cumulative, geometry["start_gate"], half_width)
+    end_times, end_dist = gate_crossings(points, time_s, cumulative, geometry["end_gate"], half_width)
+    if len(start_times) == 0 or len(end_times) == 0:
+        return []
+
+    # Pour chaque arrivée, le dernier départ franchi au moins MIN_DISTANCE_RATIO * longueur
+    # plus tôt (une boucle a ses deux portes au même endroit) ; une arrivée par départ, la première
+    length = geometry["distance_m"]
+    latest_start = np.searchsorted(start_dist, end_dist - MIN_DISTANCE_RATIO * length, side="right") - 1
+    valid = latest_start >= 0
+    end_index = np.flatnonzero(valid)
+    start_index, first = np.unique(latest_start[valid], return_index=True)
+    end_index = end_index[first]
+
+    elapsed = end_times[end_index] - start_times[start_index]
+    travelled = end_dist[end_index] - start_dist[start_index]
+    ok = (elapsed > 0) & (travelled <= MAX_DISTANCE_RATIO * length)
+    return [
+        (float(start), float(duration), float(distance))
+        for start, duration, distance in zip(start_times[start_index][ok], elapsed[ok], travelled[ok])
+    ]
+
+
+def _segment_row_geometry(segment):
+    return segment_geometry(segment["coords"], segment["gate_width_m"])
+
+
+def _fetch_positions(cur, activity_ids):
+    cur.execute("""
+        SELECT s.activity_id::bigint AS activity_id, a.start_date,
+               array_agg(s.time_s ORDER BY s.time_s) AS time_s,
+               array_agg(s.lat ORDER BY s.time_s) AS lat,
+               array_agg(s.lon ORDER BY s.time_s) AS lon,
+               array_agg(s.distance_m ORDER BY s.time_s) AS distance_m
+        FROM streams s
+        JOIN activites a ON a.id = s.activity_id::bigint
+        WHERE s.activity_id = ANY(%s) AND s.lat IS NOT NULL AND s.lon IS NOT NULL
+        GROUP BY s.activity_id, a.start_date
+    """, ([str(activity_id) for activity_id in activity_ids],))
+    return cur.fetchall()
+
+
+def _match_pairs(cur, pairs, segments):
+    """
+    Détecte les efforts de couples (segment, activité) candidats.
+
+    Args:
+        pairs: dict activity_id -> liste de segment_id
+        segments: dict segment_id -> géométrie
+
+    Returns:
+        list de lignes à insérer dans segment_efforts
+    """
+    efforts = []
+    activity_ids = list(pairs)
+    for offset in range(0, len(activity_ids), SEGMENT_MATCH_BATCH_SIZE):
+        with span("db"):
+            activities = _fetch_positions(cur, activity_ids[offset:offset + SEGMENT_MATCH_BATCH_SIZE])
+        with span("segments"):
+            for activity in activities:
+                for segment_id in pairs[activity["activity_id"]]:
+                    for start, elapsed, distance in detect_efforts(
+                        segments[segment_id], activity["time_s"], activity["lat"], activity["lon"],
+                        activity["distance_m"]
+                    ):
+                        efforts.append((segment_id, activity["activity_id"], activity["start_date"], start, elapsed, distance))
+    return efforts
+
+
+def _insert_efforts(cur, efforts):
+    if efforts:
+        execute_values(cur, """
+            INSERT INTO segment_efforts (segment_id, activity_id, start_date, start_time_s, elapsed_time_s, distance_m)
+            VALUES %s
+            ON CONFLICT (segment_id, activity_id, start_time_s) DO NOTHING
+        """, efforts)
+
+
+def _candidates(cur, segment_ids=None, activity_ids=None):
+    """
+    Couples (segment, activité) dont les cellules couvrent SEGMENT_CELL_COVERAGE du segment.
+
+    Returns:
+        dict activity_id -> liste de segment_id
+    """
+    filters, params = [], []
+    if segment_ids is not None:
+        filters.append("g.id = ANY(%s)")
+        params.append(list(segment_ids))
+    if activity_ids is not None:
+        filters.append("c.activity_id = ANY(%s)")
+        params.append([int(activity_id) for activity_id in activity_ids])
+    cur.execute(f"""
+        SELECT c.activity_id, g.id AS segment_id
+        FROM segment_cells sc
+        JOIN segments g ON g.id = sc.segment_id
+        JOIN stream_cells c ON c.cell_y = sc.cell_y AND c.cell_x = sc.cell_x
+        JOIN activites a ON a.id = c.activity_id
+        WHERE (g.sport_type IS NULL OR g.sport_type = a.sport_type)
+        {''.join(f' AND {f}' for f in filters)}
+        GROUP BY c.activity_id, g.id, g.cell_count
+        HAVING COUNT(*) >= CEIL(g.cell_count * %s)
+    """, params + [SEGMENT_CELL_COVERAGE])
+    pairs = {}
+    for row in cur.fetchall():
+        pairs.setdefault(row["activity_id"], []).append(row["segment_id"])
+    return pairs
+
+
+def _segments_geometry(cur, segment_ids=None):
+    where = "WHERE id = ANY(%s)" if segment_ids is not None else ""
+    cur.execute(f"SELECT id, coords, gate_width_m FROM segments {where}",
+                (list(segment_ids),) if segment_ids is not None else None)
+    return {row["id"]: _segment_row_geometry(row) for row in cur.fetchall()}
+
+
+def match_segment(cur, segment_id):
+    """Recalcule les efforts d'un segment sur tout l'historique (dans la transaction du curseur)."""
+    segments = _segments_geometry(cur, [segment_id])
+    cur.execute("DELETE FROM segment_efforts WHERE segment_id = %s", (segment_id,))
+    efforts = _match_pairs(cur, _candidates(cur, segment_ids=[segment_id]), segments)
+    _insert_efforts(cur, efforts)
+    return len(efforts)
+
+
+def match_activities(activity_ids):
+    """
+    Recalcule les efforts d'activités sur tous les segments (après ingestion de leurs streams).
+
+    Returns:
+        int: nombre d'efforts détectés
+    """
+    activity_ids = [int(activity_id) for activity_id in activity_ids]
+    if not activity_ids:
+        return 0
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute("DELETE FROM segment_efforts WHERE activity_id = ANY(%s)", (activity_ids,))
+            pairs = _candidates(cur, activity_ids=activity_ids)
+            efforts = []
+            if pairs:
+                segment_ids = {segment_id for ids in pairs.values() for segment_id in ids}
+                efforts = _match_pairs(cur, pairs, _segments_geometry(cur, segment_ids))
+                _insert_efforts(cur, efforts)
+        conn.commit()
+    return len(efforts)
+
+
+def create_segment(segment):
+    """
+    Crée un segment et détecte ses efforts dans tout l'historique.
+
+    Args:
+        segment: SegmentCreate
+
+    Returns:
+        dict: segment créé (sans son tracé) avec effort_count
+    """
+    coords = segment.route()
+    geometry = segment_geometry(coords, segment.gate_width_m)
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute("""
+                INSERT INTO segments (name, sport_type, coords, distance_m, gate_width_m, cell_count)
+                VALUES (%s, %s, %s, %s, %s, %s)
+                RETURNING id, name, sport_type, distance_m, gate_width_m, created_at
+            """, (segment.name, segment.sport_type, [list(map(float, point)) for point in coords],
+                  geometry["distance_m"], segment.gate_width_m, len(geometry["cells"])))
+            created = cur.fetchone()
+            execute_values(cur, """
+                INSERT INTO segment_cells (cell_y, cell_x, segment_id) VALUES %s
+            """, [(int(y), int(x), created["id"]) for y, x in geometry["cells"]])
+            created["effort_count"] = match_segment(cur, created["id"])
+        conn.commit()
+    return created
+
+
+def list_segments():
+    """Segments avec leur nombre d'efforts et le meilleur temps."""
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute("""
+                SELECT g.id, g.name, g.sport_type, g.distance_m, g.gate_width_m, g.created_at,
+                       COUNT(e.id) AS effort_count, MIN(e.elapsed_time_s) AS best_time_s
+                FROM segments g
+                LEFT JOIN segment_efforts e ON e.segment_id = g.id
+                GROUP BY g.id
+                ORDER BY g.name
+            """)
+            return cur.fetchall()
+
+
+def get_segment(segment_id):
+    """Segment avec son tracé, None s'il n'existe pas."""
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute("""
+                SELECT id, name, sport_type, coords, distance_m, gate_width_m, created_at
+                FROM segments WHERE id = %s
+            """, (segment_id,))
+            return cur.fetchone()
+
+
+def delete_segment(segment_id):
+    """Supprime un segment et ses efforts. Returns: True si le segment existait."""
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute("DELETE FROM segments WHERE id = %s", (segment_id,))
+            deleted = cur.rowcount > 0
+        conn.commit()
+    return deleted
+
+
+def get_leaderboard(segment_id, limit=50, best_per_activity=True):
+    """
+    Classement des efforts d'un segment, du plus rapide au plus lent.
+
+    Args:
+        best_per_activity: ne garder que le meilleur effort de chaque activité
+
+    Returns:
+        list de dicts (rang, activité, temps, vitesse moyenne) ; None si le segment n'existe pas
+    """
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            with span("db"):
+                cur.execute("SELECT 1 FROM segments WHERE id = %s", (segment_id,))
+                if cur.fetchone() is None:
+                    return None
+                distinct = "DISTINCT ON (e.activity_id)" if best_per_activity else ""
+                cur.execute(f"""
+                    SELECT RANK() OVER (ORDER BY elapsed_time_s) AS rank, *
+                    FROM (
+                        SELECT {distinct} e.id AS effort_id, e.activity_id, a.name, a.sport_type,
+                               e.start_date, e.start_time_s, e.elapsed_time_s, e.distance_m,
+                               ROUND((e.distance_m / e.elapsed_time_s * 3.6)::numeric, 2)::float AS average_speed
+                        FROM segment_efforts e
+                        JOIN activites a ON a.id = e.activity_id
+                        WHERE e.segment_id = %s
+                        ORDER BY {"e.activity_id, " if best_per_activity else ""}e.elapsed_time_s
+                    ) efforts
+                    ORDER BY elapsed_time_s
+                    LIMIT %s
+                """, (segment_id, limit))
+                return cur.fetchall()
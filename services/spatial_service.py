@@ -0,0 +1,129 @@
+"""
+Recherche spatiale sur les streams : activités passées près d'un point.
+
+Les candidates viennent de l'index stream_cells (utils/spatial.py) : seules les cellules
+couvrant le cercle sont lues. Les échantillons GPS des candidates, limités au rectangle
+englobant le cercle, sont ensuite mesurés en une seule passe haversine NumPy.
+"""
+import numpy as np
+
+from db.connection import get_conn
+from utils.spatial import bbox_around, cell_range, haversine_m
+from utils.timing import span
+
+
+MAX_NEAR_RADIUS_M = 5000
+MAX_NEAR_RESULTS = 500
+
+
+def _candidate_activities(cur, lat, lon, radius_m, sport_type=None):
+    min_y, max_y, min_x, max_x = cell_range(lat, lon, radius_m)
+    sport_filter = "AND a.sport_type = %s" if sport_type else ""
+    cur.execute(f"""
+        SELECT DISTINCT c.activity_id
+        FROM stream_cells c
+        JOIN activites a ON a.id = c.activity_id
+        WHERE c.cell_y BETWEEN %s AND %s
+        AND c.cell_x BETWEEN %s AND %s
+        {sport_filter}
+    """, (min_y, max_y, min_x, max_x, *([sport_type] if sport_type else [])))
+    return [row["activity_id"] for row in cur.fetchall()]
+
+
+def _samples_in_bbox(cur, activity_ids, bbox):
+    min_lat, min_lon, max_lat, max_lon = bbox
+    cur.execute("""
+        SELECT activity_id,
+               array_agg(time_s ORDER BY time_s) AS time_s,
+               array_agg(lat ORDER BY time_s) AS lat,
+               array_agg(lon ORDER BY time_s) AS lon
+        FROM streams
+        WHERE activity_id = ANY(%s)
+        AND lat BETWEEN %s AND %s
+        AND lon BETWEEN %s AND %s
+        GROUP BY activity_id
+    """, ([str(activity_id) for activity_id in activity_ids], min_lat, max_lat, min_lon, max_lon))
+    return cur.fetchall()
+
+
+def closest_passes(samples, lat, lon):
+    """
+    Point le plus proche de (lat, lon) pour chaque activité.
+
+    Args:
+        samples: lignes {activity_id, time_s, lat, lon} (tableaux par activité)
+
+    Returns:
+        dict activity_id -> (distance en mètres, time_s du passage)
+    """
+    samples = [row for row in samples if row["lat"]]
+    if not samples:
+        return {}
+
+    sizes = np.array([len(row["lat"]) for row in samples])
+    starts = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+    lats = np.concatenate([np.asarray(row["lat"], dtype=float) for row in samples])
+    lons = np.concatenate([np.asarray(row["lon"], dtype=float) for row in samples])
+    times = np.concatenate([np.asarray(row["time_s"], dtype=float) for row in samples])
+
+    distances = haversine_m(lat, lon, lats, lons)
+    minima = np.minimum.reduceat(distances, starts)
+    passes = {}
+    for row, start, size, minimum in zip(samples, starts, sizes, minima):
+        closest = start + int(np.argmin(distances[start:start + size]))
+        passes[int(row["activity_id"])] = (float(minimum), float(times[closest]))
+    return passes
+
+
+def get_activities_near(lat, lon, radius_m=200, sport_type=None, limit=100):
+    """
+    Activités dont le tracé GPS passe à moins de radius_m mètres d'un point.
+
+    Args:
+        lat, lon: point recherché (degrés)
+        radius_m: rayon de recherche en mètres (max MAX_NEAR_RADIUS_M)
+        sport_type: filtrer par type de sport
+        limit: nombre max d'activités renvoyées (les plus récentes)
+
+    Returns:
+        dict: {"lat", "lon", "radius_m", "candidates", "count", "activities": [...]}
+        chaque activité avec closest_distance_m et closest_time_s (instant du passage)
+    """
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            with span("db"):
+                candidates = _candidate_activities(cur, lat, lon, radius_m, sport_type)
+                samples = _samples_in_bbox(cur, candidates, bbox_around(lat, lon, radius_m)) if candidates else []
+
+            with span("spatial"):
+                passes = {
+                    activity_id: closest
+                    for activity_id, closest in closest_passes(samples, lat, lon).items()
+                    if closest[0] <= radius_m
+                }
+
+            activities = []
+            if passes:
+                with span("db"):
+                    cur.execute("""
+                        SELECT id, name, sport_type, start_date, distance, moving_time
+                        FROM activites
+                        WHERE id = ANY(%s)
+                        ORDER BY start_date DESC
+                        LIMIT %s
+                    """, (list(passes), limit))
+                    activities = cur.fetchall()
+
+    for activity in activities:
+        distance, time_s = passes[activity["id"]]
+        activity["closest_distance_m"] = round(distance, 1)
+        activity["closest_time_s"] = time_s
+
+    return {
+        "lat": lat,
+        "lon": lon,
+        "radius_m": radius_m,
+        "candidates": len(candidates),
+        "count": len(passes),
+        "activities": activities,
+    }
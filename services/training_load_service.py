@@ -0,0 +1,266 @@
+"""
+Modèle charge / forme (Banister) : TRIMP par activité, puis CTL / ATL / TSB par jour.
+
+Charge d'une activité (TRIMP), par ordre de préférence :
+- hr_stream    : TRIMP de Banister sur le stream de FC, somme de dt(min) * HRr * 0.64 * e^(1.92 * HRr)
+                 avec HRr = (FC - HR_REST) / (HR_MAX - HR_REST)
+- suffer_score : Relative Effort calculé par Strava
+- avg_hr       : même formule sur la FC moyenne et la durée en mouvement
+- duration     : durée en mouvement * FALLBACK_TRIMP_PER_MINUTE
+
+Récurrence journalière (moyennes exponentielles, constantes de 42 et 7 jours) :
+    CTL_j = CTL_j-1 + (charge_j - CTL_j-1) / 42    (forme)
+    ATL_j = ATL_j-1 + (charge_j - ATL_j-1) / 7     (fatigue)
+    TSB_j = CTL_j-1 - ATL_j-1                      (fraîcheur du matin)
+
+Les triggers de la migration 0013 marquent dans training_load_dirty les jours touchés par
+une écriture (activité ou streams). update_training_load() ne recalcule que la charge des
+activités de ces jours, puis la récurrence à partir du premier jour marqué en repartant de
+l'état de la veille : le coût suit le nombre de jours depuis la modification, pas la taille
+de l'historique.
+"""
+import os
+from datetime import date, datetime, timedelta
+
+import numpy as np
+from psycopg2.extras import execute_values
+
+from db.connection import get_conn
+from utils.timing import span
+
+
+HR_REST = float(os.getenv("HR_REST", 60))
+HR_MAX = float(os.getenv("HR_MAX", 190))
+TRIMP_A = 0.64
+TRIMP_B = 1.92
+FALLBACK_TRIMP_PER_MINUTE = 1.0
+MIN_HR_SAMPLES = 60
+MAX_SAMPLE_GAP = 10         # s : un écart plus long entre deux échantillons est une pause
+CTL_DAYS = 42
+ATL_DAYS = 7
+DEFAULT_RANGE_DAYS = 180
+
+# Clé du verrou consultatif : une seule mise à jour à la fois entre les workers
+TRAINING_LOAD_LOCK = 460013
+
+
+def _hr_reserve(heartrate, hr_rest=HR_REST, hr_max=HR_MAX):
+    return np.clip((np.asarray(heartrate, dtype=float) - hr_rest) / (hr_max - hr_rest), 0.0, 1.0)
+
+
+def trimp_from_stream(time_s, heartrate, hr_rest=HR_REST, hr_max=HR_MAX):
+    """
+    TRIMP de Banister sur les échantillons de FC (NaN ignorés, pauses exclues).
+
+    Returns:
+        float ou None si moins de MIN_HR_SAMPLES échantillons de FC
+    """
+    time_s = np.asarray(time_s, dtype=float)
+    heartrate = np.asarray(heartrate, dtype=float)
+    valid = np.isfinite(time_s) & np.isfinite(heartrate) & (heartrate > 0)
+    if valid.sum() < MIN_HR_SAMPLES:
+        return None
+    time_s, heartrate = time_s[valid], heartrate[valid]
+
+    # Durée représentée par chaque échantillon (écart au suivant, pauses exclues)
+    dt = np.diff(time_s, append=time_s[-1])
+    dt = np.where((dt > 0) & (dt <= MAX_SAMPLE_GAP), dt, 0.0) / 60
+    hrr = _hr_reserve(heartrate, hr_rest, hr_max)
+    return float((dt * hrr * TRIMP_A * np.exp(TRIMP_B * hrr)).sum())
+
+
+def activity_trimp(row):
+    """
+    Charge d'une activité à partir de sa ligne (colonnes de _fetch_day_activities).
+
+    Returns:
+        tuple (trimp, source)
+    """
+    if row.get("heartrate"):
+        trimp = trimp_from_stream(
+            np.array(row["time_s"], dtype=float), np.array(row["heartrate"], dtype=float)
+        )
+        if trimp is not None:
+            return trimp, "hr_stream"
+    if row.get("suffer_score"):
+        return float(row["suffer_score"]), "suffer_score"
+
+    minutes = float(row.get("moving_time") or 0)  # moving_time est stocké en minutes
+    if row.get("average_heartrate"):
+        hrr = float(_hr_reserve(row["average_heartrate"]))
+        return minutes * hrr * TRIMP_A * float(np.exp(TRIMP_B * hrr)), "avg_hr"
+    return minutes * FALLBACK_TRIMP_PER_MINUTE, "duration"
+
+
+def _fetch_day_activities(cur, days):
+    cur.execute("""
+        SELECT a.id, COALESCE(a.start_date_local, a.start_date)::date AS day,
+               a.suffer_score, a.moving_time, a.average_heartrate,
+               s.time_s, s.heartrate
+        FROM activites a
+        LEFT JOIN LATERAL (
+            SELECT array_agg(time_s ORDER BY time_s) AS time_s,
+                   array_agg(heartrate ORDER BY time_s) AS heartrate
+            FROM streams
+            WHERE activity_id = a.id::text AND heartrate IS NOT NULL
+        ) s ON a.has_heartrate IS NOT FALSE
+        WHERE COALESCE(a.start_date_local, a.start_date)::date = ANY(%s)
+    """, (list(days),))
+    return cur.fetchall()
+
+
+def _refresh_activity_loads(cur, days):
+    """Recalcule la charge de toutes les activités des jours donnés."""
+    cur.execute("DELETE FROM activity_load WHERE day = ANY(%s)", (list(days),))
+    rows = []
+    for activity in _fetch_day_activities(cur, days):
+        trimp, source = activity_trimp(activity)
+        rows.append((activity["id"], activity["day"], trimp, source))
+    if rows:
+        execute_values(cur, """
+            INSERT INTO activity_load (activity_id, day, trimp, source)
+            VALUES %s
+        """, rows)
+    return len(rows)
+
+
+def training_load_recursion(loads, ctl=0.0, atl=0.0):
+    """
+    Déroule la récurrence CTL / ATL / TSB sur une suite de charges journalières.
+
+    Args:
+        loads: charges des jours consécutifs
+        ctl, atl: état de la veille du premier jour
+
+    Returns:
+        tuple de tableaux NumPy (ctl, atl, tsb)
+    """
+    n = len(loads)
+    ctl_out, atl_out, tsb_out = np.empty(n), np.empty(n), np.empty(n)
+    for i, load in enumerate(loads):
+        tsb_out[i] = ctl - atl
+        ctl += (load - ctl) / CTL_DAYS
+        atl += (load - atl) / ATL_DAYS
+        ctl_out[i], atl_out[i] = ctl, atl
+    return ctl_out, atl_out, tsb_out
+
+
+def update_training_load(today=None):
+    """
+    Met à jour activity_load et training_load_daily à partir des jours marqués.
+
+    La série journalière va du premier jour d'activité jusqu'à aujourd'hui ; elle est
+    prolongée chaque jour (charge nulle) même sans nouvelle activité.
+
+    Returns:
+        int: nombre de jours recalculés
+    """
+    today = today or date.today()
+
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            with span("db"):
+                cur.execute("SELECT pg_advisory_xact_lock(%s)", (TRAINING_LOAD_LOCK,))
+                cur.execute("DELETE FROM training_load_dirty RETURNING day")
+                dirty = [row["day"] for row in cur.fetchall()]
+                cur.execute("SELECT MAX(day) AS last_day FROM training_load_daily")
+                last_day = cur.fetchone()["last_day"]
+
+            if dirty:
+                with span("training_load"):
+                    _refresh_activity_loads(cur, dirty)
+                first_day = min(dirty)
+                # Jours écoulés depuis la dernière extension de la série : recalculés aussi,
+                # sinon la récurrence repartirait d'un état sans décroissance sur l'intervalle
+                if last_day is not None:
+                    first_day = min(first_day, last_day + timedelta(days=1))
+            elif last_day is not None and last_day < today:
+                first_day = last_day + timedelta(days=1)
+            else:
+                conn.commit()
+                return 0
+
+            with span("db"):
+                cur.execute("""
+                    SELECT MIN(day) AS first_activity, MAX(day) AS last_activity FROM activity_load
+                """)
+                bounds = cur.fetchone()
+                if bounds["first_activity"] is None:
+                    cur.execute("DELETE FROM training_load_daily")
+                    conn.commit()
+                    return 0
+                # La série commence au premier jour d'activité (un jour marqué peut être vide)
+                first_day = max(first_day, bounds["first_activity"])
+                last_day = max(today, bounds["last_activity"])
+
+                cur.execute("""
+                    SELECT ctl, atl FROM training_load_daily
+                    WHERE day < %s AND day >= %s ORDER BY day DESC LIMIT 1
+                """, (first_day, bounds["first_activity"]))
+                previous = cur.fetchone() or {"ctl": 0.0, "atl": 0.0}
+
+                cur.execute("""
+                    SELECT day, SUM(trimp) AS load FROM activity_load
+                    WHERE day BETWEEN %s AND %s
+                    GROUP BY day
+                """, (first_day, last_day))
+                daily = {row["day"]: row["load"] for row in cur.fetchall()}
+
+            with span("training_load"):
+                days = [first_day + timedelta(days=i) for i in range((last_day - first_day).days + 1)]
+                loads = np.array([daily.get(day, 0.0) for day in days], dtype=float)
+                ctl, atl, tsb = training_load_recursion(loads, previous["ctl"], previous["atl"])
+
+            with span("db"):
+                cur.execute("""
+                    DELETE FROM training_load_daily
+                    WHERE day >= %s OR day < %s OR day > %s
+                """, (first_day, bounds["first_activity"], last_day))
+                execute_values(cur, """
+                    INSERT INTO training_load_daily (day, load, ctl, atl, tsb)
+                    VALUES %s
+                """, [
+                    (day, float(load), float(c), float(a), float(t))
+                    for day, load, c, a, t in zip(days, loads, ctl, atl, tsb)
+                ], page_size=1000)
+        conn.commit()
+
+    return len(days)
+
+
+def get_training_load(start_date=None, end_date=None):
+    """
+    Charge, CTL, ATL et TSB par jour sur une période (mise à jour incrémentale préalable).
+
+    Args:
+        start_date: Date de début YYYY-MM-DD (défaut: DEFAULT_RANGE_DAYS jours avant la fin)
+        end_date: Date de fin YYYY-MM-DD (défaut: aujourd'hui)
+
+    Returns:
+        list de dicts {day, load, ctl, atl, tsb}
+
+    Raises:
+        ValueError: si les dates sont invalides
+    """
+    end = datetime.strptime(end_date, "%Y-%m-%d").date() if end_date else date.today()
+    start = (datetime.strptime(start_date, "%Y-%m-%d").date() if start_date
+             else end - timedelta(days=DEFAULT_RANGE_DAYS))
+    if start > end:
+        raise ValueError("start_date doit précéder end_date")
+
+    update_training_load()
+
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            with span("db"):
+                cur.execute("""
+                    SELECT day,
+                           ROUND(load::numeric, 1)::float AS load,
+                           ROUND(ctl::numeric, 1)::float AS ctl,
+                           ROUND(atl::numeric, 1)::float AS atl,
+                           ROUND(tsb::numeric, 1)::float AS tsb
+                    FROM training_load_daily
+                    WHERE day BETWEEN %s AND %s
+                    ORDER BY day
+                """, (start, end))
+                return cur.fetchall()
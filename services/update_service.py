@@ -1,9 +1,12 @@
 from strava.fetch_strava import fetch_strava_data, get_strava_header, fetch_multiple_streams_df
 from strava.clean_data import clean_data
-from strava.store_data import store_df_in_postgresql, store_df_streams_in_postgresql_optimized
+from strava.store_data import store_df_in_postgresql, store_df_streams_copy, store_stream_status
 from strava.params import *
 from sqlalchemy import text
 from db.connection import get_engine
+from services.heatmap_service import update_heatmap
+from services.segment_service import match_activities
+from utils.metrics import INGEST_FAILURES
 
 
 def get_last_activity_date():
@@ -34,6 +37,7 @@ def update_activities_database():
     et vérifie si les nouvelles activités battent des records personnels.
     """
     from services.records_service import check_and_update_record_with_activity
+    from services.training_load_service import update_training_load
 
     new_data = update_strava()
     if new_data is None:
@@ -62,6 +66,13 @@ def update_activities_database():
         broken_records = check_and_update_record_with_activity(activity['id'], activity_data)
         total_broken_records.extend(broken_records)
 
+    # Charge d'entraînement : seuls les jours des nouvelles activités sont recalculés
+    try:
+        update_training_load()
+    except Exception as e:
+        INGEST_FAILURES.labels(stage="training_load").inc()
+        print(f"⚠️ Mise à jour de la charge d'entraînement impossible : {e}")
+
     message = f"{len(cleaned_data)} nouvelle(s) activité(s) ajoutée(s)"
     if total_broken_records:
         message += f" - 🎉 {len(total_broken_records)} record(s) battu(s) ! ({', '.join(total_broken_records)})"
@@ -69,9 +80,15 @@ def update_activities_database():
     return message
 
 
+# Au-delà, une activité en erreur n'est plus retentée automatiquement
+MAX_STREAM_ATTEMPTS = 5
+
+
 def get_activities_without_streams(limit=None, recent_first=True):
     """
-    Récupère les IDs des activités qui n'ont pas encore de streams
+    Récupère les IDs des activités dont les streams restent à récupérer
+    (registre stream_status : 'pending', ou 'failed' avec moins de MAX_STREAM_ATTEMPTS tentatives).
+    Lecture sur l'index partiel stream_status_todo_idx, indépendante du volume de la table streams.
 
     Args:
         limit: Nombre max d'activités à récupérer (None = toutes)
@@ -79,22 +96,73 @@ def get_activities_without_streams(limit=None, recent_first=True):
     """
     engine = get_engine()
     with engine.connect() as conn:
-        order_clause = "ORDER BY a.start_date DESC" if recent_first else ""
-        limit_clause = f"LIMIT {limit}" if limit else ""
+        order_clause = "ORDER BY start_date DESC" if recent_first else "ORDER BY activity_id"
+        limit_clause = "LIMIT :limit" if limit else ""
 
         query = f"""
-            SELECT a.id
-            FROM activites a
-            LEFT JOIN streams s ON a.id::text = s.activity_id
-            WHERE s.activity_id IS NULL
+            SELECT activity_id
+            FROM stream_status
+            WHERE status IN ('pending', 'failed')
+            AND attempts < :max_attempts
             {order_clause}
             {limit_clause}
         """
-        result = conn.execute(text(query))
+        result = conn.execute(text(query), {"max_attempts": MAX_STREAM_ATTEMPTS, "limit": limit})
         activity_ids = [row[0] for row in result.fetchall()]
     return activity_ids
 
 
+def fetch_and_store_streams(activity_ids):
+    """
+    Récupère les streams des activités, les stocke et met à jour le registre stream_status.
+
+    Returns:
+        tuple: (nombre d'échantillons stockés, activités sans stream, dict des échecs)
+    """
+    header = get_strava_header()
+    streams_df, no_stream_ids, failed = fetch_multiple_streams_df(activity_ids, header, return_status=True)
+    if failed:
+        INGEST_FAILURES.labels(stage="streams_fetch").inc(len(failed))
+
+    if not streams_df.empty:
+        store_df_streams_copy(
+            streams_df,
+            host=HOST,
+            database=DATABASE,
+            user=USER,
+            password=PASSWORD,
+            port=PORT
+        )
+
+    store_stream_status(no_stream_ids, failed, host=HOST, database=DATABASE, user=USER, password=PASSWORD, port=PORT)
+
+    # Heatmap : seules les activités dont les streams viennent d'arriver sont ajoutées
+    if not streams_df.empty:
+        try:
+            update_heatmap()
+        except Exception as e:
+            INGEST_FAILURES.labels(stage="heatmap").inc()
+            print(f"⚠️ Mise à jour de la heatmap impossible : {e}")
+
+        # Segments : efforts des activités dont les streams viennent d'arriver
+        try:
+            match_activities(streams_df["activity_id"].unique())
+        except Exception as e:
+            INGEST_FAILURES.labels(stage="segments").inc()
+            print(f"⚠️ Recherche des efforts sur les segments impossible : {e}")
+
+    return len(streams_df), no_stream_ids, failed
+
+
+def _status_details(no_stream_ids, failed):
+    details = []
+    if no_stream_ids:
+        details.append(f"{len(no_stream_ids)} sans GPS")
+    if failed:
+        details.append(f"{len(failed)} en erreur")
+    return f" ({', '.join(details)})" if details else ""
+
+
 def update_streams_database(batch_size=50):
     """
     Met à jour la table streams pour les activités qui n'ont pas encore de streams
@@ -106,26 +174,17 @@ def update_streams_database(batch_size=50):
     if not activity_ids:
         return "Toutes les activités ont déjà leurs streams"
 
-    header = get_strava_header()
-    streams_df = fetch_multiple_streams_df(activity_ids, header)
+    n_samples, no_stream_ids, failed = fetch_and_store_streams(activity_ids)
 
-    if streams_df.empty:
-        return f"Aucun stream récupéré pour {len(activity_ids)} activité(s) (probablement des workouts sans GPS)"
-
-    store_df_streams_in_postgresql_optimized(
-        streams_df,
-        host=HOST,
-        database=DATABASE,
-        user=USER,
-        password=PASSWORD,
-        port=PORT
-    )
+    if n_samples == 0:
+        return f"Aucun stream récupéré pour {len(activity_ids)} activité(s){_status_details(no_stream_ids, failed)}"
 
     # Vérifier s'il reste des activités à traiter
     remaining = get_activities_without_streams(limit=1)
-    status_msg = f"{len(streams_df)} stream(s) ajouté(s) pour {len(activity_ids)} activité(s)"
+    status_msg = (f"{n_samples} stream(s) ajouté(s) pour {len(activity_ids)} activité(s)"
+                  f"{_status_details(no_stream_ids, failed)}")
     if remaining:
-        status_msg += f" - {len(remaining)} activité(s) restante(s) sans streams"
+        status_msg += " - Il reste des activités sans streams"
     else:
         status_msg += " - Toutes les activités ont maintenant leurs streams ✅"
 
@@ -140,19 +199,10 @@ def update_all_streams_database():
     if not activity_ids:
         return "Toutes les activités ont déjà leurs streams"
 
-    header = get_strava_header()
-    streams_df = fetch_multiple_streams_df(activity_ids, header)
-
-    if streams_df.empty:
-        return f"Aucun stream récupéré pour {len(activity_ids)} activité(s)"
+    n_samples, no_stream_ids, failed = fetch_and_store_streams(activity_ids)
 
-    store_df_streams_in_postgresql_optimized(
-        streams_df,
-        host=HOST,
-        database=DATABASE,
-        user=USER,
-        password=PASSWORD,
-        port=PORT
-    )
+    if n_samples == 0:
+        return f"Aucun stream récupéré pour {len(activity_ids)} activité(s){_status_details(no_stream_ids, failed)}"
 
-    return f"{len(streams_df)} stream(s) ajouté(s) pour {len(activity_ids)} activité(s)"
+    return (f"{n_samples} stream(s) ajouté(s) pour {len(activity_ids)} activité(s)"
+            f"{_status_details(no_stream_ids, failed)}")
@@ -3,6 +3,7 @@ import pandas as pd
 from pandas import Timestamp
 from datetime import datetime
 from strava.params import *
+from strava.rate_limit import StravaRateLimiter, report_quota
 import time
 from sqlalchemy import create_engine
 
@@ -20,8 +21,37 @@ def get_strava_header():
     header = {'Authorization': 'Bearer ' + access_token}
     return header
 
+def strava_get(url, header, params=None, rate_limiter=None, max_retries=3):
+    """
+    GET sur l'API Strava en respectant le quota partagé.
+    Réserve un appel auprès du limiteur, recale le quota sur les en-têtes renvoyés
+    et réessaie après la fenêtre suivante en cas de 429.
+    """
+    for attempt in range(max_retries + 1):
+        if rate_limiter is not None:
+            rate_limiter.acquire()
+
+        resp = requests.get(url, headers=header, params=params)
+        report_quota(resp.headers)
+
+        if rate_limiter is not None:
+            rate_limiter.update(resp.headers)
+
+        if resp.status_code != 429 or attempt == max_retries:
+            break
+
+        print("⚠️ Strava a répondu 429 (quota dépassé), nouvelle tentative à la prochaine fenêtre…")
+        if rate_limiter is not None:
+            rate_limiter.throttled()
+        else:
+            time.sleep(15 * 60)
+
+    resp.raise_for_status()
+    return resp
+
+
 # Fonction pour récupérer les données depuis l'API Strava
-def fetch_strava_data(after_date = None, return_header=False):
+def fetch_strava_data(after_date = None, return_header=False, rate_limiter=None):
 
     header = get_strava_header()
 
@@ -43,7 +73,7 @@ def fetch_strava_data(after_date = None, return_header=False):
         if after_timestamp:
             params['after'] = after_timestamp
 
-        activities = requests.get(ACTIVITES_URL, headers=header, params=params).json()
+        activities = strava_get(ACTIVITES_URL, header, params=params, rate_limiter=rate_limiter).json()
 
         # Si aucune activité n'est retournée, on arrête la boucle
         if not activities:
@@ -85,14 +115,13 @@ def get_all_activity_ids_from_db(db_uri, table_name):
     return df["id"].astype(str).tolist()
 
 
-def fetch_stream(activity_id, header):
+def fetch_stream(activity_id, header, rate_limiter=None):
 
     #Récupère les streams (altitude, distance, latlng, time, heartrate, cadence, velocity_smooth, temp, power, grade_smooth) d'une activité
 
-    url = f"https://www.strava.com/api/v3/activities/{activity_id}/streams"
+    url = f"{STRAVA_API_URL}/activities/{activity_id}/streams"
     params = {"keys": "latlng,altitude,distance,time,heartrate,cadence,velocity_smooth,temp,power,grade_smooth", "key_by_type": "true"}
-    resp = requests.get(url, headers=header, params=params)
-    resp.raise_for_status()
+    resp = strava_get(url, header, params=params, rate_limiter=rate_limiter)
     streams = resp.json()
 
     latlng = streams.get("latlng", {}).get("data", [])
@@ -106,50 +135,72 @@ def fetch_stream(activity_id, header):
     power = streams.get("power", {}).get("data", [])
     grade_smooth = streams.get("grade_smooth", {}).get("data", [])
 
-    # Construction DataFrame
+    # Construction DataFrame : les workouts sans GPS n'ont que time/heartrate,
+    # une série absente ou de longueur différente devient une colonne vide
+    n = len(time)
+
+    def column(data):
+        return data if len(data) == n else None
+
+    has_latlng = len(latlng) == n and n > 0
     df_stream = pd.DataFrame({
         "activity_id": activity_id,
-        "lat": [pt[0] for pt in latlng] if latlng else None,
-        "lon": [pt[1] for pt in latlng] if latlng else None,
-        "altitude": altitude,
-        "distance_m": distance,
+        "lat": [pt[0] for pt in latlng] if has_latlng else None,
+        "lon": [pt[1] for pt in latlng] if has_latlng else None,
+        "altitude": column(altitude),
+        "distance_m": column(distance),
         "time_s": time,
-        "heartrate": heartrate if heartrate else None,
-        "cadence": cadence if cadence else None,
-        "velocity_smooth": velocity_smooth if velocity_smooth else None,
-        "temp": temp if temp else None,
-        "power": power if power else None,
-        "grade_smooth": grade_smooth if grade_smooth else None
-    })
+        "heartrate": column(heartrate),
+        "cadence": column(cadence),
+        "velocity_smooth": column(velocity_smooth),
+        "temp": column(temp),
+        "power": column(power),
+        "grade_smooth": column(grade_smooth)
+    }, index=range(n))
     print(f"Stream de l'activité {activity_id} récupéré ✅")
 
     return df_stream
 
 
-def fetch_multiple_streams_df(activity_ids, header, max_per_15min=590):
+def fetch_multiple_streams_df(activity_ids, header, max_per_15min=590, rate_limiter=None, return_status=False):
+    """
+    Récupère les streams de plusieurs activités.
+
+    Args:
+        return_status: si True, renvoie aussi (no_stream_ids, failed) : les activités sans
+            trace GPS exploitable (ou 404) et un dict {activity_id: message d'erreur}
+
+    Returns:
+        DataFrame des streams concaténés (et le statut si return_status)
+    """
     dfs = []
-    count = 0
     no_stream_ids = []
+    failed = {}
+    if rate_limiter is None:
+        rate_limiter = StravaRateLimiter(max_per_15min=max_per_15min)
     for i, activity_id in enumerate(activity_ids):
-        if count >= max_per_15min:
-            print("⏸ Pause 15 minutes pour respecter la limite Strava…")
-            time.sleep(15 * 60)
-            count = 0
         try:
-            df_stream = fetch_stream(activity_id, header)
+            df_stream = fetch_stream(activity_id, header, rate_limiter=rate_limiter)
             # Ignore si l'une des 4 colonnes est entièrement vide ou NaN
             cols = ["altitude", "distance_m", "lat", "lon"]
             if df_stream.empty or any(df_stream[col].isna().all() or df_stream[col].isnull().all() for col in cols):
                 no_stream_ids.append(activity_id)
             else:
                 dfs.append(df_stream)
-            count += 1
+        except requests.HTTPError as e:
+            if e.response is not None and e.response.status_code == 404:
+                no_stream_ids.append(activity_id)
+            else:
+                print(f"Erreur pour l'activité {activity_id}: {e}")
+                failed[activity_id] = str(e)
         except Exception as e:
             print(f"Erreur pour l'activité {activity_id}: {e}")
-            no_stream_ids.append(activity_id)
+            failed[activity_id] = str(e)
     if dfs:
         result = pd.concat(dfs, ignore_index=True)
     else:
         result = pd.DataFrame()
-    print(f"{len(no_stream_ids)} activités sans stream (ignorées).")
+    print(f"{len(no_stream_ids)} activités sans stream (ignorées), {len(failed)} en erreur.")
+    if return_status:
+        return result, no_stream_ids, failed
     return result
@@ -6,6 +6,7 @@ load_dotenv()
 ### CONSTANT STRAVA TOKEN ###
 AUTH_URL = os.getenv('AUTH_URL')
 ACTIVITES_URL = os.getenv('ACTIVITES_URL')
+STRAVA_API_URL = os.getenv('STRAVA_API_URL', 'https://www.strava.com/api/v3')
 
 STRAVA_CLIENT_ID = os.getenv('STRAVA_CLIENT_ID')
 STRAVA_CLIENT_SECRET = os.getenv('STRAVA_CLIENT_SECRET')
@@ -0,0 +1,141 @@
+"""
+Limiteur de débit partagé pour l'API Strava.
+
+Strava applique deux quotas : un par fenêtre de 15 minutes (alignée sur :00, :15, :30, :45 UTC)
+et un quotidien (remis à zéro à minuit UTC). Chaque réponse renvoie l'utilisation réelle dans
+les en-têtes X-RateLimit-Usage / X-RateLimit-Limit (et X-ReadRateLimit-* pour les lectures).
+
+Le limiteur est thread-safe : plusieurs workers peuvent le partager pour paralléliser les appels
+sans jamais dépasser le quota, en se recalant sur les chiffres renvoyés par Strava.
+"""
+import threading
+import time
+from datetime import datetime, timezone
+
+from utils.metrics import STRAVA_QUOTA_LIMIT, STRAVA_QUOTA_USAGE
+
+
+WINDOW_SECONDS = 15 * 60
+
+
+def _parse_pair(value):
+    """Parse un en-tête Strava de la forme '600,30000' en (15min, jour)."""
+    if not value:
+        return None
+    try:
+        short, daily = (int(part.strip()) for part in value.split(",")[:2])
+        return short, daily
+    except ValueError:
+        return None
+
+
+def report_quota(headers):
+    """Publie l'utilisation et les limites du quota Strava renvoyées par l'API (métriques)."""
+    for prefix in ("X-ReadRateLimit", "X-RateLimit"):
+        usage = _parse_pair(headers.get(f"{prefix}-Usage"))
+        limit = _parse_pair(headers.get(f"{prefix}-Limit"))
+        if usage or limit:
+            break
+    for gauge, pair in ((STRAVA_QUOTA_USAGE, usage), (STRAVA_QUOTA_LIMIT, limit)):
+        if pair:
+            gauge.labels(window="15min").set(pair[0])
+            gauge.labels(window="day").set(pair[1])
+
+
+def _seconds_until_next_window(now=None):
+    now = now if now is not None else time.time()
+    return WINDOW_SECONDS - (now % WINDOW_SECONDS)
+
+
+def _seconds_until_next_day(now=None):
+    now = now if now is not None else time.time()
+    return 24 * 3600 - (now % (24 * 3600))
+
+
+class StravaRateLimiter:
+    """
+    Quota partagé entre threads pour les appels à l'API Strava.
+
+    Args:
+        max_per_15min: budget d'appels par fenêtre de 15 minutes
+        max_per_day: budget quotidien (None = illimité tant que Strava ne le signale pas)
+    """
+
+    def __init__(self, max_per_15min=590, max_per_day=None):
+        self._lock = threading.Lock()
+        self.max_per_15min = max_per_15min
+        self.max_per_day = max_per_day
+        self.usage_15min = 0
+        self.usage_day = 0
+        self.total_calls = 0
+        self._window = self._current_window()
+        self._day = self._current_day()
+
+    @staticmethod
+    def _current_window():
+        return int(time.time() // WINDOW_SECONDS)
+
+    @staticmethod
+    def _current_day():
+        return datetime.now(timezone.utc).date()
+
+    def _roll_windows(self):
+        window = self._current_window()
+        if window != self._window:
+            self._window = window
+            self.usage_15min = 0
+        day = self._current_day()
+        if day != self._day:
+            self._day = day
+            self.usage_day = 0
+
+    def acquire(self):
+        """Réserve un appel, en attendant la prochaine fenêtre si le quota est atteint."""
+        while True:
+            with self._lock:
+                self._roll_windows()
+                if self.max_per_day is not None and self.usage_day >= self.max_per_day:
+                    wait = _seconds_until_next_day()
+                elif self.usage_15min >= self.max_per_15min:
+                    wait = _seconds_until_next_window()
+                else:
+                    self.usage_15min += 1
+                    self.usage_day += 1
+                    self.total_calls += 1
+                    return
+
+            print(f"⏸ Limite Strava atteinte, pause de {int(wait // 60)} min {int(wait % 60)} s…")
+            time.sleep(wait + 1)
+
+    def update(self, headers):
+        """Recale l'utilisation et les limites sur les en-têtes renvoyés par Strava."""
+        usage = _parse_pair(headers.get("X-ReadRateLimit-Usage")) or _parse_pair(headers.get("X-RateLimit-Usage"))
+        limit = _parse_pair(headers.get("X-ReadRateLimit-Limit")) or _parse_pair(headers.get("X-RateLimit-Limit"))
+
+        with self._lock:
+            self._roll_windows()
+            if limit:
+                # On garde une marge de 10 appels sous la limite officielle
+                self.max_per_15min = min(self.max_per_15min, max(1, limit[0] - 10))
+                daily_budget = max(1, limit[1] - 10)
+                self.max_per_day = daily_budget if self.max_per_day is None else min(self.max_per_day, daily_budget)
+            if usage:
+                self.usage_15min = max(self.usage_15min, usage[0])
+                self.usage_day = max(self.usage_day, usage[1])
+
+    def throttled(self):
+        """Strava a répondu 429 : la fenêtre courante est épuisée."""
+        with self._lock:
+            self.usage_15min = max(self.usage_15min, self.max_per_15min)
+
+    def snapshot(self):
+        """État courant du quota (pour les logs)."""
+        with self._lock:
+            self._roll_windows()
+            return {
+                "usage_15min": self.usage_15min,
+                "max_per_15min": self.max_per_15min,
+                "usage_day": self.usage_day,
+                "max_per_day": self.max_per_day,
+                "total_calls": self.total_calls,
+            }
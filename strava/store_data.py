@@ -7,6 +7,10 @@ from strava.clean_data import *
 from strava.fetch_strava import *
 from strava.params import *
 import numpy as np
+import io
+from utils.geometry import upsert_activity_geometries
+from utils.spatial import index_stream_cells
+from utils.metrics import INGEST_ACTIVITIES, INGEST_FAILURES, INGEST_STREAM_SAMPLES
 
 
 def normalize_sport_type(sport):
@@ -30,46 +34,7 @@ def store_df_in_postgresql(df, host, database, user, password, port):
 
     table_name = TABLE_NAME
 
-    # Création de la table (si elle n'existe pas)
-    create_table_query = sql.SQL("""
-    CREATE TABLE IF NOT EXISTS {} (
-        id BIGSERIAL PRIMARY KEY,
-        name VARCHAR(255),
-        distance FLOAT,
-        moving_time FLOAT,
-        elapsed_time FLOAT,
-        moving_time_hms TEXT,
-        elapsed_time_hms TEXT,
-        average_speed FLOAT,
-        speed_minutes_per_km FLOAT,
-        speed_minutes_per_km_hms TEXT,
-        total_elevation_gain FLOAT,
-        sport_type VARCHAR(255),
-        start_date TIMESTAMP,
-        start_date_local TIMESTAMP,
-        timezone VARCHAR(50),
-        achievement_count INTEGER,
-        kudos_count INTEGER,
-        gear_id VARCHAR(255),
-        start_latlng VARCHAR(50),
-        end_latlng VARCHAR(50),
-        max_speed FLOAT,
-        average_cadence FLOAT,
-        average_temp FLOAT,
-        has_heartrate BOOLEAN,
-        average_heartrate FLOAT,
-        max_heartrate FLOAT,
-        elev_high FLOAT,
-        elev_low FLOAT,
-        pr_count INTEGER,
-        has_kudoed BOOLEAN,
-        average_watts FLOAT,
-        kilojoules FLOAT,
-        map JSONB
-    );
-    """).format(sql.Identifier(table_name))
-
-    cur.execute(create_table_query)
+    # Le schéma est géré par db/schema.py (migrations appliquées au démarrage)
 
     # Préparer les données
     values = [
@@ -106,16 +71,32 @@ def store_df_in_postgresql(df, host, database, user, password, port):
         INSERT INTO {} ({})
         VALUES %s
         ON CONFLICT (id) DO NOTHING
+        RETURNING id
     """).format(
         sql.Identifier(table_name),
         sql.SQL(', ').join(map(sql.Identifier, columns))
     )
 
-    # Insertion en bulk
-    execute_values(cur, insert_query.as_string(conn), values)
+    # Insertion en bulk (RETURNING : seules les activités réellement nouvelles sont comptées)
+    try:
+        inserted = execute_values(cur, insert_query.as_string(conn), values, fetch=True)
+    except Exception:
+        INGEST_FAILURES.labels(stage="activities_store").inc()
+        raise
+
+    # Les nouvelles activités entrent dans le registre des streams en 'pending'
+    cur.execute("""
+        INSERT INTO stream_status (activity_id, start_date)
+        SELECT id, start_date FROM activites WHERE id = ANY(%s)
+        ON CONFLICT (activity_id) DO NOTHING
+    """, ([int(activity_id) for activity_id in df['id']],))
+
+    # Tracés décodés et simplifiés une fois pour toutes (cartes et listes)
+    upsert_activity_geometries(cur, zip(df['id'], df['map']))
 
     conn.commit()
     cur.close()
+    INGEST_ACTIVITIES.inc(len(inserted))
 
     print("Données importées dans PostgreSQL ✅")
 
@@ -135,36 +116,6 @@ def store_df_streams_in_postgresql(df_streams, host, database, user, password, p
 
 
 
-def _to_python_value(x):
-    """Convertit un élément numpy/pandas en type Python JSON/psycopg2-friendly."""
-    if x is None:
-        return None
-    # pandas NA / numpy nan
-    try:
-        if pd.isna(x):
-            return None
-    except Exception:
-        pass
-    # numpy scalars -> python scalars
-    if isinstance(x, (np.floating, np.float64, np.float32)):
-        return float(x)
-    if isinstance(x, (np.integer, np.int64, np.int32, np.int16, np.int8)):
-        return int(x)
-    if isinstance(x, (np.bool_ , bool)):
-        return bool(x)
-    # pandas Timestamp -> isoformat string
-    if isinstance(x, pd.Timestamp):
-        return x.isoformat()
-    # numpy string types
-    if isinstance(x, (np.str_,)):
-        return str(x)
-    # bytes -> decode
-    if isinstance(x, (bytes, bytearray)):
-        return x.decode()
-    # fallback (already python native)
-    return x
-
-
 def _safe_convert_activity_id(x):
     """Conversion sécurisée de activity_id en string."""
     try:
@@ -181,8 +132,159 @@ def store_df_streams_in_postgresql_optimized(
     debug_preview: int = 0
 ):
     """
-    Version optimisée pour stocker un DataFrame de streams Strava dans PostgreSQL.
-    Convertit les numpy types en types Python natifs et gère les conflits proprement.
+    Conservée pour compatibilité : délègue au chargement COPY (store_df_streams_copy).
+    Le schéma (clé primaire, staging) est garanti par les migrations, plus aucune
+    requête sur information_schema ni COUNT(*) à chaque insertion.
+    """
+    if debug_preview and not df_streams.empty:
+        print(f"Preview des {min(debug_preview, len(df_streams))} premières lignes:")
+        print(df_streams.head(debug_preview))
+
+    return store_df_streams_copy(
+        df_streams, host, database, user, password, port, table_name=table_name
+    )
+
+
+# Alias pour rétrocompatibilité
+store_df_streams_in_postgresql_test = store_df_streams_in_postgresql_optimized
+
+
+# ============== Chargement en masse via COPY ==============
+
+STREAM_COLUMNS = ['activity_id', 'lat', 'lon', 'altitude', 'distance_m', 'time_s',
+                  'heartrate', 'cadence', 'velocity_smooth', 'temp', 'power', 'grade_smooth']
+
+# Colonnes INTEGER côté PostgreSQL (pandas les stocke en float dès qu'il y a un NaN)
+STREAM_INTEGER_COLUMNS = ('heartrate', 'cadence', 'temp', 'power')
+
+STREAMS_STAGING_TABLE = "streams_staging"
+
+# Marqueur NULL du format texte de COPY
+COPY_NULL = r'\N'
+
+
+def _activity_ids_as_text(series):
+    """Convertit la colonne activity_id en tableau de chaînes (ids entiers, sans '.0')."""
+    numeric = pd.to_numeric(series, errors='coerce')
+    if numeric.notna().all():
+        return numeric.to_numpy(dtype=np.int64).astype(str)
+    # Cas rare (ids non numériques) : conversion élément par élément
+    return np.array([_safe_convert_activity_id(x) for x in series], dtype=object)
+
+
+def _floats_as_text(values):
+    """
+    Formate un tableau de floats finis en texte, sans perte.
+    Les streams Strava ont au plus quelques décimales (lat/lon à 1e-6, altitude à 0.1...) :
+    on cherche la plus petite précision décimale exacte et on formate des entiers,
+    environ 10x plus rapide que astype(str). Repli sur astype(str) sinon.
+    """
+    for decimals in range(0, 8):
+        factor = 10 ** decimals
+        scaled = np.rint(values * factor)
+        if np.array_equal(scaled / factor, values) and np.abs(scaled).max(initial=0) < 2 ** 53:
+            break
+    else:
+        return values.astype(str)
+
+    digits = np.abs(scaled).astype(np.int64)
+    if decimals == 0:
+        text = digits.astype(str)
+    else:
+        whole, frac = np.divmod(digits, factor)
+        text = np.char.add(np.char.add(whole.astype(str), '.'), np.char.zfill(frac.astype(str), decimals))
+    return np.where(scaled < 0, np.char.add('-', text), text)
+
+
+def _stream_column_as_text(df, col):
+    """
+    Convertit une colonne de streams en tableau de chaînes au format texte de COPY.
+    Tout est vectorisé : NaN / inf / None deviennent NULL, les colonnes INTEGER sont arrondies.
+    """
+    if col not in df.columns:
+        return np.full(len(df), COPY_NULL)
+
+    values = pd.to_numeric(df[col], errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+    missing = ~np.isfinite(values)
+
+    finite = np.where(missing, 0, values)
+    if col in STREAM_INTEGER_COLUMNS:
+        text = np.rint(finite).astype(np.int64).astype(str)
+    else:
+        text = _floats_as_text(finite)
+
+    return np.where(missing, COPY_NULL, text)
+
+
+def streams_to_copy_buffer(df_streams):
+    """
+    Sérialise un DataFrame de streams en buffer texte prêt pour COPY ... FROM STDIN.
+    Travaille colonne par colonne sur des tableaux NumPy, sans aucune boucle par ligne.
+
+    Returns:
+        (buffer, nb_lignes) - les lignes sans activity_id ou time_s sont écartées
+    """
+    required_cols = ['activity_id', 'time_s']
+    missing_required = [c for c in required_cols if c not in df_streams.columns]
+    if missing_required:
+        raise ValueError(f"Colonnes requises manquantes dans df_streams: {missing_required}")
+
+    time_s = pd.to_numeric(df_streams['time_s'], errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+    valid = np.isfinite(time_s) & df_streams['activity_id'].notna().to_numpy()
+    df = df_streams[valid] if not valid.all() else df_streams
+
+    if not valid.all():
+        print(f"ATTENTION: {int((~valid).sum())} lignes supprimées (activity_id ou time_s manquants)")
+
+    if df.empty:
+        return io.StringIO(""), 0
+
+    columns = [_activity_ids_as_text(df['activity_id'])]
+    columns += [_stream_column_as_text(df, col) for col in STREAM_COLUMNS[1:]]
+
+    # Assemblage des lignes en C (str.join) à partir des colonnes déjà formatées
+    buffer = io.StringIO('\n'.join(map('\t'.join, zip(*[c.tolist() for c in columns]))) + '\n')
+    return buffer, len(df)
+
+
+def copy_streams_to_staging(cur, df_streams, staging_table=STREAMS_STAGING_TABLE):
+    """
+    Vide la table de staging puis y charge les streams via COPY.
+    Le TRUNCATE verrouille la table jusqu'au commit : deux chargements concurrents
+    s'exécutent donc l'un après l'autre sans se mélanger.
+
+    Returns:
+        int: nombre de lignes copiées
+    """
+    buffer, row_count = streams_to_copy_buffer(df_streams)
+
+    cur.execute(sql.SQL("TRUNCATE {}").format(sql.Identifier(staging_table)))
+    if row_count == 0:
+        return 0
+
+    copy_query = sql.SQL("COPY {} ({}) FROM STDIN").format(
+        sql.Identifier(staging_table),
+        sql.SQL(', ').join(map(sql.Identifier, STREAM_COLUMNS))
+    )
+    cur.copy_expert(copy_query.as_string(cur), buffer)
+    return row_count
+
+
+def store_df_streams_copy(
+    df_streams,
+    host, database, user, password, port,
+    table_name="streams",
+    staging_table=STREAMS_STAGING_TABLE
+):
+    """
+    Stocke un DataFrame de streams via COPY dans la table de staging UNLOGGED
+    (créée par la migration 0005), puis fusionne dans la table streams avec un seul INSERT ... SELECT ... ON CONFLICT DO NOTHING.
+
+    Beaucoup plus rapide que store_df_streams_in_postgresql_optimized : aucune conversion
+    cellule par cellule en Python, une seule requête de fusion côté serveur.
+
+    Returns:
+        int: nombre de lignes réellement insérées dans la table streams
     """
     if df_streams.empty:
         print("Aucune ligne à insérer dans les streams.")
@@ -199,208 +301,103 @@ def store_df_streams_in_postgresql_optimized(
     try:
         with conn:
             with conn.cursor() as cur:
-                # Vérifier si la table existe et sa structure
-                cur.execute("""
-                    SELECT column_name, data_type
-                    FROM information_schema.columns
-                    WHERE table_name = %s AND table_schema = 'public'
-                    ORDER BY ordinal_position;
-                """, (table_name,))
-
-                existing_columns = cur.fetchall()
-                table_exists = len(existing_columns) > 0
-
-                if table_exists:
-                    print(f"Table {table_name} existe déjà avec {len(existing_columns)} colonnes")
-                    # Vérifier s'il y a une clé primaire
-                    cur.execute("""
-                        SELECT COUNT(*) FROM information_schema.table_constraints
-                        WHERE table_name = %s AND constraint_type = 'PRIMARY KEY'
-                    """, (table_name,))
-                    has_pk = cur.fetchone()[0] > 0
-
-                    if not has_pk:
-                        print(f"Ajout d'une clé primaire composite à la table {table_name}...")
-                        # Ajouter une clé primaire composite seulement si pas de doublons
-                        cur.execute(sql.SQL("""
-                            SELECT
-                                COUNT(*) as total,
-                                COUNT(DISTINCT (activity_id, time_s)) as distinct_pairs
-                            FROM {}
-                        """).format(sql.Identifier(table_name)))
-                        result = cur.fetchone()
-                        total, distinct = result[0], result[1]
-
-                        if total == distinct:
-                            try:
-                                cur.execute(sql.SQL("""
-                                    ALTER TABLE {}
-                                    ADD CONSTRAINT {}_pk
-                                    PRIMARY KEY (activity_id, time_s)
-                                """).format(
-                                    sql.Identifier(table_name),
-                                    sql.Identifier(table_name)
-                                ))
-                                print("Clé primaire ajoutée avec succès ✅")
-                            except Exception as e:
-                                print(f"Impossible d'ajouter la clé primaire: {e}")
-                        else:
-                            print(f"ATTENTION: {total - distinct} doublons détectés, nettoyage recommandé")
-                else:
-                    # Créer la table avec clé primaire
-                    create_table_query = sql.SQL("""
-                    CREATE TABLE {table} (
-                        activity_id VARCHAR(50) NOT NULL,
-                        lat DOUBLE PRECISION,
-                        lon DOUBLE PRECISION,
-                        altitude DOUBLE PRECISION,
-                        distance_m DOUBLE PRECISION,
-                        time_s DOUBLE PRECISION NOT NULL,
-                        heartrate INTEGER,
-                        cadence INTEGER,
-                        velocity_smooth DOUBLE PRECISION,
-                        temp INTEGER,
-                        power INTEGER,
-                        grade_smooth DOUBLE PRECISION,
-                        PRIMARY KEY (activity_id, time_s)
-                    );
-                    """).format(table=sql.Identifier(table_name))
-                    cur.execute(create_table_query)
-                    print(f"Table {table_name} créée avec clé primaire ✅")
-
-                # Validation des colonnes
-                expected_cols = ['activity_id', 'lat', 'lon', 'altitude', 'distance_m', 'time_s',
-                                 'heartrate', 'cadence', 'velocity_smooth', 'temp', 'power', 'grade_smooth']
-
-                # Only check for required columns (activity_id and time_s must exist)
-                required_cols = ['activity_id', 'time_s']
-                missing_required = [c for c in required_cols if c not in df_streams.columns]
-                if missing_required:
-                    raise ValueError(f"Colonnes requises manquantes dans df_streams: {missing_required}")
-
-                # Add missing optional columns with None values
-                for col in expected_cols:
-                    if col not in df_streams.columns:
-                        print(f"[INFO] Colonne optionnelle '{col}' manquante, ajout avec valeurs NULL")
-
-                # Nettoyage et conversion des données
-                df = df_streams.copy()
-
-                # Add missing columns with None if they don't exist
-                for col in expected_cols:
-                    if col not in df.columns:
-                        df[col] = None
-
-                df = df.replace({np.nan: None, np.inf: None, -np.inf: None})
-
-                # Conversion sécurisée de activity_id
-                df['activity_id'] = df['activity_id'].apply(_safe_convert_activity_id)
-
-                # Supprimer les lignes avec activity_id ou time_s manquants (requis pour PK)
-                initial_count = len(df)
-                df = df.dropna(subset=['activity_id', 'time_s'])
-                final_count = len(df)
-
-                if initial_count != final_count:
-                    print(f"ATTENTION: {initial_count - final_count} lignes supprimées (activity_id ou time_s manquants)")
-
-                if df.empty:
+                copied = copy_streams_to_staging(cur, df_streams, staging_table)
+                if copied == 0:
                     print("Aucune ligne valide à insérer après nettoyage.")
                     return 0
 
-                # Préparer les données pour insertion
-                values = []
-                for _, row in df.iterrows():
-                    tup = tuple(_to_python_value(row[col]) for col in expected_cols)
-                    values.append(tup)
-
-                if debug_preview and values:
-                    print(f"Preview des {min(debug_preview, len(values))} premières lignes:")
-                    for v in values[:debug_preview]:
-                        print(v)
-
-                # Insertion avec gestion des conflits - méthode robuste
-                # Vérifier si on a une clé primaire pour utiliser ON CONFLICT
-                cur.execute("""
-                    SELECT COUNT(*) FROM information_schema.table_constraints
-                    WHERE table_name = %s AND constraint_type = 'PRIMARY KEY'
-                """, (table_name,))
-                has_pk_now = cur.fetchone()[0] > 0
-
-                if has_pk_now:
-                    # Avec clé primaire, utilisation normale d'ON CONFLICT
-                    insert_query = sql.SQL("""
-                        INSERT INTO {table} ({cols})
-                        VALUES %s
-                        ON CONFLICT (activity_id, time_s) DO NOTHING
-                    """).format(
-                        table=sql.Identifier(table_name),
-                        cols=sql.SQL(', ').join(map(sql.Identifier, expected_cols))
-                    )
-                    execute_values(cur, insert_query.as_string(conn), values, template=None, page_size=1000)
-                else:
-                    # Sans clé primaire, insertion par lots avec vérification
-                    print("⚠️  Pas de clé primaire, insertion sécurisée par lots")
-                    inserted_count = 0
-
-                    for value_batch in [values[i:i+100] for i in range(0, len(values), 100)]:
-                        # Créer une table temporaire pour ce batch
-                        temp_table = f"{table_name}_temp_{id(value_batch) % 10000}"
-
-                        # Créer table temporaire
-                        cur.execute(sql.SQL("""
-                            CREATE TEMP TABLE {} AS
-                            SELECT * FROM {} WHERE FALSE
-                        """).format(
-                            sql.Identifier(temp_table),
-                            sql.Identifier(table_name)
-                        ))
-
-                        # Insérer dans la table temporaire
-                        temp_insert = sql.SQL("""
-                            INSERT INTO {} ({})
-                            VALUES %s
-                        """).format(
-                            sql.Identifier(temp_table),
-                            sql.SQL(', ').join(map(sql.Identifier, expected_cols))
-                        )
-                        execute_values(cur, temp_insert.as_string(conn), value_batch)
-
-                        # Insérer seulement les nouvelles données
-                        cur.execute(sql.SQL("""
-                            INSERT INTO {main_table} ({cols})
-                            SELECT {cols} FROM {temp_table} t
-                            WHERE NOT EXISTS (
-                                SELECT 1 FROM {main_table} m
-                                WHERE m.activity_id = t.activity_id
-                                AND m.time_s = t.time_s
-                            )
-                        """).format(
-                            main_table=sql.Identifier(table_name),
-                            temp_table=sql.Identifier(temp_table),
-                            cols=sql.SQL(', ').join(map(sql.Identifier, expected_cols))
-                        ))
-
-                        inserted_count += cur.rowcount
-
-                        # Supprimer la table temporaire
-                        cur.execute(sql.SQL("DROP TABLE {}").format(sql.Identifier(temp_table)))
-
-                    print(f"📊 {inserted_count} nouvelles lignes insérées (sur {len(values)} soumises)")
-
-                # Compter les nouvelles insertions
-                cur.execute(f"SELECT COUNT(*) FROM {table_name}")
-                total_after = cur.fetchone()[0]
-
-                print(f"✅ Insertion terminée. Total dans {table_name}: {total_after} lignes")
-                return len(values)
+                cols = sql.SQL(', ').join(map(sql.Identifier, STREAM_COLUMNS))
+                cur.execute(sql.SQL("""
+                    INSERT INTO {table} ({cols})
+                    SELECT {cols} FROM {staging}
+                    ON CONFLICT (activity_id, time_s) DO NOTHING
+                """).format(
+                    table=sql.Identifier(table_name),
+                    staging=sql.Identifier(staging_table),
+                    cols=cols
+                ))
+                inserted = cur.rowcount
+
+                # Registre d'ingestion : les activités chargées passent en 'fetched'
+                cur.execute(sql.SQL("""
+                    INSERT INTO stream_status
+                        (activity_id, status, attempts, sample_count, start_date, last_attempt_at, fetched_at)
+                    SELECT a.id, 'fetched', 1, st.sample_count, a.start_date, NOW(), NOW()
+                    FROM (
+                        SELECT activity_id, COUNT(*) AS sample_count
+                        FROM {staging}
+                        GROUP BY activity_id
+                    ) st
+                    JOIN activites a ON a.id = st.activity_id::BIGINT
+                    ON CONFLICT (activity_id) DO UPDATE
+                    SET status = 'fetched',
+                        attempts = stream_status.attempts + 1,
+                        sample_count = EXCLUDED.sample_count,
+                        last_error = NULL,
+                        last_attempt_at = NOW(),
+                        fetched_at = NOW()
+                """).format(staging=sql.Identifier(staging_table)))
+
+                # Index spatial des activités chargées, reconstruit depuis leurs streams en base :
+                # les cellules qu'elles ne traversent plus disparaissent
+                cur.execute(sql.SQL("SELECT DISTINCT activity_id::bigint AS activity_id FROM {}").format(
+                    sql.Identifier(staging_table)))
+                loaded_ids = [row[0] for row in cur.fetchall()]
+                cur.execute("DELETE FROM stream_cells WHERE activity_id = ANY(%s)", (loaded_ids,))
+                index_stream_cells(cur, table_name, activity_ids=loaded_ids)
+
+                cur.execute(sql.SQL("TRUNCATE {}").format(sql.Identifier(staging_table)))
+
+        INGEST_STREAM_SAMPLES.inc(inserted)
+        print(f"✅ COPY terminé : {inserted} nouvelles lignes insérées (sur {copied} soumises)")
+        return inserted
 
     except Exception as e:
-        print(f"❌ Erreur lors du stockage des streams: {e}")
+        INGEST_FAILURES.labels(stage="streams_store").inc()
+        print(f"❌ Erreur lors du stockage des streams (COPY): {e}")
         raise
     finally:
         conn.close()
 
 
-# Alias pour rétrocompatibilité
-store_df_streams_in_postgresql_test = store_df_streams_in_postgresql_optimized
+def store_stream_status(no_stream_ids, failed, host, database, user, password, port):
+    """
+    Enregistre dans le registre stream_status les activités sans stream et les échecs
+    renvoyés par fetch_multiple_streams_df(..., return_status=True).
+    Les activités 'fetched' sont enregistrées par store_df_streams_copy, dans la même
+    transaction que les streams.
+
+    Args:
+        no_stream_ids: activités sans trace GPS (plus jamais redemandées)
+        failed: dict {activity_id: message d'erreur} (retentées au prochain passage)
+    """
+    rows = [(int(activity_id), 'no_stream', None) for activity_id in no_stream_ids]
+    rows += [(int(activity_id), 'failed', error) for activity_id, error in failed.items()]
+    if not rows:
+        return 0
+
+    conn = connect(
+        host=host,
+        database=database,
+        user=user,
+        password=password,
+        port=port
+    )
+    try:
+        with conn:
+            with conn.cursor() as cur:
+                execute_values(cur, """
+                    INSERT INTO stream_status (activity_id, status, attempts, last_error, start_date, last_attempt_at)
+                    SELECT a.id, v.status, 1, v.last_error, a.start_date, NOW()
+                    FROM (VALUES %s) AS v (activity_id, status, last_error)
+                    JOIN activites a ON a.id = v.activity_id
+                    ON CONFLICT (activity_id) DO UPDATE
+                    SET status = EXCLUDED.status,
+                        attempts = stream_status.attempts + 1,
+                        last_error = EXCLUDED.last_error,
+                        last_attempt_at = NOW()
+                """, rows)
+        print(f"📋 Registre des streams : {len(no_stream_ids)} sans stream, {len(failed)} en erreur")
+        return len(rows)
+    finally:
+        conn.close()
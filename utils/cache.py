@@ -0,0 +1,62 @@
+"""
+Cache en mémoire invalidé par la version des données.
+
+Chaque entrée est mémorisée avec la version des données (table data_version, voir
+utils/etag.py) au moment du calcul : tant que la version est la même, la valeur est
+resservie ; dès qu'une écriture incrémente la version, l'entrée est recalculée.
+Le cache est propre à chaque worker uvicorn et borné (LRU).
+"""
+import threading
+from collections import OrderedDict
+
+from utils.metrics import record_cache
+
+
+class VersionedCache:
+    """
+    Args:
+        name: nom du cache dans la métrique eyesight_cache_requests_total
+        maxsize: nombre maximal d'entrées conservées (les moins récemment utilisées sortent)
+    """
+
+    def __init__(self, name, maxsize=32):
+        self.name = name
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_compute(self, key, version, compute):
+        """
+        Renvoie la valeur en cache pour (key, version), ou la calcule avec compute().
+
+        Args:
+            key: clé hashable (ex: paramètres de la requête)
+            version: version des données dont dépend la valeur (hashable)
+            compute: fonction sans argument qui calcule la valeur
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                record_cache(self.name, hit=True)
+                return entry[1]
+            self.misses += 1
+        record_cache(self.name, hit=False)
+
+        # Calcul hors verrou : deux requêtes simultanées peuvent calculer la même entrée,
+        # mais aucune n'attend l'autre
+        value = compute()
+
+        with self._lock:
+            self._entries[key] = (version, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,208 @@
+"""
+Compression négociée des réponses HTTP (brotli ou gzip).
+
+Middleware ASGI pur : l'encodage est choisi d'après l'en-tête Accept-Encoding du client
+(brotli préféré à gzip à qualité égale), les petites réponses (< minimum_size) et les
+formats déjà compressés (PNG, Parquet, ...) sont envoyés tels quels, et les réponses en
+streaming sont compressées morceau par morceau sans être mises en mémoire.
+
+brotli est optionnel : sans le paquet, seul gzip est proposé.
+"""
+import zlib
+
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - dépendance optionnelle
+    brotli = None
+
+
+DEFAULT_MINIMUM_SIZE = 1024
+
+# Types de contenu qui gagnent à être compressés (préfixes)
+COMPRESSIBLE_TYPES = (
+    "text/",
+    "application/json",
+    "application/x-ndjson",
+    "application/javascript",
+    "application/xml",
+    "application/msgpack",
+    "application/vnd.apache.arrow",
+    "image/svg+xml",
+)
+
+
+def _parse_accept_encoding(accept_encoding):
+    """'br;q=1.0, gzip;q=0.8' -> {'br': 1.0, 'gzip': 0.8}"""
+    weights = {}
+    for part in accept_encoding.split(","):
+        token, _, params = part.strip().partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[token] = q
+    return weights
+
+
+def negotiate_encoding(accept_encoding, available=None):
+    """
+    Choisit l'encodage de la réponse d'après l'en-tête Accept-Encoding.
+
+    Args:
+        accept_encoding: valeur de l'en-tête (peut être vide)
+        available: encodages proposés par ordre de préférence (défaut: br puis gzip)
+
+    Returns:
+        str: 'br', 'gzip' ou None (pas de compression)
+    """
+    if available is None:
+        available = ("br", "gzip") if brotli is not None else ("gzip",)
+    weights = _parse_accept_encoding(accept_encoding or "")
+    wildcard = weights.get("*", 0.0)
+
+    best, best_q = None, 0.0
+    for encoding in available:
+        q = weights.get(encoding, wildcard)
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def is_compressible(content_type):
+    content_type = (content_type or "").lower()
+    return content_type.startswith(COMPRESSIBLE_TYPES)
+
+
+class _GzipStream:
+    def __init__(self, level):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        # Z_SYNC_FLUSH : chaque morceau est décodable dès réception (NDJSON, exports)
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data=b""):
+        return self._compressor.compress(data) + self._compressor.flush()
+
+
+class _BrotliStream:
+    def __init__(self, quality):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data):
+        return self._compressor.process(data) + self._compressor.flush()
+
+    def finish(self, data=b""):
+        return self._compressor.process(data) + self._compressor.finish()
+
+
+class CompressionMiddleware:
+    """
+    Args:
+        minimum_size: taille en octets en dessous de laquelle la réponse n'est pas compressée
+        gzip_level: niveau zlib (1-9)
+        brotli_quality: qualité brotli (0-11) ; 4-5 est un bon compromis pour du contenu dynamique
+    """
+
+    def __init__(self, app, minimum_size=DEFAULT_MINIMUM_SIZE, gzip_level=6, brotli_quality=4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        responder = _CompressionResponder(self, encoding, send)
+        await self.app(scope, receive, responder.send)
+
+
+class _CompressionResponder:
+    def __init__(self, middleware, encoding, send):
+        self.middleware = middleware
+        self.encoding = encoding
+        self._send = send
+        self.start_message = None
+        self.stream = None
+        self.passthrough = False
+
+    def _new_stream(self):
+        if self.encoding == "br":
+            return _BrotliStream(self.middleware.brotli_quality)
+        return _GzipStream(self.middleware.gzip_level)
+
+    def _set_encoding_headers(self, headers):
+        headers["Content-Encoding"] = self.encoding
+        headers.add_vary_header("Accept-Encoding")
+        # Une représentation compressée est différente : ETag fort distinct par encodage
+        etag = headers.get("etag")
+        if etag and etag.startswith('"') and etag.endswith('"'):
+            headers["ETag"] = f'{etag[:-1]}-{self.encoding}"'
+
+    async def send(self, message):
+        message_type = message["type"]
+
+        if message_type == "http.response.start":
+            # On attend le premier morceau du corps pour décider
+            self.start_message = message
+            headers = Headers(raw=message["headers"])
+            self.passthrough = (
+                "content-encoding" in headers
+                or message["status"] in (204, 304)
+                or not is_compressible(headers.get("content-type"))
+            )
+            if self.passthrough:
+                await self._send(message)
+            return
+
+        if message_type != "http.response.body" or self.passthrough:
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.stream is None:
+            headers = MutableHeaders(raw=self.start_message["headers"])
+
+            if not more_body:
+                # Réponse complète en un seul morceau
+                if len(body) < self.middleware.minimum_size:
+                    await self._send(self.start_message)
+                    await self._send(message)
+                    return
+                compressed = self._new_stream().finish(body)
+                self._set_encoding_headers(headers)
+                headers["Content-Length"] = str(len(compressed))
+                await self._send(self.start_message)
+                await self._send({"type": "http.response.body", "body": compressed})
+                return
+
+            # Réponse en streaming : taille inconnue, on compresse au fil de l'eau
+            self.stream = self._new_stream()
+            self._set_encoding_headers(headers)
+            if "content-length" in headers:
+                del headers["Content-Length"]
+            await self._send(self.start_message)
+
+        if more_body:
+            chunk = self.stream.compress(body) if body else b""
+            if chunk:
+                await self._send({"type": "http.response.body", "body": chunk, "more_body": True})
+        else:
+            await self._send({"type": "http.response.body", "body": self.stream.finish(body)})
@@ -0,0 +1,118 @@
+"""
+ETag et GET conditionnels basés sur la version des données.
+
+La table data_version (migration 0009) est incrémentée par trigger à chaque écriture sur
+activites, streams ou records. L'ETag d'une réponse est un hash de :
+- le chemin, les paramètres et l'en-tête Accept de la requête (formats négociés),
+- les versions des tables dont dépend l'endpoint,
+- la date du jour (les KPIs et graphiques "des N dernières semaines" dépendent de la date).
+
+Utilisation dans un router :
+
+    @router.get("/", dependencies=[Depends(etag_for("activites"))])
+
+Si l'en-tête If-None-Match du client correspond, la dépendance répond 304 avant
+l'exécution de la route (une seule lecture de data_version, aucun calcul pandas).
+Sinon l'ETag est ajouté à la réponse par ETagMiddleware.
+"""
+import hashlib
+from datetime import date
+
+from fastapi import HTTPException, Request
+from starlette.datastructures import MutableHeaders
+
+from db.connection import get_conn
+from utils.metrics import record_cache
+
+
+# Le client doit revalider à chaque fois, ce qui ne coûte qu'un 304 si rien n'a changé
+CACHE_CONTROL = "no-cache"
+
+
+def get_data_versions(scopes):
+    """
+    Returns:
+        dict: {scope: version} pour les tables demandées
+    """
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT scope, version FROM data_version WHERE scope = ANY(%s)", (list(scopes),))
+            return {row["scope"]: row["version"] for row in cur.fetchall()}
+
+
+def compute_etag(request, versions):
+    """ETag fort (entre guillemets) pour la requête et les versions données."""
+    key = repr((
+        request.url.path,
+        sorted(request.query_params.multi_items()),
+        request.headers.get("accept", ""),
+        sorted(versions.items()),
+        date.today().isoformat(),
+    ))
+    return '"' + hashlib.blake2b(key.encode(), digest_size=12).hexdigest() + '"'
+
+
+def etag_matches(if_none_match, etag):
+    """
+    Compare l'en-tête If-None-Match à l'ETag courant.
+    Accepte aussi les variantes compressées ("...-br", "...-gzip") renvoyées par CompressionMiddleware.
+    """
+    if not if_none_match:
+        return False
+    opaque = etag.strip('"')
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        candidate = candidate.strip('"')
+        if candidate == opaque or candidate.rsplit("-", 1)[0] == opaque:
+            return True
+    return False
+
+
+def etag_for(*scopes):
+    """
+    Dépendance FastAPI : répond 304 si le client a déjà la version courante.
+
+    Args:
+        scopes: tables dont dépend la réponse ('activites', 'streams', 'records')
+    """
+    def check_etag(request: Request):
+        etag = compute_etag(request, get_data_versions(scopes))
+        not_modified = etag_matches(request.headers.get("if-none-match"), etag)
+        record_cache("etag", hit=not_modified)
+        if not_modified:
+            raise HTTPException(status_code=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
+        request.state.etag = etag
+
+    return check_etag
+
+
+class ETagMiddleware:
+    """
+    Ajoute l'ETag calculé par etag_for aux réponses 200.
+    Nécessaire car FastAPI ne recopie pas les en-têtes des dépendances sur les routes
+    qui renvoient directement une Response (FastJSONResponse, StreamingResponse).
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_etag(message):
+            if message["type"] == "http.response.start" and message["status"] == 200:
+                etag = scope.get("state", {}).get("etag")
+                if etag:
+                    headers = MutableHeaders(raw=message["headers"])
+                    if "etag" not in headers:
+                        headers["ETag"] = etag
+                        headers["Cache-Control"] = CACHE_CONTROL
+            await send(message)
+
+        await self.app(scope, receive, send_with_etag)
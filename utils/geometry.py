@@ -0,0 +1,152 @@
+"""
+Géométrie des tracés : décodage de la polyline, simplification Ramer–Douglas–Peucker et bbox.
+
+Calculée une fois à l'ingestion (table activity_geometry, migration 0010) au lieu d'un
+json.loads + polyline.decode par activité et par requête. Chaque tracé est stocké :
+- en entier (coords, la polyline résumée de Strava décodée),
+- simplifié pour les niveaux de zoom GEOMETRY_ZOOMS : la tolérance RDP est d'un
+  demi-pixel de tuile 256 px à ce zoom, l'écart n'est donc pas visible sur la carte,
+- avec sa bbox [min_lat, min_lon, max_lat, max_lon],
+- avec sa signature de parcours (utils/route_signature.py), sur le tracé du zoom 14.
+
+Les coordonnées sont des tableaux [[lat, lon], ...] : psycopg2 les renvoie tels quels,
+prêts à sérialiser.
+"""
+import json
+
+import numpy as np
+import polyline
+from psycopg2.extras import execute_values
+
+from utils.route_signature import upsert_route_signatures
+
+
+GEOMETRY_ZOOMS = [14, 12, 10]
+ROUTE_SIGNATURE_ZOOM = 14
+
+
+def zoom_tolerance(zoom):
+    """Tolérance RDP (en degrés) : un demi-pixel d'une tuile de 256 px au zoom donné."""
+    return 360.0 / (256 * 2 ** zoom) / 2
+
+
+def coords_column(zoom=None):
+    """
+    Colonne de activity_geometry pour un niveau de zoom (None = tracé complet).
+
+    Raises:
+        ValueError: si le zoom n'est pas précalculé
+    """
+    if zoom is None:
+        return "coords"
+    if zoom not in GEOMETRY_ZOOMS:
+        raise ValueError(f"Zoom {zoom} non disponible. Zooms disponibles: {', '.join(map(str, GEOMETRY_ZOOMS))}")
+    return f"coords_z{zoom}"
+
+
+def rdp_mask(points, epsilon):
+    """
+    Ramer–Douglas–Peucker itératif (pile de segments, distances vectorisées par segment).
+
+    Args:
+        points: np.ndarray (n, 2)
+        epsilon: distance maximale tolérée entre le tracé simplifié et l'original
+
+    Returns:
+        np.ndarray de booléens : points conservés (le premier et le dernier toujours)
+    """
+    n = len(points)
+    keep = np.zeros(n, dtype=bool)
+    if n == 0:
+        return keep
+    keep[0] = keep[-1] = True
+
+    stack = [(0, n - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        segment = points[end] - points[start]
+        inner = points[start + 1:end] - points[start]
+        length = np.hypot(segment[0], segment[1])
+        if length == 0:
+            # Boucle : distance au point de départ
+            distances = np.hypot(inner[:, 0], inner[:, 1])
+        else:
+            distances = np.abs(segment[0] * inner[:, 1] - segment[1] * inner[:, 0]) / length
+        farthest = int(np.argmax(distances))
+        if distances[farthest] > epsilon:
+            split = start + 1 + farthest
+            keep[split] = True
+            stack.append((start, split))
+            stack.append((split, end))
+    return keep
+
+
+def decode_map(map_value):
+    """Coordonnées [(lat, lon), ...] de la polyline résumée d'une colonne map (JSON ou dict)."""
+    map_json = json.loads(map_value) if isinstance(map_value, str) and map_value else map_value
+    if not isinstance(map_json, dict):
+        return []
+    polyline_str = map_json.get("summary_polyline")
+    return polyline.decode(polyline_str) if polyline_str else []
+
+
+def route_geometry(map_value):
+    """
+    Géométrie complète d'un tracé.
+
+    Returns:
+        dict: coords, coords_z14 / z12 / z10, bbox, point_count (coords None si pas de tracé)
+    """
+    coords = decode_map(map_value)
+    geometry = {"coords": None, "bbox": None, "point_count": len(coords)}
+    for zoom in GEOMETRY_ZOOMS:
+        geometry[coords_column(zoom)] = None
+    if not coords:
+        return geometry
+
+    points = np.asarray(coords, dtype=float)
+    geometry["coords"] = points.tolist()
+    geometry["bbox"] = [*points.min(axis=0).tolist(), *points.max(axis=0).tolist()]
+    for zoom in GEOMETRY_ZOOMS:
+        geometry[coords_column(zoom)] = points[rdp_mask(points, zoom_tolerance(zoom))].tolist()
+    return geometry
+
+
+def upsert_activity_geometries(cur, activities):
+    """
+    Calcule et enregistre la géométrie d'activités (dans la transaction du curseur).
+
+    Args:
+        cur: curseur psycopg2
+        activities: itérable de (activity_id, map) ; map en JSON ou dict
+    """
+    zoom_columns = [coords_column(zoom) for zoom in GEOMETRY_ZOOMS]
+    values, routes = [], []
+    for activity_id, map_value in activities:
+        geometry = route_geometry(map_value)
+        bbox = geometry["bbox"] or [None] * 4
+        values.append((
+            int(activity_id), *bbox, geometry["point_count"], geometry["coords"],
+            *(geometry[col] for col in zoom_columns)
+        ))
+        routes.append((activity_id, geometry[coords_column(ROUTE_SIGNATURE_ZOOM)]))
+    if not values:
+        return
+
+    execute_values(cur, f"""
+        INSERT INTO activity_geometry (
+            activity_id, min_lat, min_lon, max_lat, max_lon, point_count, coords, {', '.join(zoom_columns)}
+        )
+        VALUES %s
+        ON CONFLICT (activity_id) DO UPDATE SET
+            min_lat = EXCLUDED.min_lat, min_lon = EXCLUDED.min_lon,
+            max_lat = EXCLUDED.max_lat, max_lon = EXCLUDED.max_lon,
+            point_count = EXCLUDED.point_count, coords = EXCLUDED.coords,
+            {', '.join(f'{col} = EXCLUDED.{col}' for col in zoom_columns)},
+            updated_at = NOW()
+    """, values)
+
+    # Signature de parcours (MinHash / LSH) calculée sur le même tracé simplifié
+    upsert_route_signatures(cur, routes)
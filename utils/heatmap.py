@@ -0,0 +1,94 @@
+"""
+Heatmap personnelle : pyramide de tuiles Web Mercator (z/x/y, 256 x 256 pixels).
+
+Chaque pixel compte les échantillons GPS des streams qui y tombent. Une tuile est stockée
+(table heatmap_tiles, migration 0016) comme un tableau uint32 little-endian de 256 x 256
+valeurs compressé par zlib : les tuiles sont très creuses et se compressent à quelques Ko.
+
+Les échantillons sont projetés une seule fois, en pixels globaux au zoom HEATMAP_MAX_ZOOM ;
+les zooms inférieurs s'en déduisent par décalage de bits (un pixel au zoom z-1 regroupe
+2 x 2 pixels du zoom z), puis np.unique compte les pixels touchés de chaque tuile.
+"""
+import math
+import zlib
+
+import numpy as np
+
+
+TILE_SIZE = 256
+HEATMAP_MIN_ZOOM = 3
+HEATMAP_MAX_ZOOM = 16
+HEATMAP_ZOOMS = range(HEATMAP_MIN_ZOOM, HEATMAP_MAX_ZOOM + 1)
+MAX_MERCATOR_LAT = 85.05112878
+
+# Dégradé (position, R, G, B) : bleu -> violet -> rouge -> jaune
+HEATMAP_PALETTE = np.array([
+    (0.0, 40, 60, 190),
+    (0.4, 160, 40, 170),
+    (0.7, 230, 50, 40),
+    (1.0, 255, 240, 90),
+])
+
+
+def global_pixels(lat, lon, zoom=HEATMAP_MAX_ZOOM):
+    """Coordonnées pixel globales (entiers) de points au zoom donné, vectorisé."""
+    lat = np.clip(np.asarray(lat, dtype=float), -MAX_MERCATOR_LAT, MAX_MERCATOR_LAT)
+    lon = np.asarray(lon, dtype=float)
+    world = TILE_SIZE * 2 ** zoom
+    x = (lon + 180.0) / 360.0 * world
+    sin_lat = np.sin(np.radians(lat))
+    y = (0.5 - np.log((1 + sin_lat) / (1 - sin_lat)) / (4 * math.pi)) * world
+    return (np.clip(x, 0, world - 1).astype(np.int64),
+            np.clip(y, 0, world - 1).astype(np.int64))
+
+
+def tile_pixel_counts(px, py, zoom):
+    """
+    Comptes par tuile au zoom `zoom`, à partir de pixels globaux au zoom HEATMAP_MAX_ZOOM.
+
+    Returns:
+        dict (x, y) -> (indices de pixel dans la tuile, comptes)
+    """
+    shift = HEATMAP_MAX_ZOOM - zoom
+    px, py = px >> shift, py >> shift
+    tiles_per_side = 2 ** zoom
+    tile = (py // TILE_SIZE) * tiles_per_side + (px // TILE_SIZE)
+    pixel = (py % TILE_SIZE) * TILE_SIZE + (px % TILE_SIZE)
+    keys, counts = np.unique(tile * TILE_SIZE * TILE_SIZE + pixel, return_counts=True)
+
+    tiles, pixels = np.divmod(keys, TILE_SIZE * TILE_SIZE)
+    bounds = np.flatnonzero(np.diff(tiles)) + 1
+    result = {}
+    for tile_keys, tile_pixels, tile_counts in zip(np.split(tiles, bounds), np.split(pixels, bounds), np.split(counts, bounds)):
+        ty, tx = divmod(int(tile_keys[0]), tiles_per_side)
+        result[(tx, ty)] = (tile_pixels, tile_counts)
+    return result
+
+
+def compress_tile(counts):
+    return zlib.compress(np.ascontiguousarray(counts, dtype="<u4").tobytes(), 6)
+
+
+def decompress_tile(payload):
+    """Tableau uint32 (256, 256) d'une tuile stockée (None = tuile vide)."""
+    if payload is None:
+        return np.zeros((TILE_SIZE, TILE_SIZE), dtype=np.uint32)
+    return np.frombuffer(zlib.decompress(payload), dtype="<u4").reshape(TILE_SIZE, TILE_SIZE).astype(np.uint32)
+
+
+def colorize(counts, saturation):
+    """
+    Rendu RGBA d'une tuile : intensité log1p(compte) / log1p(saturation), transparente à 0.
+
+    Args:
+        counts: tableau (256, 256) de comptes
+        saturation: compte rendu avec la couleur maximale (le même pour toutes les tuiles d'un
+            zoom, sinon des coutures apparaissent entre tuiles voisines)
+    """
+    counts = np.asarray(counts, dtype=float)
+    intensity = np.clip(np.log1p(counts) / math.log1p(max(saturation, 1)), 0.0, 1.0)
+    rgba = np.empty(counts.shape + (4,), dtype=np.uint8)
+    for channel in range(3):
+        rgba[..., channel] = np.interp(intensity, HEATMAP_PALETTE[:, 0], HEATMAP_PALETTE[:, channel + 1])
+    rgba[..., 3] = np.where(counts > 0, 80 + 175 * intensity, 0)
+    return rgba
@@ -0,0 +1,53 @@
+"""
+Réponse JSON rapide basée sur orjson.
+
+FastJSONResponse est la classe de réponse par défaut de l'application (main.py) :
+orjson sérialise nativement les datetime, les tableaux et scalaires NumPy, et écrit
+les NaN / inf en null là où le JSONResponse standard lève une erreur.
+
+FastAPI passe encore le contenu des routes par jsonable_encoder avant la classe de
+réponse : les routes qui renvoient de gros volumes (streams, posters) renvoient donc
+directement une FastJSONResponse pour éviter ce parcours Python de chaque valeur.
+"""
+from decimal import Decimal
+
+import numpy as np
+import orjson
+import pandas as pd
+from fastapi.responses import JSONResponse
+from utils.timing import span
+
+
+ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+def _default(value):
+    """Types non gérés nativement par orjson."""
+    if value is pd.NaT or value is None:
+        return None
+    if isinstance(value, pd.Timestamp):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (pd.Series, pd.Index)):
+        return value.to_numpy()
+    if isinstance(value, pd.DataFrame):
+        return value.to_dict(orient="records")
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f"Type non sérialisable en JSON: {type(value).__name__}")
+
+
+def dumps(content):
+    """Sérialise en bytes JSON (mêmes règles que FastJSONResponse)."""
+    return orjson.dumps(content, default=_default, option=ORJSON_OPTIONS)
+
+
+class FastJSONResponse(JSONResponse):
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        with span("json"):
+            return dumps(content)
@@ -0,0 +1,76 @@
+"""
+Sous-échantillonnage Largest-Triangle-Three-Buckets (LTTB).
+
+Réduit une série à n points en conservant sa forme visuelle (pics, creux, ruptures de pente),
+contrairement à un pas fixe qui les lisse. Les points sont répartis en n - 2 seaux ; dans
+chaque seau on garde le point qui forme le plus grand triangle avec le point retenu dans le
+seau précédent et la moyenne du seau suivant.
+
+Les moyennes des seaux sont calculées d'un coup avec np.add.reduceat ; seule la sélection,
+qui dépend du point retenu au seau précédent, boucle sur les seaux (quelques centaines)
+et non sur les échantillons.
+"""
+import numpy as np
+
+
+def lttb_indices(x, y, n_out):
+    """
+    Indices des points à conserver.
+
+    Args:
+        x: abscisses croissantes (ex: time_s)
+        y: valeurs du canal qui guide la sélection (les NaN sont interpolés)
+        n_out: nombre de points voulus
+
+    Returns:
+        np.ndarray: indices croissants, premier et dernier point toujours inclus
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+
+    if n_out >= n or n <= 2:
+        return np.arange(n)
+    if n_out < 3:
+        return np.array([0, n - 1])
+
+    valid = ~np.isnan(y)
+    if valid.sum() < 2:
+        # Canal vide : pas de forme à préserver, pas régulier
+        return np.unique(np.linspace(0, n - 1, n_out).round().astype(int))
+    if not valid.all():
+        y = np.interp(x, x[valid], y[valid])
+
+    # n - 2 seaux entre le premier et le dernier point ; le "seau suivant" du dernier
+    # seau est le dernier point
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    bounds = np.append(edges, n)
+    sizes = np.diff(bounds)
+    avg_x = np.add.reduceat(x, edges) / sizes
+    avg_y = np.add.reduceat(y, edges) / sizes
+
+    indices = np.empty(n_out, dtype=int)
+    indices[0] = 0
+    indices[-1] = n - 1
+
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        bx, by = x[start:end], y[start:end]
+        # Double de l'aire du triangle (a, point du seau, moyenne du seau suivant)
+        area = np.abs((x[a] - avg_x[i + 1]) * (by - y[a]) - (x[a] - bx) * (avg_y[i + 1] - y[a]))
+        a = start + int(np.argmax(area))
+        indices[i + 1] = a
+
+    return indices
+
+
+def lttb_downsample_df(df, max_points, y_col, x_col="time_s"):
+    """
+    Réduit un DataFrame à max_points lignes par LTTB sur y_col.
+    Toutes les colonnes restent alignées (mêmes lignes conservées).
+    """
+    if max_points is None or len(df) <= max_points:
+        return df
+    indices = lttb_indices(df[x_col].to_numpy(), df[y_col].to_numpy(), max_points)
+    return df.iloc[indices].reset_index(drop=True)
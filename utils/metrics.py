@@ -0,0 +1,152 @@
+"""
+Métriques Prometheus de l'API, exposées sur /metrics.
+
+En production l'API tourne avec 4 workers uvicorn (Dockerfile) : chaque processus écrit ses
+métriques dans PROMETHEUS_MULTIPROC_DIR et /metrics agrège tous les fichiers, quel que soit
+le worker qui répond. Le dossier doit être vidé au démarrage du conteneur (voir Dockerfile).
+Sans cette variable (make run, scripts), les métriques restent en mémoire du processus.
+
+Métriques :
+- eyesight_http_request_duration_seconds : latence par route (modèle de chemin), méthode, statut
+- eyesight_db_connect_seconds : attente d'une connexion PostgreSQL (get_conn, pas de pool)
+- eyesight_db_rows_read : lignes lues en base par requête, par route
+- eyesight_cache_requests_total : succès / échecs des caches (VersionedCache, ETag -> 304)
+- eyesight_ingest_*_total : activités et échantillons de streams stockés, échecs par étape
+- eyesight_strava_quota_* : utilisation et limites du quota Strava (en-têtes X-RateLimit-*)
+"""
+import os
+from contextvars import ContextVar
+from time import perf_counter
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess
+)
+
+
+HTTP_REQUEST_DURATION = Histogram(
+    "eyesight_http_request_duration_seconds",
+    "Durée des requêtes HTTP",
+    ["method", "route", "status"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+DB_CONNECT_SECONDS = Histogram(
+    "eyesight_db_connect_seconds",
+    "Attente d'une connexion PostgreSQL",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1),
+)
+DB_ROWS_READ = Histogram(
+    "eyesight_db_rows_read",
+    "Lignes lues en base par requête",
+    ["route"],
+    buckets=(0, 1, 10, 100, 1_000, 10_000, 100_000, 1_000_000),
+)
+CACHE_REQUESTS = Counter(
+    "eyesight_cache_requests_total",
+    "Consultations des caches",
+    ["cache", "result"],
+)
+INGEST_ACTIVITIES = Counter(
+    "eyesight_ingest_activities_total",
+    "Nouvelles activités stockées",
+)
+INGEST_STREAM_SAMPLES = Counter(
+    "eyesight_ingest_stream_samples_total",
+    "Échantillons de streams stockés",
+)
+INGEST_FAILURES = Counter(
+    "eyesight_ingest_failures_total",
+    "Échecs d'ingestion",
+    ["stage"],
+)
+STRAVA_QUOTA_USAGE = Gauge(
+    "eyesight_strava_quota_usage",
+    "Appels Strava consommés (selon les en-têtes de l'API)",
+    ["window"],
+    multiprocess_mode="mostrecent",
+)
+STRAVA_QUOTA_LIMIT = Gauge(
+    "eyesight_strava_quota_limit",
+    "Limite du quota Strava (selon les en-têtes de l'API)",
+    ["window"],
+    multiprocess_mode="mostrecent",
+)
+
+_rows_read = ContextVar("db_rows_read", default=None)
+
+
+def add_rows_read(count):
+    """Ajoute des lignes lues au compteur de la requête en cours (sans effet hors requête)."""
+    rows = _rows_read.get()
+    if rows is not None:
+        rows[0] += count
+
+
+def record_cache(cache, hit):
+    CACHE_REQUESTS.labels(cache=cache, result="hit" if hit else "miss").inc()
+
+
+def metrics_body():
+    """
+    Returns:
+        tuple (octets au format texte Prometheus, type de contenu)
+    """
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def route_template(scope):
+    """
+    Modèle de chemin complet de la route (/activities/activity_detail/{activity_id}).
+    La route ne connaît que son chemin relatif au router : le préfixe est retrouvé en
+    retirant du chemin de la requête la partie produite par la route.
+    """
+    route = scope.get("route")
+    template = getattr(route, "path", None)
+    if template is None:
+        return "unmatched"
+    try:
+        rendered = template.format(**scope.get("path_params", {}))
+    except (KeyError, IndexError, ValueError):
+        return template
+    path = scope["path"]
+    if rendered and path.endswith(rendered):
+        return path[:len(path) - len(rendered)] + template
+    return template
+
+
+class MetricsMiddleware:
+    """Latence et lignes lues par requête, étiquetées par le modèle de chemin de la route."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        rows = [0]
+        token = _rows_read.set(rows)
+        start = perf_counter()
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            _rows_read.reset(token)
+            # Modèle de chemin plutôt que chemin réel : cardinalité bornée
+            route = route_template(scope)
+            HTTP_REQUEST_DURATION.labels(
+                method=scope["method"], route=route, status=str(status_code)
+            ).observe(perf_counter() - start)
+            DB_ROWS_READ.labels(route=route).observe(rows[0])
@@ -0,0 +1,34 @@
+"""
+Encodeur PNG minimal (bibliothèque standard : zlib + struct), pour les tuiles de heatmap.
+"""
+import struct
+import zlib
+
+import numpy as np
+
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+def _chunk(kind, data):
+    return (struct.pack(">I", len(data)) + kind + data
+            + struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF))
+
+
+def encode_png_rgba(pixels, level=6):
+    """
+    Args:
+        pixels: np.ndarray uint8 (hauteur, largeur, 4) RGBA
+
+    Returns:
+        bytes: image PNG (RGBA 8 bits, sans filtre de ligne)
+    """
+    pixels = np.ascontiguousarray(pixels, dtype=np.uint8)
+    height, width, _ = pixels.shape
+    # Chaque ligne est précédée de son type de filtre (0 = aucun)
+    raw = np.concatenate((np.zeros((height, 1), dtype=np.uint8), pixels.reshape(height, width * 4)), axis=1)
+    header = struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0)
+    return (PNG_SIGNATURE
+            + _chunk(b"IHDR", header)
+            + _chunk(b"IDAT", zlib.compress(raw.tobytes(), level))
+            + _chunk(b"IEND", b""))
@@ -0,0 +1,163 @@
+"""
+Signatures de parcours : MinHash des cellules de grille visitées, buckets LSH et distance
+de Fréchet discrète pour reconnaître les sorties sur un même parcours.
+
+- Le tracé simplifié (coords_z14 de activity_geometry) est densifié pour que chaque cellule
+  de ROUTE_CELL_DEG traversée soit vue, même sur un long segment rectiligne.
+- La signature MinHash (MINHASH_SIZE entiers 64 bits) estime la similarité de Jaccard entre
+  les ensembles de cellules de deux parcours : part des positions égales.
+- La signature est coupée en LSH_BANDS bandes de LSH_ROWS valeurs ; chaque bande donne un
+  bucket (table route_lsh, migration 0015). Deux parcours partageant un bucket sont
+  candidats : probabilité 1 - (1 - J^LSH_ROWS)^LSH_BANDS, environ 50 % à J = 0.5 et
+  plus de 99 % à J = 0.8. Aucune comparaison deux à deux de tout l'historique.
+- Les candidats sont départagés par la distance de Fréchet discrète (en mètres) entre
+  tracés simplifiés, qui tient compte de l'ordre de passage.
+"""
+import math
+
+import numpy as np
+from psycopg2.extras import execute_values
+
+
+ROUTE_CELL_DEG = 0.002      # ~220 m en latitude
+MINHASH_SIZE = 64
+LSH_BANDS = 16
+LSH_ROWS = MINHASH_SIZE // LSH_BANDS
+MAX_FRECHET_POINTS = 200
+METERS_PER_DEG = math.pi * 6_371_000.0 / 180
+
+_MASK64 = np.uint64(0xFFFFFFFFFFFFFFFF)
+_SEEDS = np.random.default_rng(20240601).integers(1, 2 ** 63, size=MINHASH_SIZE, dtype=np.uint64)
+
+
+def _mix64(x):
+    """Finaliseur splitmix64 (uint64, débordements modulo 2^64 voulus)."""
+    with np.errstate(over="ignore"):
+        x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        return (x ^ (x >> np.uint64(31))) & _MASK64
+
+
+def densify(points, step):
+    """Ajoute des points intermédiaires pour qu'aucun segment ne dépasse `step` degrés."""
+    points = np.asarray(points, dtype=float)
+    if len(points) < 2:
+        return points
+    deltas = np.diff(points, axis=0)
+    pieces = np.maximum(np.ceil(np.abs(deltas).max(axis=1) / step), 1).astype(int)
+    # Fractions 0, 1/k, ..., (k-1)/k de chaque segment, puis le dernier point
+    segment = np.repeat(np.arange(len(deltas)), pieces)
+    offsets = np.arange(pieces.sum()) - np.repeat(np.cumsum(pieces) - pieces, pieces)
+    fractions = offsets / pieces[segment]
+    dense = points[segment] + deltas[segment] * fractions[:, None]
+    return np.vstack((dense, points[-1:]))
+
+
+def route_cells(points):
+    """Clés uint64 des cellules de grille visitées par un tracé [[lat, lon], ...]."""
+    dense = densify(points, ROUTE_CELL_DEG / 2)
+    if len(dense) == 0:
+        return np.empty(0, dtype=np.uint64)
+    cells = np.floor(dense / ROUTE_CELL_DEG).astype(np.int64)
+    keys = (cells[:, 0].astype(np.uint64) << np.uint64(32)) | (cells[:, 1].astype(np.uint64) & np.uint64(0xFFFFFFFF))
+    return np.unique(keys)
+
+
+def minhash(cells):
+    """
+    Signature MinHash d'un ensemble de cellules.
+
+    Returns:
+        np.ndarray int64 de MINHASH_SIZE valeurs (stockable en BIGINT[]), None si ensemble vide
+    """
+    if len(cells) == 0:
+        return None
+    hashes = _mix64(cells[None, :] ^ _SEEDS[:, None])
+    return hashes.min(axis=1).view(np.int64)
+
+
+def lsh_buckets(signature):
+    """Bucket (int64) de chaque bande de la signature."""
+    bands = np.asarray(signature, dtype=np.int64).view(np.uint64).reshape(LSH_BANDS, LSH_ROWS)
+    bucket = np.zeros(LSH_BANDS, dtype=np.uint64)
+    for row in range(LSH_ROWS):
+        bucket = _mix64(bucket ^ bands[:, row])
+    return bucket.view(np.int64)
+
+
+def estimated_jaccard(signature, other):
+    return float(np.mean(np.asarray(signature) == np.asarray(other)))
+
+
+def _to_meters(points, lat0):
+    points = np.asarray(points, dtype=float)
+    return np.column_stack((
+        points[:, 0] * METERS_PER_DEG,
+        points[:, 1] * METERS_PER_DEG * math.cos(math.radians(lat0)),
+    ))
+
+
+def _subsample(points, max_points=MAX_FRECHET_POINTS):
+    if len(points) <= max_points:
+        return points
+    return points[np.linspace(0, len(points) - 1, max_points).round().astype(int)]
+
+
+def discrete_frechet(p, q):
+    """
+    Distance de Fréchet discrète (mètres) entre deux tracés [[lat, lon], ...].
+
+    Programmation dynamique par anti-diagonales : chaque diagonale ne dépend que des deux
+    précédentes et se calcule d'un bloc NumPy. Les tracés sont ramenés à MAX_FRECHET_POINTS.
+    """
+    p, q = _subsample(np.asarray(p, dtype=float)), _subsample(np.asarray(q, dtype=float))
+    n, m = len(p), len(q)
+    if n == 0 or m == 0:
+        return math.inf
+    lat0 = float(np.concatenate((p[:, 0], q[:, 0])).mean())
+    pm, qm = _to_meters(p, lat0), _to_meters(q, lat0)
+    dist = np.hypot(pm[:, None, 0] - qm[None, :, 0], pm[:, None, 1] - qm[None, :, 1])
+
+    ca = np.full((n, m), np.inf)
+    ca[0, 0] = dist[0, 0]
+    for k in range(1, n + m - 1):
+        i = np.arange(max(0, k - m + 1), min(n, k + 1))
+        j = k - i
+        best = np.full(len(i), np.inf)
+        up, left, diag = i > 0, j > 0, (i > 0) & (j > 0)
+        best[up] = ca[i[up] - 1, j[up]]
+        best[left] = np.minimum(best[left], ca[i[left], j[left] - 1])
+        best[diag] = np.minimum(best[diag], ca[i[diag] - 1, j[diag] - 1])
+        ca[i, j] = np.maximum(best, dist[i, j])
+    return float(ca[-1, -1])
+
+
+def upsert_route_signatures(cur, routes):
+    """
+    Calcule et enregistre signature MinHash et buckets LSH (dans la transaction du curseur).
+
+    Args:
+        cur: curseur psycopg2
+        routes: itérable de (activity_id, points) ; points [[lat, lon], ...] simplifiés, ou vide
+    """
+    signatures, buckets, activity_ids = [], [], []
+    for activity_id, points in routes:
+        activity_ids.append(int(activity_id))
+        cells = route_cells(points) if points is not None and len(points) else np.empty(0, dtype=np.uint64)
+        signature = minhash(cells)
+        if signature is None:
+            continue
+        signatures.append((int(activity_id), signature.tolist(), len(cells)))
+        buckets.extend((int(activity_id), band, int(bucket)) for band, bucket in enumerate(lsh_buckets(signature)))
+    if not activity_ids:
+        return
+
+    cur.execute("DELETE FROM route_lsh WHERE activity_id = ANY(%s)", (activity_ids,))
+    cur.execute("DELETE FROM route_signature WHERE activity_id = ANY(%s)", (activity_ids,))
+    if signatures:
+        execute_values(cur, """
+            INSERT INTO route_signature (activity_id, minhash, cell_count) VALUES %s
+        """, signatures)
+        execute_values(cur, """
+            INSERT INTO route_lsh (activity_id, band, bucket) VALUES %s
+        """, buckets)
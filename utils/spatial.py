@@ -0,0 +1,84 @@
+"""
+Index spatial des streams : grille fixe de cellules (cell_y, cell_x) -> activités.
+
+Une cellule fait GRID_CELL_DEG degrés de côté (environ 550 m en latitude). Chaque activité
+est enregistrée une fois par cellule traversée dans la table stream_cells (migration 0014),
+remplie à l'ingestion des streams (strava/store_data.py) par un seul INSERT ... SELECT DISTINCT
+côté serveur, et pour l'historique par scripts/backfill_stream_cells.py.
+
+« Qui est passé ici ? » lit les cellules couvrant le cercle de recherche, puis mesure la
+distance (haversine vectorisée) sur les seuls échantillons des activités candidates.
+"""
+import math
+
+import numpy as np
+from psycopg2 import sql
+
+
+GRID_CELL_DEG = 0.005
+EARTH_RADIUS_M = 6_371_000.0
+METERS_PER_DEG_LAT = math.pi * EARTH_RADIUS_M / 180
+
+
+def cell_of(lat, lon):
+    """Cellule (cell_y, cell_x) d'un point ; accepte des scalaires ou des tableaux NumPy."""
+    return np.floor(np.asarray(lat) / GRID_CELL_DEG).astype(int), np.floor(np.asarray(lon) / GRID_CELL_DEG).astype(int)
+
+
+def bbox_around(lat, lon, radius_m):
+    """
+    Rectangle (min_lat, min_lon, max_lat, max_lon) contenant le cercle de rayon radius_m.
+    """
+    dlat = radius_m / METERS_PER_DEG_LAT
+    dlon = radius_m / (METERS_PER_DEG_LAT * max(math.cos(math.radians(lat)), 1e-6))
+    return lat - dlat, lon - dlon, lat + dlat, lon + dlon
+
+
+def cell_range(lat, lon, radius_m):
+    """
+    Plage de cellules couvrant le cercle.
+
+    Returns:
+        tuple (min_cell_y, max_cell_y, min_cell_x, max_cell_x)
+    """
+    min_lat, min_lon, max_lat, max_lon = bbox_around(lat, lon, radius_m)
+    min_y, min_x = cell_of(min_lat, min_lon)
+    max_y, max_x = cell_of(max_lat, max_lon)
+    return int(min_y), int(max_y), int(min_x), int(max_x)
+
+
+def haversine_m(lat1, lon1, lat2, lon2):
+    """Distance en mètres entre des points (degrés), vectorisée sur des tableaux NumPy."""
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = (np.sin((lat2 - lat1) / 2) ** 2
+         + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def index_stream_cells(cur, source_table="streams", activity_ids=None):
+    """
+    Enregistre les cellules traversées par les échantillons GPS d'une table de streams
+    (dans la transaction du curseur).
+
+    Args:
+        cur: curseur psycopg2
+        source_table: table au format streams (streams ou sa table de staging)
+        activity_ids: activités à indexer (None = toute la table source)
+
+    Returns:
+        int: nombre de couples (cellule, activité) ajoutés
+    """
+    activity_filter = sql.SQL("AND s.activity_id = ANY(%(ids)s)") if activity_ids is not None else sql.SQL("")
+    cur.execute(sql.SQL("""
+        INSERT INTO stream_cells (cell_y, cell_x, activity_id)
+        SELECT DISTINCT floor(s.lat / %(cell)s)::int, floor(s.lon / %(cell)s)::int, a.id
+        FROM {source} s
+        JOIN activites a ON a.id = s.activity_id::bigint
+        WHERE s.lat IS NOT NULL AND s.lon IS NOT NULL
+        {activity_filter}
+        ON CONFLICT DO NOTHING
+    """).format(source=sql.Identifier(source_table), activity_filter=activity_filter), {
+        "cell": GRID_CELL_DEG,
+        "ids": [str(activity_id) for activity_id in activity_ids or []],
+    })
+    return cur.rowcount
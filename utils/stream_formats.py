@@ -0,0 +1,186 @@
+"""
+Formats de réponse des streams et négociation de contenu.
+
+Le format historique (records) répète le nom de chaque canal pour chaque échantillon.
+Les autres formats envoient un tableau par canal :
+
+- records  : liste de points {canal: valeur} (défaut, compatible avec le front actuel)
+- columnar : JSON {"length": n, "columns": {canal: [valeurs]}}
+- delta    : JSON d'entiers delta-encodés : chaque canal est quantifié (valeur * scale,
+             arrondie), puis chaque élément est l'écart au précédent non nul.
+             Décodage : somme cumulée puis division par scale. null = échantillon absent.
+- msgpack  : {"length", "dtypes", "columns": {canal: octets little-endian}} ; chaque canal
+             se charge sans copie dans un Float64Array / Float32Array (NaN = absent)
+- arrow    : flux Arrow IPC (un RecordBatch), lisible par apache-arrow côté JS
+
+Le format se choisit avec le paramètre `format`, ou à défaut l'en-tête Accept
+(application/msgpack, application/vnd.apache.arrow.stream). msgpack et pyarrow sont
+importés à la demande : s'ils manquent, la réponse est un 406.
+"""
+import json
+
+import numpy as np
+from fastapi import HTTPException
+from fastapi.responses import Response
+
+from utils.json_response import FastJSONResponse
+
+
+STREAM_FORMATS = ["records", "columnar", "delta", "msgpack", "arrow"]
+
+ACCEPT_FORMATS = {
+    "application/vnd.apache.arrow.stream": "arrow",
+    "application/msgpack": "msgpack",
+    "application/x-msgpack": "msgpack",
+}
+
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+
+# Quantification des canaux pour le format delta (valeur entière = round(valeur * scale))
+DELTA_SCALES = {
+    "time_s": 1,
+    "distance_m": 10,          # décimètre
+    "altitude": 10,            # décimètre
+    "lat": 1_000_000,          # ~0,1 m
+    "lon": 1_000_000,
+    "heartrate": 1,
+    "cadence": 1,
+    "temp": 1,
+    "power": 1,
+    "velocity_smooth": 1000,   # mm/s
+    "grade_smooth": 10,
+}
+
+# Canaux gardés en float64 dans les formats binaires (précision GPS, temps et distance cumulés)
+FLOAT64_CHANNELS = {"lat", "lon", "time_s", "distance_m"}
+
+
+def negotiate_stream_format(format_param=None, accept=None):
+    """
+    Returns:
+        str: un des STREAM_FORMATS ('records' par défaut)
+    """
+    if format_param:
+        return format_param
+    for part in (accept or "").split(","):
+        media_type = part.split(";")[0].strip().lower()
+        if media_type in ACCEPT_FORMATS:
+            return ACCEPT_FORMATS[media_type]
+    return "records"
+
+
+def _channel_arrays(df):
+    """Colonnes numériques du DataFrame en float (NaN = absent)."""
+    return {col: df[col].to_numpy(dtype=float, na_value=np.nan) for col in df.columns}
+
+
+def columnar_payload(df):
+    return {"length": len(df), "columns": _channel_arrays(df)}
+
+
+def delta_encode(values, scale):
+    """
+    Quantifie puis delta-encode un canal.
+
+    Returns:
+        np.ndarray d'entiers, ou liste avec None aux échantillons absents, ou None si le canal est vide
+    """
+    valid = ~np.isnan(values)
+    if not valid.any():
+        return None
+    quantized = np.round(values[valid] * scale).astype(np.int64)
+    deltas = np.diff(quantized, prepend=0)
+    if valid.all():
+        return deltas
+    out = np.full(len(values), None, dtype=object)
+    out[valid] = deltas.tolist()
+    return out.tolist()
+
+
+def delta_payload(df):
+    channels = {}
+    for col, values in _channel_arrays(df).items():
+        scale = DELTA_SCALES.get(col, 1)
+        channels[col] = {"scale": scale, "data": delta_encode(values, scale)}
+    return {"length": len(df), "encoding": "delta", "channels": channels}
+
+
+def _binary_arrays(df):
+    arrays = {}
+    for col, values in _channel_arrays(df).items():
+        dtype = "<f8" if col in FLOAT64_CHANNELS else "<f4"
+        arrays[col] = values.astype(dtype)
+    return arrays
+
+
+def msgpack_body(df, meta=None):
+    try:
+        import msgpack
+    except ImportError:
+        raise HTTPException(status_code=406, detail="Format msgpack indisponible (paquet msgpack non installé)")
+
+    arrays = _binary_arrays(df)
+    payload = {
+        "length": len(df),
+        "dtypes": {col: ("float64" if arr.dtype.itemsize == 8 else "float32") for col, arr in arrays.items()},
+        "columns": {col: arr.tobytes() for col, arr in arrays.items()},
+    }
+    if meta:
+        payload["meta"] = meta
+    return msgpack.packb(payload, default=str)
+
+
+def arrow_body(df, meta=None):
+    try:
+        import pyarrow as pa
+    except ImportError:
+        raise HTTPException(status_code=406, detail="Format Arrow indisponible (paquet pyarrow non installé)")
+
+    arrays = _binary_arrays(df)
+    batch = pa.RecordBatch.from_arrays(
+        [pa.array(arr, from_pandas=True) for arr in arrays.values()],
+        names=list(arrays.keys()),
+    )
+    schema = batch.schema
+    if meta:
+        schema = schema.with_metadata({"meta": json.dumps(meta, default=str)})
+        batch = batch.replace_schema_metadata(schema.metadata)
+
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, schema) as writer:
+        writer.write_batch(batch)
+    return sink.getvalue().to_pybytes()
+
+
+def json_streams_payload(df, fmt):
+    """Contenu du champ "streams" pour les formats JSON (records, columnar, delta)."""
+    if fmt == "columnar":
+        return columnar_payload(df)
+    if fmt == "delta":
+        return delta_payload(df)
+    return df.to_dict(orient="records")
+
+
+def stream_response(df, fmt, meta=None):
+    """
+    Construit la réponse d'un endpoint de streams dans le format demandé.
+
+    Args:
+        df: DataFrame des streams (une colonne par canal)
+        fmt: un des STREAM_FORMATS
+        meta: dict ajouté à la réponse (ex: {"activity": {...}}) ; clés de premier niveau
+            en JSON, champ "meta" en msgpack, métadonnées du schéma en Arrow
+    """
+    headers = {"Vary": "Accept"}
+    meta = meta or {}
+
+    if fmt == "msgpack":
+        return Response(msgpack_body(df, meta), media_type=MSGPACK_MEDIA_TYPE, headers=headers)
+    if fmt == "arrow":
+        return Response(arrow_body(df, meta), media_type=ARROW_MEDIA_TYPE, headers=headers)
+
+    payload = {**meta, "streams": json_streams_payload(df, fmt)}
+    if fmt != "records":
+        payload["format"] = fmt
+    return FastJSONResponse(payload, headers=headers)
@@ -0,0 +1,130 @@
+"""
+Mesure du temps passé par requête : en-tête Server-Timing et ligne de log structurée.
+
+Les services découpent leur travail en étapes nommées :
+
+    from utils.timing import span
+
+    with span("db"):
+        cur.execute(...)
+    with span("pandas"):
+        df = ...
+
+ServerTimingMiddleware ouvre une liste de mesures par requête (contextvar, recopiée dans
+le threadpool des routes synchrones) ; chaque span y ajoute sa durée. Les durées d'un même
+nom sont additionnées et renvoyées dans l'en-tête
+
+    Server-Timing: db;dur=12.4, pandas;dur=30.1, json;dur=3.2, app;dur=47.9
+
+(visible dans l'onglet réseau du navigateur), puis journalisées en une ligne JSON à la fin
+de la réponse. Hors requête, ou si SERVER_TIMING=false, span() renvoie un contexte vide :
+le coût se limite à la lecture d'une contextvar.
+
+Une fonction entière se mesure avec le décorateur @timed("kpi"). Les étapes peuvent
+s'imbriquer (un span "kpi" contient alors les spans "db" et "pandas" de ses appels).
+"""
+import json
+import os
+from contextlib import nullcontext
+from contextvars import ContextVar
+from functools import wraps
+from time import perf_counter
+
+from starlette.datastructures import MutableHeaders
+
+
+SERVER_TIMING_ENABLED = os.getenv("SERVER_TIMING", "true").lower() != "false"
+
+_spans = ContextVar("server_timing_spans", default=None)
+_NOOP = nullcontext()
+
+
+class _Span:
+    __slots__ = ("spans", "name", "start")
+
+    def __init__(self, spans, name):
+        self.spans = spans
+        self.name = name
+
+    def __enter__(self):
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.spans.append((self.name, perf_counter() - self.start))
+        return False
+
+
+def span(name):
+    """Contexte qui mesure une étape nommée de la requête en cours (sans effet hors requête)."""
+    spans = _spans.get()
+    if spans is None:
+        return _NOOP
+    return _Span(spans, name)
+
+
+def timed(name):
+    """Décorateur : mesure chaque appel de la fonction comme un span `name`."""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def summarize(spans):
+    """Durées cumulées par nom, en millisecondes, dans l'ordre de première apparition."""
+    totals = {}
+    for name, duration in spans:
+        totals[name] = totals.get(name, 0.0) + duration * 1000
+    return {name: round(ms, 1) for name, ms in totals.items()}
+
+
+def server_timing_header(totals):
+    return ", ".join(f"{name};dur={ms}" for name, ms in totals.items())
+
+
+class ServerTimingMiddleware:
+    """
+    Ajoute l'en-tête Server-Timing (étapes mesurées avant l'envoi des en-têtes, plus "app",
+    la durée totale jusque-là) et journalise une ligne JSON par requête avec toutes les étapes,
+    y compris celles d'une réponse en streaming.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        spans = []
+        token = _spans.set(spans)
+        start = perf_counter()
+        status_code = None
+
+        async def send_with_timing(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                totals = summarize(spans)
+                totals["app"] = round((perf_counter() - start) * 1000, 1)
+                headers = MutableHeaders(raw=message["headers"])
+                headers.append("Server-Timing", server_timing_header(totals))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _spans.reset(token)
+            print(json.dumps({
+                "event": "request",
+                "method": scope["method"],
+                "path": scope["path"],
+                "status": status_code,
+                "duration_ms": round((perf_counter() - start) * 1000, 1),
+                "spans_ms": summarize(spans),
+            }), flush=True)